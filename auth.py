@@ -0,0 +1,224 @@
+"""
+Login for old_ui.py: user records, bcrypt checks and signed session tokens.
+
+Users come from USER_<NAME>_NAME, USER_<NAME>_EMAIL and
+USER_<NAME>_PASSWORD_HASH keys in st.secrets or the environment.
+old_ui keeps the parsed table in st.cache_resource for AUTH_USERS_TTL
+seconds, so reruns neither rescan the secrets and environment nor parse
+them, and a changed secret or variable is picked up without a restart
+once the entry expires.
+
+A cost-12 bcrypt check takes ~250 ms of CPU. Checks run on a small shared
+pool (AUTH_WORKERS) and at most AUTH_MAX_PENDING may wait; past that,
+authenticate() raises LoginBusy rather than queueing behind a burst of
+logins. The pool only bounds how many checks run at once: the rerun that
+submitted a login still waits for its own check (up to AUTH_TIMEOUT).
+Unknown usernames are checked against a dummy hash, so both cases take
+equally long.
+
+After a successful login the user gets a signed session token
+(HMAC-SHA256 over username, expiry, password hash and the user's session
+generation), which old_ui keeps in the URL. A returning browser presents
+it and skips bcrypt entirely. The token is a bearer credential, so it is
+short-lived (AUTH_TOKEN_TTL) and old_ui reissues it while the user is
+active. revoke() bumps the user's generation on logout, so every token
+issued before that stops working at once. A password change or a new
+AUTH_SECRET invalidates tokens too. Generations are kept in memory, so a
+restart forgets revocations; tokens from before a logout then work again
+until they expire. Without AUTH_SECRET a random key is generated per
+process, so no token survives a restart anyway.
+
+    AUTH_SECRET        key for session tokens (default: random per process)
+    AUTH_TOKEN_TTL     token lifetime in seconds (default 1800)
+    AUTH_WORKERS       threads running bcrypt checks (default 2)
+    AUTH_MAX_PENDING   checks queued or running before logins are refused (default 32)
+    AUTH_TIMEOUT       seconds a login waits for its check (default 10)
+    AUTH_USERS_TTL     seconds old_ui keeps the parsed user table (default 60)
+"""
+
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+
+SECRET = os.environ.get("AUTH_SECRET", "").encode("utf-8") or secrets.token_bytes(32)
+TOKEN_TTL = int(os.environ.get("AUTH_TOKEN_TTL", "1800"))
+WORKERS = int(os.environ.get("AUTH_WORKERS", "2"))
+MAX_PENDING = int(os.environ.get("AUTH_MAX_PENDING", "32"))
+TIMEOUT = float(os.environ.get("AUTH_TIMEOUT", "10"))
+USERS_TTL = float(os.environ.get("AUTH_USERS_TTL", "60"))
+BCRYPT_ROUNDS = 12
+
+# Development fallback used when no users are configured (password: password123)
+DEV_PASSWORD_HASH = "$2b$12$eOE.V.ef3pL.ctWcUepXE.XegxGNQZGEbwBT03HPsOqDSvTvNHRCS"
+DEV_USERS = {
+    "admin": {
+        "password_hash": DEV_PASSWORD_HASH,
+        "name": "Admin User",
+        "email": "admin@metu.edu.tr"
+    }
+}
+
+
+class LoginBusy(RuntimeError):
+    """Raised when too many password checks are already waiting, or one timed out."""
+
+
+def user_source(secrets_mapping=None, environ=None):
+    """USER_* keys from st.secrets (preferred) and the environment."""
+    environ = os.environ if environ is None else environ
+    source = {}
+    try:
+        if secrets_mapping:
+            for key in secrets_mapping.keys():
+                if key.startswith("USER_"):
+                    source[key] = secrets_mapping[key]
+    except Exception:
+        pass  # no secrets.toml: environment only
+    for key in environ:
+        if key.startswith("USER_") and key not in source:
+            source[key] = environ[key]
+    return source
+
+
+def fingerprint(source):
+    """Digest of the USER_* keys; it changes whenever a user is added, removed or edited."""
+    digest = hashlib.sha256()
+    for key in sorted(source):
+        digest.update(f"{key}={source[key]}\0".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def parse_users(source):
+    """{username: {name, email, password_hash}} for every USER_<NAME> with a name and hash."""
+    users = {}
+    for key in source:
+        if not key.endswith("_NAME"):
+            continue
+        prefix = key[:-len("_NAME")]
+        name = source.get(f"{prefix}_NAME")
+        password_hash = source.get(f"{prefix}_PASSWORD_HASH")
+        if name and password_hash:
+            users[prefix[len("USER_"):].lower()] = {
+                "name": name,
+                "email": source.get(f"{prefix}_EMAIL") or "",
+                "password_hash": password_hash
+            }
+    return users
+
+
+def hash_password(password, rounds=BCRYPT_ROUNDS):
+    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds)).decode("utf-8")
+
+
+class _CheckPool:
+    """Bounded bcrypt checks; bcrypt releases the GIL, so WORKERS checks run in parallel."""
+
+    def __init__(self, workers=WORKERS, max_pending=MAX_PENDING):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._slots = threading.BoundedSemaphore(max_pending)
+
+    def submit(self, password, password_hash):
+        if not self._slots.acquire(blocking=False):
+            raise LoginBusy("Too many logins in progress, please try again in a moment.")
+        try:
+            future = self._executor.submit(bcrypt.checkpw, password.encode("utf-8"), password_hash.encode("utf-8"))
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Return the process-wide bcrypt check pool."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = _CheckPool()
+    return _pool
+
+
+def normalize_username(username):
+    return (username or "").lower().strip()
+
+
+def authenticate(users, username, password, timeout=TIMEOUT):
+    """The normalized username if `password` matches its stored hash, else None.
+
+    Raises LoginBusy when the check cannot start or finish in time, and
+    ValueError for a malformed stored hash.
+    """
+    username = normalize_username(username)
+    user = users.get(username)
+    future = get_pool().submit(password or "", user["password_hash"] if user else DEV_PASSWORD_HASH)
+    try:
+        matches = future.result(timeout=timeout)
+    except TimeoutError:
+        raise LoginBusy("Login is taking too long, please try again.") from None
+    return username if user and matches else None
+
+
+_generations = {}  # username -> session generation, bumped by revoke()
+_generations_lock = threading.Lock()
+
+
+def _generation(username):
+    with _generations_lock:
+        return _generations.get(username, 0)
+
+
+def revoke(username):
+    """Invalidate every session token issued to `username` so far (logout)."""
+    with _generations_lock:
+        _generations[username] = _generations.get(username, 0) + 1
+
+
+def _signature(username, expires, password_hash, generation):
+    message = f"{username}\0{expires}\0{password_hash}\0{generation}".encode("utf-8")
+    digest = hmac.new(SECRET, message, hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).rstrip(b"=").decode("ascii")
+
+
+def issue_token(username, user, ttl=TOKEN_TTL, now=None):
+    """Session token for a user who has just logged in (or is still active)."""
+    expires = int((time.time() if now is None else now) + ttl)
+    signature = _signature(username, expires, user["password_hash"], _generation(username))
+    return f"{username}.{expires}.{signature}"
+
+
+def _parse_token(token):
+    try:
+        username, expires, signature = (token or "").rsplit(".", 2)
+        return username, int(expires), signature
+    except ValueError:
+        return None, 0, None
+
+
+def verify_token(token, users, now=None):
+    """The username a valid, unexpired and unrevoked token was issued to, else None."""
+    username, expires, signature = _parse_token(token)
+    user = users.get(username)
+    if user is None or expires < (time.time() if now is None else now):
+        return None
+    expected = _signature(username, expires, user["password_hash"], _generation(username))
+    if not hmac.compare_digest(signature, expected):
+        return None
+    return username
+
+
+def needs_refresh(token, ttl=TOKEN_TTL, now=None):
+    """True once less than half of the token's lifetime is left."""
+    _, expires, _ = _parse_token(token)
+    return expires - (time.time() if now is None else now) < ttl / 2
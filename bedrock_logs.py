@@ -0,0 +1,217 @@
+"""
+CloudWatch lookup of Bedrock invocation logs by request_id.
+
+One logs client is reused for the whole process and results are cached per
+request_id: hits for CACHE_TTL seconds, "nothing logged yet" answers for the
+shorter EMPTY_TTL so a retry soon after the invocation can still find them.
+Errors are never cached. Pass `client=` (e.g. a botocore Stubber-wrapped
+client) to bypass the shared one.
+
+    BEDROCK_LOGS_TTL        seconds to keep found events (default 300)
+    BEDROCK_LOGS_EMPTY_TTL  seconds to remember an empty result (default 30)
+    BEDROCK_LOGS_BACKEND    "filter" (filter_log_events) or "insights"
+
+The "insights" backend runs a CloudWatch Logs Insights query scoped to a
+few minutes around the time the request was sent, instead of scanning a
+fixed lookback window, and yields partial results while the query runs.
+"""
+
+import os
+import threading
+import time
+
+LOG_GROUP = "/aws/bedrock/invocations"
+REGION = "eu-central-1"
+CACHE_TTL = float(os.environ.get("BEDROCK_LOGS_TTL", "300"))
+EMPTY_TTL = float(os.environ.get("BEDROCK_LOGS_EMPTY_TTL", "30"))
+BACKEND = os.environ.get("BEDROCK_LOGS_BACKEND", "filter")
+# Insights window around the send time: invocations are logged after the
+# request starts and Bedrock calls can run for several minutes.
+WINDOW_BEFORE_SECONDS = 60
+WINDOW_AFTER_SECONDS = 15 * 60
+QUERY_TIMEOUT_SECONDS = 60
+POLL_INTERVAL_SECONDS = 0.5
+MAX_PAGES = 10
+MAX_CACHED = 512
+
+_client = None
+_client_lock = threading.Lock()
+_cache = {}  # request_id -> (expires_at, events)
+_cache_lock = threading.Lock()
+
+
+def get_client():
+    """Return the process-wide CloudWatch Logs client."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                import boto3  # ~200 ms to import; only paid once logs are actually requested
+
+                _client = boto3.client("logs", region_name=REGION)
+    return _client
+
+
+def _cache_get(request_id):
+    with _cache_lock:
+        entry = _cache.get(request_id)
+        if entry is None:
+            return None
+        if entry[0] <= time.time():
+            del _cache[request_id]
+            return None
+        return entry[1]
+
+
+def _cache_put(request_id, events):
+    ttl = CACHE_TTL if events else EMPTY_TTL
+    with _cache_lock:
+        if len(_cache) >= MAX_CACHED:
+            # Drop the entry closest to expiry
+            del _cache[min(_cache, key=lambda key: _cache[key][0])]
+        _cache[request_id] = (time.time() + ttl, events)
+
+
+def invalidate(request_id):
+    with _cache_lock:
+        _cache.pop(request_id, None)
+
+
+def clear_cache():
+    with _cache_lock:
+        _cache.clear()
+
+
+def _filter_events(client, filter_pattern, start_time, end_time, limit):
+    """Run filter_log_events, following nextToken until `limit` events."""
+    events = []
+    kwargs = {
+        "logGroupName": LOG_GROUP,
+        "filterPattern": filter_pattern,
+        "startTime": start_time,
+        "endTime": end_time,
+        "interleaved": True,
+        "limit": limit,
+    }
+    for _ in range(MAX_PAGES):
+        response = client.filter_log_events(**kwargs)
+        events.extend(response.get("events", []))
+        token = response.get("nextToken")
+        if len(events) >= limit or not token:
+            break
+        kwargs["nextToken"] = token
+        kwargs["limit"] = limit - len(events)
+    return events[:limit]
+
+
+def fetch_bedrock_logs(request_id, limit=50, lookback_minutes=60, client=None, use_cache=True):
+    """Fetch CloudWatch logs for a Bedrock invocation request_id."""
+    if not request_id:
+        return []
+    if use_cache:
+        cached = _cache_get(request_id)
+        if cached is not None:
+            return cached
+    try:
+        logs = client or get_client()
+        end_time = int(time.time() * 1000)
+        start_time = end_time - (lookback_minutes * 60 * 1000)
+        events = _filter_events(
+            logs, f'{{ $.requestId = "{request_id}" }}', start_time, end_time, limit
+        )
+        if not events:
+            events = _filter_events(logs, f'"{request_id}"', start_time, end_time, limit)
+    except Exception as e:
+        return [{"message": f"⚠️ Unable to fetch Bedrock logs: {str(e)}"}]
+    if use_cache:
+        _cache_put(request_id, events)
+    return events
+
+
+def _insights_query(request_id, limit):
+    safe_id = request_id.replace("\\", "").replace('"', "")
+    return (
+        "fields @timestamp, @message, @logStream"
+        f' | filter requestId = "{safe_id}" or @message like "{safe_id}"'
+        " | sort @timestamp asc"
+        f" | limit {int(limit)}"
+    )
+
+
+def _insights_rows_to_events(rows):
+    """Turn get_query_results rows into filter_log_events-shaped dicts."""
+    events = []
+    for row in rows:
+        fields = {field.get("field"): field.get("value") for field in row}
+        events.append({
+            "timestamp": fields.get("@timestamp"),
+            "logStreamName": fields.get("@logStream"),
+            "message": fields.get("@message"),
+        })
+    return events
+
+
+def iter_insights_results(request_id, sent_at=None, limit=50, client=None, use_cache=True,
+                          poll_interval=POLL_INTERVAL_SECONDS, timeout=QUERY_TIMEOUT_SECONDS):
+    """Run a Logs Insights query for request_id and yield (events, status) as it progresses.
+
+    sent_at is the epoch time the request was sent; the query only covers
+    WINDOW_BEFORE_SECONDS before it to WINDOW_AFTER_SECONDS after it.
+    Without it the last hour is searched. The final yield has status
+    "Complete" (or the terminal status CloudWatch reported).
+    """
+    if not request_id:
+        yield [], "Complete"
+        return
+    if use_cache:
+        cached = _cache_get(request_id)
+        if cached is not None:
+            yield cached, "Complete"
+            return
+
+    now = time.time()
+    if sent_at:
+        start_time = sent_at - WINDOW_BEFORE_SECONDS
+        end_time = min(now, sent_at + WINDOW_AFTER_SECONDS)
+    else:
+        start_time, end_time = now - 3600, now
+
+    try:
+        logs = client or get_client()
+        query_id = logs.start_query(
+            logGroupName=LOG_GROUP,
+            startTime=int(start_time),
+            endTime=int(end_time) + 1,
+            queryString=_insights_query(request_id, limit),
+            limit=limit
+        )["queryId"]
+        deadline = time.time() + timeout
+        seen = -1
+        while True:
+            response = logs.get_query_results(queryId=query_id)
+            status = response.get("status", "Unknown")
+            events = _insights_rows_to_events(response.get("results", []))
+            if status in ("Complete", "Failed", "Cancelled", "Timeout", "Unknown"):
+                break
+            if len(events) != seen:
+                seen = len(events)
+                yield events, status
+            if time.time() >= deadline:
+                logs.stop_query(queryId=query_id)
+                status = "Timeout"
+                break
+            time.sleep(poll_interval)
+    except Exception as e:
+        yield [{"message": f"⚠️ Unable to query Bedrock logs: {str(e)}"}], "Failed"
+        return
+    if use_cache and status == "Complete":
+        _cache_put(request_id, events)
+    yield events, status
+
+
+def query_bedrock_logs_insights(request_id, sent_at=None, limit=50, client=None, use_cache=True):
+    """Blocking wrapper around iter_insights_results returning the final events."""
+    events = []
+    for events, _status in iter_insights_results(request_id, sent_at, limit, client, use_cache):
+        pass
+    return events
@@ -0,0 +1,1006 @@
+"""
+Benchmarks for the Mail Assistant client path.
+
+Each scenario prints a JSON report so results can be compared between commits.
+Latencies are reported as count/mean/p50/p95/p99, load scenarios add
+throughput, and every report carries the process's peak RSS. `suite` runs
+the load, micro and trace scenarios in separate processes (so peak RSS is
+per scenario) and tags the combined report with the git commit.
+
+Usage:
+    python benchmark.py suite --output bench.json
+    python benchmark.py load --burst 20 --delay 0.5 --jitter 0.2 --trace-kb 200
+    python benchmark.py micro --requests 50
+    python benchmark.py router
+    python benchmark.py normalize --workers 4
+    python benchmark.py similar
+    python benchmark.py ingest --copies 50
+    python benchmark.py archive --copies 20
+    python benchmark.py context --requests 200
+    python benchmark.py compaction --requests 40 --token-delay 0.005
+    python benchmark.py prefetch --delay 1.0
+    python benchmark.py incoming --sizes 5 20 --delay 0.5
+    python benchmark.py client --requests 200
+    python benchmark.py stream --requests 20 --chunk-delay 0.02
+    python benchmark.py outbox --sizes 100 1000 --reruns 5
+    python benchmark.py render --sizes 10 100 500 --before old_mail.py
+    python benchmark.py diagram --requests 20 --before old_mail.py
+    python benchmark.py startup --requests 20
+    python benchmark.py trace --requests 50
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+import context_index
+import conversation_context
+import diagram_assets
+import email_analysis
+import lambda_client
+import outbox_store
+import prefetch
+import response_cache
+import ingest_threads
+import router
+import similar_threads
+import startup_profile
+import text_normalize
+import thread_archive
+import thread_corpus
+import trace_index
+from perf_metrics import percentile
+from mock_lambda import load_answers, start_mock_server
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+RESULTS_PATH = os.path.join(ROOT, "results.json")
+TEST_DATA_PATH = os.path.join(ROOT, "test_data.jsonl")
+
+
+def summarize(samples_ms, digits=3):
+    return {
+        "count": len(samples_ms),
+        "mean_ms": round(statistics.fmean(samples_ms), digits) if samples_ms else None,
+        "p50_ms": round(percentile(samples_ms, 50), digits) if samples_ms else None,
+        "p95_ms": round(percentile(samples_ms, 95), digits) if samples_ms else None,
+        "p99_ms": round(percentile(samples_ms, 99), digits) if samples_ms else None,
+    }
+
+
+def _timed(fn, n, inner=1):
+    """n samples of fn's wall time in ms, each averaged over `inner` calls."""
+    samples = []
+    for _ in range(n):
+        start = time.perf_counter()
+        for _ in range(inner):
+            fn()
+        samples.append((time.perf_counter() - start) * 1000 / inner)
+    return samples
+
+
+def peak_rss_kb():
+    """Peak resident set size of this process in KB (None where unsupported)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def _throughput(count, wall_s):
+    return round(count / wall_s, 3) if wall_s > 0 else None
+
+
+def bench_client(args):
+    """Fresh connection per call (old behaviour) vs. the pooled session."""
+    server, url = start_mock_server(delay=args.delay)
+    payload = {"input": {"query": "eduroma nasıl bağlanabilirim?", "thread_id": ""}}
+    try:
+        def fresh():
+            response = requests.post(url, json=payload, timeout=500)
+            response.raise_for_status()
+            response.json()
+
+        def pooled():
+            lambda_client.post_json(url, payload)
+
+        # Warm the pool so the first handshake is not counted.
+        pooled()
+        return {
+            "scenario": "client",
+            "requests": args.requests,
+            "fresh_connection": summarize(_timed(fresh, args.requests)),
+            "pooled_session": summarize(_timed(pooled, args.requests)),
+        }
+    finally:
+        server.shutdown()
+
+
+def bench_stream(args):
+    """Time to first rendered text: buffered POST vs. streamed SSE answer."""
+    server, url = start_mock_server(stream=True, chunk_delay=args.chunk_delay)
+    payload = {"input": {"query": "Diplomamı kaybettim. İkinci kopya alabilir miyim? " * 4, "thread_id": ""}}
+    try:
+        buffered, first_chunk, stream_total = [], [], []
+        for _ in range(args.requests):
+            start = time.perf_counter()
+            lambda_client.post_json(url, payload)
+            buffered.append((time.perf_counter() - start) * 1000)
+
+            start = time.perf_counter()
+            first = None
+            for _chunk in lambda_client.stream_json(url, payload):
+                if first is None:
+                    first = (time.perf_counter() - start) * 1000
+            first_chunk.append(first)
+            stream_total.append((time.perf_counter() - start) * 1000)
+        return {
+            "scenario": "stream",
+            "requests": args.requests,
+            "buffered_first_text": summarize(buffered),
+            "streamed_first_text": summarize(first_chunk),
+            "streamed_total": summarize(stream_total),
+        }
+    finally:
+        server.shutdown()
+
+
+def _synthetic_trace(size_kb=20):
+    document = "x" * 1024
+    return [{"trace": {"nodeInputTrace": {
+        "nodeName": "Prompt_1",
+        "fields": [{"nodeInputName": f"field_{i}", "content": {"document": document}} for i in range(size_kb)]
+    }}}]
+
+
+BASELINE = "01c8670"  # the commit whose mail.py still kept the outbox in st.session_state
+
+
+def _baseline_script(name="mail.py"):
+    """Write `name` as of BASELINE next to the current modules; the caller removes it."""
+    source = subprocess.run(["git", "show", f"{BASELINE}:{name}"], cwd=ROOT, capture_output=True,
+                            text=True, check=True).stdout
+    fd, path = tempfile.mkstemp(prefix="baseline_", suffix=".py", dir=ROOT)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(source)
+    return path
+
+
+def bench_outbox(args):
+    """Incoming rerun cost as the outbox grows: the store-backed page vs. the BASELINE mail.py.
+
+    Both apps render the same emails on the Incoming page and the next
+    --reruns reruns are timed; the baseline is seeded through
+    st.session_state.outbox, as it kept them there. store_page_read is the
+    store's share of one current rerun. Request ids are left out so neither
+    app queries Bedrock logs.
+    """
+    import streamlit as st
+
+    trace = _synthetic_trace()
+    report = {"scenario": "outbox", "baseline": BASELINE, "page_size": args.page_size, "sizes": {}}
+    baseline = _baseline_script()
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            for size in args.sizes:
+                os.environ["OUTBOX_DB"] = os.path.join(tmp, f"outbox_{size}.db")
+                store = outbox_store.OutboxStore()
+                owner = "0" * 32
+                session_outbox = []
+                for i in range(size):
+                    email = {"id": i + 1, "created_at": float(i), "thread_id": f"thread-{i % 50}",
+                             "to": "hotline@metu.edu.tr", "subject": f"Subject {i}",
+                             "body": "Merhaba, VPN bağlantı sorunu. " * 10, "time": "17 Oct, 12:00", "read": False}
+                    response = {"result": "Yanıt " * 50, "redirection": {"score": 0.8}, "trace": trace,
+                                "request_id": None}
+                    store.add(owner, email, response)
+                    session_outbox.append(dict(email, ai_hint=response["result"],
+                                               ai_redirection=response["redirection"], ai_trace=trace,
+                                               ai_request_id=None))
+
+                def paged_rerun():
+                    store.count(owner)
+                    store.count_pending(owner)
+                    store.page(owner, 0, args.page_size)
+
+                st.cache_resource.clear()
+                current = _open_incoming("mail.py", {"user_id": owner})
+                old = _open_incoming(baseline, {"outbox": session_outbox})
+                report["sizes"][size] = {
+                    "store_page_read": summarize(_timed(paged_rerun, args.requests)),
+                    "incoming_rerun": summarize(_timed(current.run, args.reruns)),
+                    "baseline_incoming_rerun": summarize(_timed(old.run, args.reruns)),
+                }
+    finally:
+        os.remove(baseline)
+    return report
+
+
+def _count_elements(node):
+    """Number of elements and serialized proto bytes below an AppTest node."""
+    count, size = 1, 0
+    proto = getattr(node, "proto", None)
+    if proto is not None and hasattr(proto, "ByteSize"):
+        size += proto.ByteSize()
+    for child in (getattr(node, "children", None) or {}).values():
+        child_count, child_size = _count_elements(child)
+        count += child_count
+        size += child_size
+    return count, size
+
+
+def _open_incoming(script, seed_session=None):
+    """AppTest of `script` switched to the Incoming page, ready for its next run()."""
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(os.path.abspath(script), default_timeout=600)
+    for key, value in (seed_session or {}).items():
+        at.session_state[key] = value
+    at.run()
+    at.sidebar.radio[0].set_value("📥 Incoming")
+    return at
+
+
+def _render_incoming(script, seed_session=None):
+    at = _open_incoming(script, seed_session)
+    start = time.perf_counter()
+    at.run()
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    elements, payload = _count_elements(at.main)
+    return {"elements": elements, "payload_bytes": payload, "rerun_ms": round(elapsed_ms, 3)}
+
+
+def bench_render(args):
+    """Elements and bytes sent per Incoming rerun as the folder grows.
+
+    --before points at an older mail.py that still kept the outbox in
+    st.session_state; it is seeded with the same emails for comparison.
+    """
+    import streamlit as st
+
+    report = {"scenario": "render", "sizes": {}}
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["OUTBOX_DB"] = os.path.join(tmp, "outbox.db")
+        store = outbox_store.OutboxStore()
+        owner = "0" * 32  # the inbox id the rendered session is seeded with
+        emails = []
+        for size in sorted(args.sizes):
+            while len(emails) < size:
+                i = len(emails)
+                email = {"id": i + 1, "created_at": float(i), "thread_id": "", "to": "hotline@metu.edu.tr",
+                         "subject": f"Subject {i}", "body": "Merhaba, VPN bağlantı sorunu. " * 10,
+                         "time": "17 Oct, 12:00", "read": False}
+                response = {"result": "Yanıt " * 50, "redirection": {"score": 0.8},
+                            "trace": _synthetic_trace(2), "request_id": None}
+                store.add(owner, email, response)
+                emails.append(dict(email, ai_hint=response["result"], ai_redirection=response["redirection"],
+                                   ai_trace=response["trace"], ai_request_id=None))
+            st.cache_resource.clear()
+            entry = {"after": _render_incoming("mail.py", {"user_id": owner})}
+            if args.before:
+                entry["before"] = _render_incoming(args.before, {"outbox": list(emails)})
+            report["sizes"][size] = entry
+    return report
+
+
+def _switch_to_diagram(script, n):
+    """Rerun ms and bytes sent for n switches from Incoming to the Diagram page."""
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(os.path.abspath(script), default_timeout=60).run()
+    samples = []
+    for _ in range(n):
+        at.sidebar.radio[0].set_value("📥 Incoming").run()
+        at.sidebar.radio[0].set_value("📊 Diagram")
+        start = time.perf_counter()
+        at.run()
+        samples.append((time.perf_counter() - start) * 1000)
+    _, payload = _count_elements(at.main)
+    return {"switch": summarize(samples), "payload_bytes": payload}
+
+
+def bench_diagram(args):
+    """Diagram page switches: prebuilt static asset vs. reading and patching docs/index.html per rerun.
+
+    --before points at an older mail.py that still patched the file on every rerun.
+    """
+    def patch_per_rerun():
+        with open(diagram_assets.DIAGRAM_PATH, encoding="utf-8") as f:
+            diagram_assets.patch_html(f.read())
+
+    report = {"scenario": "diagram", "html_bytes": os.path.getsize(diagram_assets.DIAGRAM_PATH),
+              "read_and_patch": summarize(_timed(patch_per_rerun, args.requests, inner=10), digits=6)}
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["OUTBOX_DB"] = os.path.join(tmp, "outbox.db")
+        report["after"] = _switch_to_diagram("mail.py", args.requests)
+        if args.before:
+            report["before"] = _switch_to_diagram(args.before, args.requests)
+    return report
+
+
+def bench_startup(args):
+    """Cold import of mail.py's dependencies against IMPORT_BUDGET_MS, then first run vs. reruns."""
+    from streamlit.testing.v1 import AppTest
+
+    ok, total_ms, import_report = startup_profile.check_budget()
+    top_level = [row for row in import_report["modules"] if row["depth"] == 0 and row["module"] != "site"]
+    heaviest = sorted(top_level, key=lambda row: row["cumulative_ms"], reverse=True)[:10]
+    report = {"scenario": "startup", "import_total_ms": total_ms, "budget_ms": startup_profile.IMPORT_BUDGET_MS,
+              "within_budget": ok, "heaviest_imports": {row["module"]: row["cumulative_ms"] for row in heaviest}}
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["OUTBOX_DB"] = os.path.join(tmp, "outbox.db")
+        at = AppTest.from_file(os.path.abspath("mail.py"), default_timeout=60)
+        start = time.perf_counter()
+        at.run()
+        report["first_run_ms"] = round((time.perf_counter() - start) * 1000, 3)
+        samples = []
+        for _ in range(min(args.requests, 50)):
+            start = time.perf_counter()
+            at.run()
+            samples.append((time.perf_counter() - start) * 1000)
+        report["rerun"] = summarize(samples)
+    return report
+
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "2025-November.json")
+
+
+def corpus_trace(path=CORPUS_PATH):
+    """A Bedrock Flow-shaped trace as large as the 2025-November thread set.
+
+    Every thread becomes a retrieval node output and Prompt_1's input comes
+    last, which is the worst case for a linear scan.
+    """
+    with open(path, encoding="utf-8") as f:
+        threads = json.load(f)
+    trace = []
+    for i, thread in enumerate(threads):
+        trace.append({"trace": {"nodeOutputTrace": {
+            "nodeName": f"Retrieval_{i}",
+            "timestamp": f"2025-11-18T12:00:{i % 60:02d}Z",
+            "fields": [{"nodeOutputName": "documents", "content": {"document": thread["llm_context_text"]}}],
+        }}})
+    contexts = [thread["llm_context_text"] for thread in threads]
+    trace.append({"trace": {"nodeInputTrace": {
+        "nodeName": "Prompt_1",
+        "timestamp": "2025-11-18T12:01:00Z",
+        "fields": [
+            {"nodeInputName": "faq_answer", "content": {"document": "\n".join(contexts[:20])}},
+            {"nodeInputName": "rss_answer", "content": {"document": "\n".join(contexts[20:40])}},
+            {"nodeInputName": "mail_answer", "content": {"document": "\n".join(contexts[40:60])}},
+        ],
+    }}})
+    return trace
+
+
+def bench_trace(args):
+    """Per-rerun cost of reading Prompt_1 fields: raw trace scan vs. trace index."""
+    trace = corpus_trace()
+    raw_text = json.dumps(trace, ensure_ascii=False)
+
+    start = time.perf_counter()
+    index = trace_index.build_trace_index(trace)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = outbox_store.OutboxStore(os.path.join(tmp, "outbox.db"))
+        email_id = store.add("bench", {"to": "hotline@metu.edu.tr", "subject": "s", "body": "b",
+                                       "time": "17 Oct, 12:00"}, {"result": "r", "trace": trace})
+        return {
+            "scenario": "trace",
+            "trace_bytes": len(raw_text.encode("utf-8")),
+            "trace_events": len(trace),
+            "build_index_ms": round(build_ms, 3),
+            "raw_scan": summarize(_timed(
+                lambda: trace_index.extract_prompt_fields(json.loads(raw_text)), args.requests)),
+            "index_lookup_in_memory": summarize(_timed(
+                lambda: trace_index.node_fields(index, "Prompt_1"), args.requests)),
+            "store_raw_scan": summarize(_timed(
+                lambda: trace_index.extract_prompt_fields(store.get_trace(email_id)), args.requests)),
+            "store_node_lookup": summarize(_timed(
+                lambda: store.node_fields(email_id, "Prompt_1"), args.requests)),
+        }
+
+
+def _test_questions(path=TEST_DATA_PATH):
+    with open(path, encoding="utf-8") as f:
+        return [row["question"] for row in map(json.loads, filter(str.strip, f)) if row.get("question")]
+
+
+def _compose_submit(url, store, question):
+    """What a Compose submit does server-side: POST, index the trace, store the email."""
+    start = time.perf_counter()
+    data = lambda_client.post_json(url, {"input": {"query": question, "thread_id": ""}})
+    store.add("bench", {"created_at": time.time(), "thread_id": "", "to": "hotline@metu.edu.tr",
+                        "subject": question[:40], "body": question, "time": "17 Oct, 12:00"}, data)
+    return (time.perf_counter() - start) * 1000
+
+
+def bench_load(args):
+    """End-to-end load against a mock Lambda replaying results.json.
+
+    single_user: one user sending Compose submits back to back.
+    burst: --burst users submitting at the same instant.
+    batch: "Analyze all" over every test_data.jsonl question via run_batch.
+    """
+    server, url = start_mock_server(
+        delay=args.delay, jitter=args.jitter, answers=load_answers(RESULTS_PATH),
+        trace_kb=args.trace_kb, seed=args.seed
+    )
+    questions = _test_questions()
+    report = {"scenario": "load", "delay_s": args.delay, "jitter_s": args.jitter, "trace_kb": args.trace_kb}
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            store = outbox_store.OutboxStore(os.path.join(tmp, "outbox.db"))
+            lambda_client.post_json(url, {"input": {"query": "warmup", "thread_id": ""}})
+
+            n = min(args.requests, len(questions))
+            start = time.perf_counter()
+            samples = [_compose_submit(url, store, question) for question in questions[:n]]
+            wall = time.perf_counter() - start
+            report["single_user"] = dict(summarize(samples), throughput_rps=_throughput(n, wall))
+
+            barrier = threading.Barrier(args.burst)
+            samples = [None] * args.burst
+
+            def submit(i):
+                barrier.wait()
+                samples[i] = _compose_submit(url, store, questions[i % len(questions)])
+
+            threads = [threading.Thread(target=submit, args=(i,)) for i in range(args.burst)]
+            start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            wall = time.perf_counter() - start
+            report["burst"] = dict(summarize(samples), users=args.burst, throughput_rps=_throughput(args.burst, wall))
+
+            start = time.perf_counter()
+            samples = lambda_client.run_batch(lambda q: _compose_submit(url, store, q), questions)
+            wall = time.perf_counter() - start
+            report["batch"] = dict(summarize(samples), concurrency=lambda_client.BATCH_CONCURRENCY,
+                                   throughput_rps=_throughput(len(questions), wall))
+    finally:
+        server.shutdown()
+    return report
+
+
+def bench_micro(args):
+    """Parsing helpers on a corpus-sized trace and on recorded redirections."""
+    trace = corpus_trace()
+    prompt_fields = trace[-1]["trace"]["nodeInputTrace"]["fields"]
+    retrieval_fields = [field for item in trace[:-1] for field in item["trace"]["nodeOutputTrace"]["fields"]]
+    redirection = {"score": 0.87, "metadata": {"name": "Bilgi İşlem Daire Başkanlığı",
+                                               "emails": "hotline@metu.edu.tr"}}
+    return {
+        "scenario": "micro",
+        "trace_bytes": len(json.dumps(trace, ensure_ascii=False).encode("utf-8")),
+        "trace_events": len(trace),
+        "extract_prompt_fields": summarize(_timed(
+            lambda: trace_index.extract_prompt_fields(trace), args.requests), digits=6),
+        "map_fields_prompt": summarize(_timed(
+            lambda: trace_index._map_fields(prompt_fields), args.requests, inner=100), digits=6),
+        "map_fields_all_retrieval": summarize(_timed(
+            lambda: trace_index._map_fields(retrieval_fields), args.requests, inner=10), digits=6),
+        "extract_redirection_summary": summarize(_timed(
+            lambda: trace_index.extract_redirection_summary(redirection), args.requests, inner=1000), digits=6),
+    }
+
+
+def _recorded_department(response, departments):
+    """Department a recorded answer points to: the earliest e-mail or name it mentions."""
+    text = text_normalize.normalize(response, greetings=False, signature=False, pii=False)
+    found = []
+    for department in departments:
+        needles = [email.strip() for email in department["emails"].split(",") if email.strip()]
+        needles += [text_normalize.normalize(part, greetings=False, signature=False, pii=False) for part in department["name"].split("/") if part.strip()]
+        positions = [text.find(needle) for needle in needles if needle and needle in text]
+        if positions:
+            found.append((min(positions), department["department"]))
+    return min(found)[1] if found else None
+
+
+def bench_router(args):
+    """Local department router: index build, per-query latency and agreement with results.json."""
+    start = time.perf_counter()
+    department_router = router.DepartmentRouter.from_directory()
+    build_ms = (time.perf_counter() - start) * 1000
+
+    questions = _test_questions()
+    latencies = []
+    for question in questions:
+        start = time.perf_counter()
+        department_router.route(question)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    labeled = top1 = top3 = 0
+    by_confidence = {threshold: [0, 0] for threshold in (0.0, 0.25, 0.5, 0.75)}
+    for row in load_answers(RESULTS_PATH):
+        expected = _recorded_department(row["response"], department_router.departments)
+        if expected is None:
+            continue
+        labeled += 1
+        matches = department_router.route(row["question"])
+        ranked = [match["department"] for match in matches]
+        top1 += bool(ranked) and ranked[0] == expected
+        top3 += expected in ranked
+        for threshold, counts in by_confidence.items():
+            if matches and matches[0]["confidence"] >= threshold:
+                counts[0] += 1
+                counts[1] += ranked[0] == expected
+    return {
+        "scenario": "router",
+        "departments": len(department_router.departments),
+        "build_index_ms": round(build_ms, 3),
+        "route": summarize(latencies, digits=6),
+        "recorded_answers_labeled": labeled,
+        "top1_accuracy": round(top1 / labeled, 3) if labeled else None,
+        "top3_accuracy": round(top3 / labeled, 3) if labeled else None,
+        "top1_by_min_confidence": {
+            str(threshold): {"routed": routed, "accuracy": round(correct / routed, 3) if routed else None}
+            for threshold, (routed, correct) in by_confidence.items()
+        },
+    }
+
+
+def _corpus_messages(path=CORPUS_PATH):
+    with open(path, encoding="utf-8") as f:
+        threads = json.load(f)
+    return [message.get("content") or "" for thread in threads for message in thread.get("llm_chat_history", [])]
+
+
+def bench_normalize(args):
+    """text_normalize throughput over every message of the 2025-November corpus."""
+    messages = _corpus_messages()
+    megabytes = sum(len(message.encode("utf-8")) for message in messages) / 1e6
+    report = {"scenario": "normalize", "messages": len(messages), "megabytes": round(megabytes, 3)}
+
+    def measure(name, fn):
+        start = time.perf_counter()
+        fn()
+        wall = time.perf_counter() - start
+        report[name] = {"wall_ms": round(wall * 1000, 3), "messages_per_s": _throughput(len(messages), wall),
+                        "mb_per_s": _throughput(megabytes, wall)}
+
+    measure("per_message", lambda: [text_normalize.normalize(message) for message in messages])
+    measure("batch", lambda: text_normalize.normalize_batch(messages))
+    if args.workers > 1:
+        measure(f"batch_{args.workers}_workers",
+                lambda: text_normalize.normalize_batch(messages, workers=args.workers, chunk_size=500))
+    legacy_keys = {" ".join(message.split()).casefold() for message in messages}
+    report["distinct_cache_keys"] = {
+        "whitespace_casefold": len(legacy_keys),
+        "normalize_query": len({response_cache.normalize_query(message) for message in messages}),
+    }
+    return report
+
+
+def bench_similar(args):
+    """Near-duplicate thread lookup: build cost, query latency and recall of the source thread.
+
+    test_data.jsonl questions are the first messages of corpus threads, so
+    each should find its own thread; the edited variant drops the first
+    fifth of the text and prepends a different greeting.
+    """
+    start = time.perf_counter()
+    index = similar_threads.build_index(similar_threads.load_threads(CORPUS_PATH))
+    build_ms = (time.perf_counter() - start) * 1000
+    with open(TEST_DATA_PATH, encoding="utf-8") as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+    report = {"scenario": "similar", "indexed_entries": len(index), "build_index_ms": round(build_ms, 3)}
+    for variant, edit in (("exact", lambda text: text),
+                          ("edited", lambda text: "Merhaba, " + " ".join(text.split()[len(text.split()) // 5:]))):
+        latencies, found = [], 0
+        for row in rows:
+            query = edit(row["question"])
+            start = time.perf_counter()
+            matches = index.query(query, k=1)
+            latencies.append((time.perf_counter() - start) * 1000)
+            found += bool(matches) and matches[0]["thread_id"] == row["id"]
+        report[variant] = dict(summarize(latencies, digits=6), top1_recall=round(found / len(rows), 3))
+    return report
+
+
+def _notebook_ingest(path, output):
+    """test_data_prep.ipynb: pd.read_json, row-wise apply, iterrows."""
+    import pandas as pd
+
+    df = pd.read_json(path)
+    df["question"] = df["llm_chat_history"].apply(
+        lambda x: x[0]["content"] if isinstance(x, list) and len(x) > 0 and isinstance(x[0], dict)
+        and "content" in x[0] else None
+    )
+    jsonl_data = df[["thread_id", "question"]].rename(columns={"thread_id": "id"})
+    with open(output, "w", encoding="utf-8") as f:
+        for _, row in jsonl_data.iterrows():
+            json.dump({"id": row["id"], "question": row["question"]}, f, ensure_ascii=False)
+            f.write("\n")
+
+
+def bench_ingest(args):
+    """Streaming ingestion vs. the notebook's pandas pipeline on a dump --copies times the corpus."""
+    with open(CORPUS_PATH, encoding="utf-8") as f:
+        threads = json.load(f)
+    report = {"scenario": "ingest", "copies": args.copies}
+    with tempfile.TemporaryDirectory() as tmp:
+        dump = os.path.join(tmp, "dump.json")
+        with open(dump, "w", encoding="utf-8") as f:
+            f.write("[")
+            for copy in range(args.copies):
+                for i, thread in enumerate(threads):
+                    f.write("," if copy or i else "")
+                    json.dump(dict(thread, thread_id=f"{thread['thread_id']}#{copy}"), f, ensure_ascii=False)
+            f.write("]")
+        report["input_mb"] = round(os.path.getsize(dump) / 1e6, 3)
+        report["threads"] = len(threads) * args.copies
+        for name, fn in (("streaming", lambda out: ingest_threads.ingest([dump], out)),
+                         ("notebook_pandas", lambda out: _notebook_ingest(dump, out))):
+            output = os.path.join(tmp, f"{name}.jsonl")
+            tracemalloc.start()
+            start = time.perf_counter()
+            fn(output)
+            wall = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            report[name] = {"wall_ms": round(wall * 1000, 3),
+                            "threads_per_s": _throughput(report["threads"], wall),
+                            "peak_python_alloc_mb": round(peak / 1e6, 3)}
+    return report
+
+
+def _scan_replied(threads, sender, since, until):
+    """The regex scan the context index replaces: re-read every llm_context_text per question."""
+    header = re.compile(r"^--- \[Date: ([^\]]*)\] \[From: ([^\]]*)\] \(Reply\) ---", re.MULTILINE)
+    found = []
+    for thread in threads:
+        for date_text, name in header.findall(thread.get("llm_context_text") or ""):
+            parsed = thread_corpus.parse_message_date(date_text)
+            if (context_index.address(name) == sender and parsed
+                    and since <= parsed.timestamp() <= until):
+                found.append(thread["thread_id"])
+                break
+    return found
+
+
+def bench_context(args):
+    """Parse throughput of context_index and "threads X replied to in a week" lookups vs. a regex scan."""
+    with open(CORPUS_PATH, encoding="utf-8") as f:
+        threads = json.load(f)
+    start = time.perf_counter()
+    index = context_index.build_index(threads)
+    build = time.perf_counter() - start
+    dated = sorted(message.date for message in index.messages if message.date >= 0)
+    senders = sorted(index.senders().items(), key=lambda item: item[1], reverse=True)[:5]
+    week = 7 * 86400
+    queries = [(senders[i % len(senders)][0], dated[i % len(dated)], dated[i % len(dated)] + week)
+               for i in range(args.requests)]
+    indexed = [sorted(index.thread_ids(sender=s, kind="Reply", since=a, until=b)) for s, a, b in queries]
+    scanned = [sorted(_scan_replied(threads, s, a, b)) for s, a, b in queries]
+    report = {"scenario": "context", "threads": len(index), "messages": len(index.messages),
+              "build_ms": round(build * 1000, 3),
+              "messages_per_s": _throughput(len(index.messages), build),
+              "results_agree": indexed == scanned}
+    lookups = []
+    for s, a, b in queries:
+        lookups += _timed(lambda: index.thread_ids(sender=s, kind="Reply", since=a, until=b), 1)
+    scans = []
+    for s, a, b in queries[:max(1, args.requests // 10)]:
+        scans += _timed(lambda: _scan_replied(threads, s, a, b), 1)
+    report["index_lookup"] = summarize(lookups, digits=6)
+    report["regex_scan"] = summarize(scans, digits=6)
+    return report
+
+
+# The corpus has one 789-message bounce thread; a conversation with the agent is never that long
+REPLAY_MAX_TURNS = 20
+
+
+def _replays(limit):
+    """Multi-turn conversations from llm_chat_history: (thread_id, [message contents]) with 3+ turns."""
+    replays = []
+    for thread in thread_corpus.iter_threads(CORPUS_PATH):
+        turns = [message["content"] for message in thread.get("llm_chat_history") or []
+                 if (message.get("content") or "").strip()]
+        if len(turns) >= 3:
+            replays.append((thread["thread_id"], turns[:REPLAY_MAX_TURNS]))
+    return replays[:limit]
+
+
+def _replay(url, replays, context, retries):
+    """Send every turn of every replay in order (threads in parallel); per-request samples."""
+    def run(replay):
+        thread_id, turns = replay
+        samples = []
+        for turn in turns:
+            for _ in range(1 + retries):
+                plan = context.prepare(thread_id, turn) if context else {
+                    "action": "plain", "answer": None, "payload": {"input": {"query": turn, "thread_id": thread_id}}}
+                if plan["answer"] is not None:
+                    samples.append({"action": plan["action"], "ms": 0.0, "bytes": 0, "context_tokens": 0})
+                    continue
+                body = json.dumps(plan["payload"], ensure_ascii=False).encode("utf-8")
+                start = time.perf_counter()
+                data = lambda_client.post_json(url, plan["payload"])
+                ms = (time.perf_counter() - start) * 1000
+                if context:
+                    context.record(plan, data["result"], data)
+                samples.append({"action": plan["action"], "ms": ms, "bytes": len(body),
+                                "context_tokens": data["context_tokens"]})
+        return samples
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        return [sample for samples in executor.map(run, replays) for sample in samples]
+
+
+def bench_compaction(args):
+    """Multi-turn replays from llm_chat_history with and without conversation_context compaction.
+
+    The mock agent keeps per-thread memory like the real one, so baseline
+    prompts grow with every turn; --token-delay turns prompt size into latency.
+    "with_retries" sends every turn twice in a row, as in thrash.json.
+    """
+    replays = _replays(args.requests)
+    report = {"scenario": "compaction", "threads": len(replays), "turns": sum(len(t) for _, t in replays),
+              "token_budget": conversation_context.DEFAULT_TOKEN_BUDGET, "token_delay": args.token_delay}
+    for variant, retries in (("as_recorded", 0), ("with_retries", 1)):
+        report[variant] = {}
+        for mode in ("baseline", "compacted"):
+            server, url = start_mock_server(delay=args.delay, token_delay=args.token_delay, seed=args.seed)
+            try:
+                context = conversation_context.ConversationContext() if mode == "compacted" else None
+                start = time.perf_counter()
+                samples = _replay(url, replays, context, retries)
+                wall = time.perf_counter() - start
+            finally:
+                server.shutdown()
+                server.server_close()
+            sent = [sample for sample in samples if sample["action"] != conversation_context.REPEAT]
+            actions = {}
+            for sample in samples:
+                actions[sample["action"]] = actions.get(sample["action"], 0) + 1
+            report[variant][mode] = {
+                "wall_ms": round(wall * 1000, 3),
+                "requests_sent": len(sent),
+                "actions": actions,
+                "request_kb": round(sum(sample["bytes"] for sample in sent) / 1024, 3),
+                "context_tokens_total": sum(sample["context_tokens"] for sample in sent),
+                "context_tokens_p50": percentile([sample["context_tokens"] for sample in sent], 50),
+                "context_tokens_max": max((sample["context_tokens"] for sample in sent), default=0),
+                "latency": summarize([sample["ms"] for sample in samples]),
+            }
+    return report
+
+
+def bench_prefetch(args):
+    """Time from Send to answer after a template load, with and without speculative prefetch.
+
+    The user "reads" the template for a think time before pressing Send.
+    A typing session then shows what debounce, cancellation and the budget
+    let through: edits every 0.3 s, pauses longer than the debounce.
+    """
+    delay = args.delay or 1.0
+    server, url = start_mock_server(delay=delay, seed=args.seed)
+    questions = _test_questions()
+
+    def ask(body, thread_id):
+        return lambda_client.post_json(url, {"input": {"query": body, "thread_id": thread_id}})
+
+    report = {"scenario": "prefetch", "agent_delay_s": delay, "think_time": {}}
+    try:
+        prefetcher = prefetch.Prefetcher(ask, debounce=0.5, budget=1000, window=3600)
+        for n, think in enumerate((0.0, 0.25, 0.5, 1.0, 1.5)):
+            think_s = think * delay
+            plain, speculative = [], []
+            for i in range(3):
+                body = f"{questions[(n * 3 + i) % len(questions)]} #{n}-{i}"
+                start = time.perf_counter()
+                ask(body + " (plain)", None)
+                plain.append((time.perf_counter() - start) * 1000)
+                prefetcher.observe("bench", body, immediate=True)
+                time.sleep(think_s)
+                start = time.perf_counter()
+                future = prefetcher.claim("bench", body)
+                future.result() if future else ask(body, None)
+                speculative.append((time.perf_counter() - start) * 1000)
+            report["think_time"][f"{think_s:g}s"] = {"without_prefetch": summarize(plain),
+                                                     "with_prefetch": summarize(speculative)}
+
+        typing = prefetch.Prefetcher(ask, debounce=0.5, budget=3, window=3600)
+        draft = "Merhaba, eduroam"
+        for i, pause in enumerate((0.3, 0.3, 0.8, 0.3, 0.8, 0.3, 0.8, 0.8, 0.8)):
+            draft += f" kelime{i}"
+            deadline = time.perf_counter() + pause
+            while time.perf_counter() < deadline:
+                typing.observe("typist", draft)  # what the Compose fragment does on each tick
+                time.sleep(0.1)
+        typing.claim("typist", draft)
+        report["typing_session"] = dict(typing.counts, edits=9, budget=typing.budget)
+    finally:
+        server.shutdown()
+        server.server_close()
+    return report
+
+
+def bench_incoming(args):
+    """old_ui Incoming renders: one agent call per email per render vs. the memoized analysis store.
+
+    Each inbox size is rendered three times: a first visit, a revisit, and
+    a revisit after one more email arrived.
+    """
+    delay = args.delay or 0.5
+    server, url = start_mock_server(delay=delay, seed=args.seed)
+    questions = _test_questions()
+
+    def analyse(body):
+        return lambda_client.post_json(url, {"input": {"query": body}})["result"]
+
+    report = {"scenario": "incoming", "agent_delay_s": delay, "sizes": {}}
+    try:
+        for size in args.sizes:
+            bodies = [f"{questions[i % len(questions)]} #{size}-{i}" for i in range(size)]
+            renders = {"first": bodies, "revisit": bodies, "new_email": bodies + [f"yeni e-posta #{size}"]}
+            entry = {}
+            for name, render_bodies in renders.items():
+                start = time.perf_counter()
+                for body in render_bodies:
+                    analyse(body)
+                entry.setdefault("per_render_calls", {})[name] = round((time.perf_counter() - start) * 1000, 3)
+            store = email_analysis.AnalysisStore(analyse)
+            for name, render_bodies in renders.items():
+                start = time.perf_counter()
+                for future in store.analyze(render_bodies):
+                    future.result()
+                entry.setdefault("analysis_store", {})[name] = round((time.perf_counter() - start) * 1000, 3)
+            entry["agent_calls"] = {"per_render_calls": sum(len(b) for b in renders.values()),
+                                    "analysis_store": store.counts["computed"]}
+            report["sizes"][size] = entry
+    finally:
+        server.shutdown()
+        server.server_close()
+    return report
+
+
+# Each load runs in a fresh interpreter so its peak RSS is not shared with the others
+_ARCHIVE_LOADS = {
+    "json_load": (
+        "import json\n"
+        "with open(PATH, encoding='utf-8') as f:\n"
+        "    threads = json.load(f)\n"
+        "senders = [m.get('name') for t in threads for m in t['llm_chat_history']]\n"
+    ),
+    "archive_projection": (
+        "import thread_archive\n"
+        "with thread_archive.ThreadArchive(PATH) as archive:\n"
+        "    senders = list(archive.column('messages', 'sender'))\n"
+    ),
+}
+_ARCHIVE_PROBE = (
+    "import json, resource, sys, time\n"
+    "PATH = sys.argv[1]\n"
+    "start = time.perf_counter()\n"
+    "{load}"
+    "wall = time.perf_counter() - start\n"
+    "print(json.dumps({{'wall_ms': round(wall * 1000, 3), 'rows': len(senders),\n"
+    "                  'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}}))\n"
+)
+
+
+def bench_archive(args):
+    """Open a --copies dump with json.load vs. the mmap archive, projecting one message column."""
+    with open(CORPUS_PATH, encoding="utf-8") as f:
+        threads = json.load(f)
+    report = {"scenario": "archive", "copies": args.copies}
+    with tempfile.TemporaryDirectory() as tmp:
+        dump = os.path.join(tmp, "dump.json")
+        with open(dump, "w", encoding="utf-8") as f:
+            json.dump(threads * args.copies, f, ensure_ascii=False)
+        path = os.path.join(tmp, "dump.mtar")
+        start = time.perf_counter()
+        rows = thread_archive.build_archive(thread_corpus.iter_threads(dump), path)
+        report["build_ms"] = round((time.perf_counter() - start) * 1000, 3)
+        report["rows"] = rows
+        report["json_mb"] = round(os.path.getsize(dump) / 1e6, 3)
+        report["archive_mb"] = round(os.path.getsize(path) / 1e6, 3)
+        for name, load in _ARCHIVE_LOADS.items():
+            runs = []
+            for _ in range(3):
+                output = subprocess.run(
+                    [sys.executable, "-c", _ARCHIVE_PROBE.format(load=load), dump if name == "json_load" else path],
+                    cwd=ROOT, capture_output=True, text=True, check=True
+                ).stdout
+                runs.append(json.loads(output))
+            report[name] = dict(min(runs, key=lambda run: run["wall_ms"]),
+                                wall_ms_runs=[run["wall_ms"] for run in runs])
+    return report
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+SUITE = ("load", "micro", "trace", "router", "normalize", "similar", "startup")
+
+
+def bench_suite(args):
+    """Run SUITE scenarios, each in a fresh process, into one report."""
+    passthrough = ["--requests", str(args.requests), "--delay", str(args.delay), "--jitter", str(args.jitter),
+                   "--burst", str(args.burst), "--trace-kb", str(args.trace_kb), "--seed", str(args.seed)]
+    report = {"scenario": "suite", "commit": _git_commit(), "recorded_at": time.time(), "results": {}}
+    for scenario in SUITE:
+        output = subprocess.run([sys.executable, os.path.abspath(__file__), scenario] + passthrough,
+                                cwd=ROOT, capture_output=True, text=True, check=True).stdout
+        report["results"][scenario] = json.loads(output)
+    return report
+
+
+SCENARIOS = {
+    "client": bench_client,
+    "stream": bench_stream,
+    "outbox": bench_outbox,
+    "render": bench_render,
+    "diagram": bench_diagram,
+    "startup": bench_startup,
+    "trace": bench_trace,
+    "load": bench_load,
+    "micro": bench_micro,
+    "router": bench_router,
+    "normalize": bench_normalize,
+    "similar": bench_similar,
+    "ingest": bench_ingest,
+    "archive": bench_archive,
+    "context": bench_context,
+    "compaction": bench_compaction,
+    "prefetch": bench_prefetch,
+    "incoming": bench_incoming,
+    "suite": bench_suite,
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run Mail Assistant benchmarks.")
+    parser.add_argument("scenario", choices=sorted(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--delay", type=float, default=0.0, help="Mock Lambda response delay in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Mock Lambda +/- delay in seconds")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the mock's per-query jitter")
+    parser.add_argument("--trace-kb", type=int, default=200, help="Synthetic trace size in load answers")
+    parser.add_argument("--token-delay", type=float, default=0.005,
+                        help="Mock Lambda seconds per 1000 prompt tokens held for a thread")
+    parser.add_argument("--burst", type=int, default=20, help="Simultaneous Compose submits in the load scenario")
+    parser.add_argument("--chunk-delay", type=float, default=0.02, help="Delay between streamed chunks")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000], help="Outbox sizes to test")
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--reruns", type=int, default=5, help="Timed Incoming reruns per size in the outbox scenario")
+    parser.add_argument("--before", help="Older mail.py to compare against in the render scenario")
+    parser.add_argument("--copies", type=int, default=20, help="Corpus copies in the ingest and archive input")
+    parser.add_argument("--workers", type=int, default=1, help="Processes for the normalize batch run")
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    args = parser.parse_args()
+    report = SCENARIOS[args.scenario](args)
+    if args.scenario != "suite":
+        report["peak_rss_kb"] = peak_rss_kb()
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
@@ -0,0 +1,28 @@
+"""
+Quick templates offered in the Compose sidebar of mail.py.
+
+Kept in a module so the list is built once per process instead of on
+every script rerun.
+"""
+
+QUICK_TEMPLATES = [
+    # --- Orijinal Sorular ---
+    {"label": "🎓 Instructor Change", "to": "hotline@metu.edu.tr", "subject": "Instructor Change Request", "body": "Merhaba. Bu Dönem emekli olan bölümümüz hocalarından Prof.Dr. Ali Eryılmazın\nöğrencisi 2599686 numaralı öğrencisi Semra Sıkıra'ın Danışman değişikliği\nyapması gerekmektedir. Ali hocamız sisteme giremediği için öğrenciyi\nbırakamıyor. Nasıl yapabiliriz?\n\n\nKevser Özkan \n\n4049"},
+    {"label": "🔒 VPN Issue", "to": "hotline@metu.edu.tr", "subject": "VPN Connection Problem", "body": "Merhaba hocam,\n\nİyi günler, VPN indirdiğim masaüstü bilgisayarımda eklerde belirttiğim gibi bir uyarı alıyorum ve indirmek istediğim lisanslı uygulamaların olduğu “https:\/\/software.cc.metu.edu.tr\/download.php” linke ulaşamıyorum. VPN bağlandığı halde bu linke tıkladığımda güvenli bulunmadığından yine bağlanamıyorum. Yardımcı olursanız çok sevinirim.\n\nTeşekkürler,\nAzra"},
+    {"label": "❓ Eduroam", "to": "academic@metu.edu.tr", "subject": "Cannot Connect to Eduroam", "body": "Merhaba hocam,\n\nİyi günler, eduroma nasıl bağlanabilirim? İyi çalışmalar, Mert Ali Yalçın"},
+
+    # --- Genel Bilgi Soruları ---
+    {"label": "🇬🇧 Eğitim Dili", "to": "tanitim@metu.edu.tr", "subject": "Eğitim Dili Hakkında Bilgi", "body": "Merhaba,\n\nODTÜ'de eğitim dili nedir? Tamamı İngilizce mi yoksa Türkçe bölümler de var mı?\n\nSaygılarımla."},
+    {"label": "💰 Burs Olanakları", "to": "bursofisi@metu.edu.tr", "subject": "Burs Olanakları Hakkında", "body": "İyi günler,\n\nÜniversitenizin sunduğu burs olanakları nelerdir? Başarı bursu ve ihtiyaç bursu kriterleri hakkında bilgi alabilir miyim?\n\nTeşekkürler."},
+    {"label": "🤝 Mezun Ağı", "to": "mezun@metu.edu.tr", "subject": "Mezun İletişim Ağı", "body": "Merhaba,\n\nODTÜ mezunları arası iletişim ve bilgi ağı ne kadar gelişmiş durumda? Mezunlar Derneği'nin aktif çalışmaları var mı?"},
+    {"label": "❓ Genel Sorular", "to": "iletisim@metu.edu.tr", "subject": "İlgili Birim Yönlendirmesi", "body": "Merhaba,\n\nODTÜ ile ilgili genel sorularım var, hangi birim ile görüşmeliyim? Yönlendirebilirseniz sevinirim."},
+
+    # --- Öğrenci İşleri (Kayıt/Ders) Soruları ---
+    {"label": "📝 Ara Dönem Kayıt", "to": "oidb@metu.edu.tr", "subject": "Hazırlık Atlama ve Ara Dönem", "body": "Sayın Yetkili,\n\nKayıtlardan sonra birinci dönem sonunda İYS-IELTS-TOEFL-PTE belgelerinden herhangi birini vererek ara dönemde (Irregular olarak) birinci sınıf öğrencisi olunabilir mi?\n\nBilgilerinize arz ederim."},
+    {"label": "📋 Geç Kayıt/Ekle-Bırak", "to": "oidb@metu.edu.tr", "subject": "Ders Ekleme-Bırakma ve Geç Kayıt Prosedürü", "body": "Sayın Yetkili,\n\nDers ekleme-bırakma süresi bittikten sonra ders ekleme-bırakma işlemleri nasıl yapılmaktadır?\n\nAyrıca, etkileşimli kayıtlarda kayıt yaptırmayan öğrencilerin kayıt işlemleri için izlemesi gereken prosedür nedir?\n\nBilgilerinize arz ederim."},
+    {"label": "💼 Staj ve Sigorta", "to": "staj@metu.edu.tr", "subject": "Staj İşlemleri ve Sigorta Hakkında", "body": "Merhaba,\n\nStaj başvurusu ve staj süresince yaptırılan sigorta işlemleri ile ilgili detaylı bilgiyi nereden alabilirim? Başvuru sürecinde hangi belgeler gereklidir?\n\nYardımlarınız için teşekkürler."},
+
+    # --- YENİ EKLENENLER (Diploma & Yan Dal) ---
+    {"label": "📜 Diploma Kaybı", "to": "oidb@metu.edu.tr", "subject": "Diploma İkinci Nüsha Talebi", "body": "Sayın Yetkili,\n\nDiplomamı kaybettim. İkinci kopya (nüsha) sizden alabilir miyim? Bunun için gerekli prosedür ve belgeler nelerdir?\n\nBilgilerinize arz ederim."},
+    {"label": "📚 İkinci Yan Dal", "to": "oidb@metu.edu.tr", "subject": "İkinci Yan Dal Programı Başvurusu", "body": "Merhaba,\n\nŞu anda bir yan dal programına kayıtlıyım. Başka bir program için başvuru yapabilir miyim? Kabul olmam halinde aynı anda iki yan dal programı izleyebilir miyim?\n\nSaygılarımla."}
+]
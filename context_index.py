@@ -0,0 +1,322 @@
+"""
+Message-level parsing and indexing of llm_context_text.
+
+Every thread in a dump carries its conversation as one flat string:
+
+    Subject: [HOTLINE: 267435] Metu Mailine girememek
+    Participants: isim at metu.edu.tr, hotline at metu.edu.tr, ...
+
+    --- [Date: Tue, 18 Nov 2025 12:19:23 -0000] [From: isim at metu.edu.tr] (Original) ---
+    Merhabalar, ...
+
+    --- [Date: ...] [From: hotline at metu.edu.tr] (Reply) ---
+    ...
+
+parse_context() splits it in one pass with a single compiled header pattern
+into slotted Message records (the body is everything up to the next header).
+ContextIndex keeps those records with secondary indexes by sender address,
+by participant and by date, so "threads hotline@ replied to last week" is a
+dictionary lookup plus a bisect rather than a regex scan over every thread.
+
+Addresses are compared in canonical form: "hotline at metu.edu.tr",
+"hotline@metu.edu.tr" and "Hotline <hotline@metu.edu.tr>" are one sender.
+
+Usage:
+    python context_index.py verify 2025-November.json --mutations 20
+    python context_index.py query 2025-November.json --sender hotline@metu.edu.tr \\
+        --kind Reply --since 2025-11-10 --until 2025-11-17
+"""
+
+import argparse
+import json
+import random
+import re
+import time
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+
+import thread_corpus
+
+_HEADER_RE = re.compile(
+    r"^--- \[Date: (?P<date>[^\]\n]*)\] \[From: (?P<sender>[^\]\n]*)\] \((?P<kind>\w+)\) ---[ \t]*$",
+    re.MULTILINE
+)
+_ADDRESS_RE = re.compile(r"[\w.+-]+(?:@| at )[\w-]+(?:\.[\w-]+)+")
+_NO_DATE = -1
+
+
+def address(name):
+    """Canonical lowercase e-mail address of a sender or participant string."""
+    name = (name or "").strip().lower()
+    match = _ADDRESS_RE.search(name)
+    return match.group(0).replace(" at ", "@") if match else name
+
+
+def _epoch(value):
+    """Epoch seconds from a datetime, a date string (ISO or mail format) or a number."""
+    if value is None or isinstance(value, (int, float)):
+        return value
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            value = thread_corpus.parse_message_date(value)
+            if value is None:
+                raise ValueError("unrecognised date") from None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=thread_corpus.LOCAL_TZ)
+    return int(value.timestamp())
+
+
+class Message:
+    __slots__ = ("thread_id", "position", "date", "date_text", "sender", "address", "kind", "content")
+
+    def __init__(self, thread_id, position, date_text, sender, kind, content):
+        self.thread_id = thread_id
+        self.position = position
+        self.date_text = date_text
+        parsed = thread_corpus.parse_message_date(date_text)
+        self.date = int(parsed.timestamp()) if parsed else _NO_DATE
+        self.sender = sender
+        self.address = address(sender)
+        self.kind = kind
+        self.content = content
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class ParsedThread:
+    __slots__ = ("thread_id", "subject", "participants", "messages")
+
+    def __init__(self, thread_id, subject, participants, messages):
+        self.thread_id = thread_id
+        self.subject = subject
+        self.participants = participants
+        self.messages = messages
+
+
+def parse_context(text, thread_id=None):
+    """Parse one llm_context_text into a ParsedThread."""
+    text = text or ""
+    headers = list(_HEADER_RE.finditer(text))
+    preamble = text[:headers[0].start()] if headers else text
+    subject, participants = "", []
+    for line in preamble.splitlines():
+        if line.startswith("Subject:"):
+            subject = line[len("Subject:"):].strip()
+        elif line.startswith("Participants:"):
+            seen = {}
+            for name in line[len("Participants:"):].split(","):
+                if name.strip():
+                    seen.setdefault(address(name), None)
+            participants = list(seen)
+    messages = []
+    for i, header in enumerate(headers):
+        end = headers[i + 1].start() if i + 1 < len(headers) else len(text)
+        messages.append(Message(thread_id, i, header.group("date"), header.group("sender"),
+                                header.group("kind"), text[header.end():end].strip()))
+    return ParsedThread(thread_id, subject, participants, messages)
+
+
+def render_context(parsed):
+    """Inverse of parse_context(), in the dump's layout."""
+    lines = [f"Subject: {parsed.subject}", f"Participants: {', '.join(parsed.participants)}", ""]
+    for message in parsed.messages:
+        lines.append(f"--- [Date: {message.date_text}] [From: {message.sender}] ({message.kind}) ---")
+        lines.append(message.content)
+        lines.append("")
+    return "\n".join(lines)
+
+
+class ContextIndex:
+    """Parsed threads with lookups by sender, participant and date range."""
+
+    def __init__(self):
+        self.threads = {}
+        self.messages = []
+        self._by_sender = {}  # address -> [message number]
+        self._by_participant = {}  # address -> [thread_id]
+        self._dates = None  # sorted (date, message number), rebuilt after add()
+
+    def __len__(self):
+        return len(self.threads)
+
+    def add(self, parsed):
+        """Index a ParsedThread; a thread_id seen before is skipped (first dump wins) and False returned."""
+        if parsed.thread_id in self.threads:
+            return False
+        self.threads[parsed.thread_id] = parsed
+        for message in parsed.messages:
+            self._by_sender.setdefault(message.address, []).append(len(self.messages))
+            self.messages.append(message)
+        participants = set(parsed.participants) | {message.address for message in parsed.messages}
+        for participant in participants:
+            self._by_participant.setdefault(participant, []).append(parsed.thread_id)
+        self._dates = None
+        return True
+
+    def add_thread(self, thread):
+        """Parse and index a dump-shaped thread."""
+        return self.add(parse_context(thread.get("llm_context_text"), thread.get("thread_id")))
+
+    def senders(self):
+        return {sender: len(numbers) for sender, numbers in self._by_sender.items()}
+
+    def participant_threads(self, participant):
+        return list(self._by_participant.get(address(participant), ()))
+
+    def _date_range(self, since, until):
+        if self._dates is None:
+            pairs = sorted((message.date, number) for number, message in enumerate(self.messages)
+                           if message.date != _NO_DATE)
+            self._dates = ([date for date, _ in pairs], [number for _, number in pairs])
+        dates, numbers = self._dates
+        lo = 0 if since is None else bisect_left(dates, since)
+        hi = len(dates) if until is None else bisect_right(dates, until)
+        return numbers[lo:hi]
+
+    def query(self, sender=None, participant=None, since=None, until=None, kind=None):
+        """Messages matching every given filter, in index order.
+
+        since/until are inclusive and accept datetimes, ISO or mail date
+        strings, or epoch seconds; naive values are taken as LOCAL_TZ.
+        """
+        candidates = None
+        if sender is not None:
+            candidates = self._by_sender.get(address(sender), [])
+        if since is not None or until is not None:
+            in_range = self._date_range(_epoch(since), _epoch(until))
+            candidates = in_range if candidates is None else sorted(set(candidates).intersection(in_range))
+        if candidates is None:
+            candidates = range(len(self.messages))
+        threads = None if participant is None else set(self._by_participant.get(address(participant), ()))
+        results = []
+        for number in candidates:
+            message = self.messages[number]
+            if kind is not None and message.kind != kind:
+                continue
+            if threads is not None and message.thread_id not in threads:
+                continue
+            results.append(message)
+        return results
+
+    def thread_ids(self, **filters):
+        """Distinct thread_ids of query(**filters), in first-match order."""
+        return list(dict.fromkeys(message.thread_id for message in self.query(**filters)))
+
+
+def build_index(threads):
+    index = ContextIndex()
+    for thread in threads:
+        index.add_thread(thread)
+    return index
+
+
+def _check_against_history(parsed, history):
+    """Disagreements between parsed messages and the thread's llm_chat_history."""
+    problems = []
+    if len(parsed.messages) != len(history):
+        return [f"{len(parsed.messages)} messages parsed, {len(history)} in llm_chat_history"]
+    for message, expected in zip(parsed.messages, history):
+        if message.sender != expected.get("name"):
+            problems.append(f"message {message.position}: sender {message.sender!r}")
+        if message.kind != (expected.get("metadata") or {}).get("type"):
+            problems.append(f"message {message.position}: kind {message.kind!r}")
+        if message.date_text != expected.get("timestamp"):
+            problems.append(f"message {message.position}: date {message.date_text!r}")
+        if message.content != (expected.get("content") or "").strip():
+            problems.append(f"message {message.position}: content differs")
+    return problems
+
+
+def _mutate(text, rng):
+    """A randomly damaged copy of a context text."""
+    if not text:
+        return text
+    cut = rng.randrange(len(text))
+    choice = rng.randrange(5)
+    if choice == 0:
+        return text[:cut]
+    if choice == 1:
+        return text[:cut] + text[cut + rng.randrange(1, 200):]
+    if choice == 2:
+        return text[:cut] + "\n--- [Date: " + text[cut:]
+    if choice == 3:
+        return text[:cut] + rng.choice(["]", "[", "\n---", " ---\n", "\r\n", "\x00", "İ"]) + text[cut:]
+    return text[:cut] + "\n--- [Date: ] [From: ] (Reply) ---\n" + text[cut:]
+
+
+def verify(paths, mutations=20, seed=0):
+    """Parse every thread and compare it with llm_chat_history, then fuzz the parser.
+
+    Checks: parsed records match llm_chat_history; render/parse round-trips;
+    damaged texts (truncated, spliced, stray header fragments) never raise
+    and only yield message bodies that are substrings of the damaged text.
+    """
+    rng = random.Random(seed)
+    report = {"threads": 0, "messages": 0, "mismatched_threads": {}, "round_trip_failures": [],
+              "mutations": 0, "mutation_failures": []}
+    start = time.perf_counter()
+    parse_s = 0.0
+    for thread in thread_corpus.iter_threads(paths):
+        text = thread.get("llm_context_text") or ""
+        thread_id = thread.get("thread_id")
+        parse_start = time.perf_counter()
+        parsed = parse_context(text, thread_id)
+        parse_s += time.perf_counter() - parse_start
+        report["threads"] += 1
+        report["messages"] += len(parsed.messages)
+        problems = _check_against_history(parsed, thread.get("llm_chat_history") or [])
+        if problems:
+            report["mismatched_threads"][thread_id] = problems[:5]
+        again = parse_context(render_context(parsed), thread_id)
+        if ([message.as_dict() for message in again.messages] != [message.as_dict() for message in parsed.messages]
+                or again.subject != parsed.subject or again.participants != parsed.participants):
+            report["round_trip_failures"].append(thread_id)
+        for _ in range(mutations):
+            damaged = _mutate(text, rng)
+            report["mutations"] += 1
+            try:
+                result = parse_context(damaged, thread_id)
+            except Exception as e:  # any exception is a parser bug
+                report["mutation_failures"].append(f"{thread_id}: {type(e).__name__}: {e}")
+                continue
+            if any(message.content not in damaged for message in result.messages):
+                report["mutation_failures"].append(f"{thread_id}: content not taken from the text")
+    report["parse_ms_total"] = round(parse_s * 1000, 3)
+    report["wall_ms"] = round((time.perf_counter() - start) * 1000, 3)
+    report["ok"] = not (report["mismatched_threads"] or report["round_trip_failures"]
+                        or report["mutation_failures"])
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parse and query llm_context_text of thread dumps.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    check = commands.add_parser("verify", help="Check the parser against every thread and fuzz it")
+    check.add_argument("inputs", nargs="+")
+    check.add_argument("--mutations", type=int, default=20, help="Damaged variants parsed per thread")
+    check.add_argument("--seed", type=int, default=0)
+    lookup = commands.add_parser("query", help="List threads matching sender/participant/date/kind")
+    lookup.add_argument("inputs", nargs="+")
+    lookup.add_argument("--sender")
+    lookup.add_argument("--participant")
+    lookup.add_argument("--since", help="ISO date or datetime, inclusive (a date is its midnight)")
+    lookup.add_argument("--until", help="ISO date or datetime, inclusive (a date is its midnight)")
+    lookup.add_argument("--kind", choices=["Original", "Reply"])
+    args = parser.parse_args()
+
+    if args.command == "verify":
+        result = verify(args.inputs, args.mutations, args.seed)
+        print(json.dumps(result, indent=2, ensure_ascii=False))
+        raise SystemExit(0 if result["ok"] else 1)
+    index = build_index(thread_corpus.iter_threads(args.inputs))
+    filters = dict(sender=args.sender, participant=args.participant, since=args.since, until=args.until,
+                   kind=args.kind)
+    start = time.perf_counter()
+    thread_ids = index.thread_ids(**filters)
+    elapsed = time.perf_counter() - start
+    print(json.dumps({"threads": [{"thread_id": thread_id, "subject": index.threads[thread_id].subject}
+                                  for thread_id in thread_ids],
+                      "lookup_ms": round(elapsed * 1000, 3)}, indent=2, ensure_ascii=False))
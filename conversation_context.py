@@ -0,0 +1,199 @@
+"""
+Client-side compaction of thread_id conversations with the agent.
+
+The agent keeps a memory per thread_id and replays all of it into every
+prompt (thrash.json: "Metu Mailine girememek" three times in
+formatted_history), so each follow-up on a thread is slower and costs more
+tokens than the last. ConversationContext mirrors what the agent already
+holds for each thread and decides what the next request sends:
+
+    repeat   the query normalizes to the last user turn the agent already
+             answered: that answer is reused and nothing is sent
+    delta    only the new query goes out; everything else is already held
+    compact  the held history would exceed the token budget: the thread
+             moves to a fresh agent thread_id ("<thread_id>~2", "~3", ...)
+             and its first query carries a compact context block, a
+             summary of older turns plus the latest turns that fit,
+             with duplicate turns dropped
+
+Tokens are estimated from characters (CHARS_PER_TOKEN), which is close
+enough to keep prompts under budget without a tokenizer.
+
+    CONTEXT_TOKEN_BUDGET   max estimated tokens the agent holds per thread (default 1500)
+    CONTEXT_RECENT_TURNS   turns carried verbatim into a compacted thread (default 4)
+    CONTEXT_MAX_THREADS    conversations tracked before the oldest is forgotten (default 1000)
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+import text_normalize
+
+DEFAULT_TOKEN_BUDGET = int(os.environ.get("CONTEXT_TOKEN_BUDGET", "1500"))
+DEFAULT_RECENT_TURNS = int(os.environ.get("CONTEXT_RECENT_TURNS", "4"))
+DEFAULT_MAX_THREADS = int(os.environ.get("CONTEXT_MAX_THREADS", "1000"))
+CHARS_PER_TOKEN = 4
+# Characters of each older turn kept in the summary
+SUMMARY_CHARS = 160
+
+REPEAT = "repeat"
+DELTA = "delta"
+COMPACT = "compact"
+
+
+def estimate_tokens(text):
+    return len(text or "") // CHARS_PER_TOKEN + 1
+
+
+def _turn_key(text):
+    return text_normalize.normalize(text, greetings=True, signature=True, pii=False)
+
+
+def _first_sentence(text, limit=SUMMARY_CHARS):
+    text = " ".join((text or "").split())
+    for mark in (". ", "? ", "! "):
+        cut = text.find(mark)
+        if 0 < cut < limit:
+            return text[:cut + 1]
+    return text if len(text) <= limit else text[:limit].rsplit(" ", 1)[0] + " …"
+
+
+class _Conversation:
+    __slots__ = ("segment", "turns", "held_tokens", "last_key", "last_answer")
+
+    def __init__(self):
+        self.segment = 1
+        self.turns = []  # [(role, content, key)] over all segments
+        self.held_tokens = 0  # estimated tokens the agent holds for the current segment
+        self.last_key = None
+        self.last_answer = None
+
+
+class ConversationContext:
+    """Thread-safe record of what the agent holds per thread_id."""
+
+    def __init__(self, token_budget=DEFAULT_TOKEN_BUDGET, recent_turns=DEFAULT_RECENT_TURNS,
+                 max_threads=DEFAULT_MAX_THREADS):
+        self.token_budget = token_budget
+        self.recent_turns = recent_turns
+        self.max_threads = max_threads
+        self._conversations = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _conversation(self, thread_id):
+        conversation = self._conversations.get(thread_id)
+        if conversation is None:
+            conversation = self._conversations[thread_id] = _Conversation()
+            while len(self._conversations) > self.max_threads:
+                self._conversations.popitem(last=False)
+        self._conversations.move_to_end(thread_id)
+        return conversation
+
+    def prepare(self, thread_id, query):
+        """Plan the request for `query`: {action, payload, answer, thread_id, agent_thread_id}.
+
+        For REPEAT, `answer` is the earlier response and nothing should be
+        sent; otherwise send `payload` and pass the plan to record().
+        Requests without a thread_id are always sent as they are.
+        """
+        plan = {"action": DELTA, "answer": None, "thread_id": thread_id, "agent_thread_id": thread_id,
+                "query": query, "payload": {"input": {"query": query, "thread_id": thread_id}}}
+        if not thread_id:
+            return plan
+        key = _turn_key(query)
+        with self._lock:
+            conversation = self._conversation(thread_id)
+            if key and key == conversation.last_key and conversation.last_answer is not None:
+                return dict(plan, action=REPEAT, answer=conversation.last_answer)
+            agent_thread_id = self._agent_thread_id(thread_id, conversation.segment)
+            sent = query
+            if conversation.held_tokens + estimate_tokens(query) > self.token_budget and conversation.turns:
+                agent_thread_id = self._agent_thread_id(thread_id, conversation.segment + 1)
+                sent = self._compact(conversation.turns, query)
+                plan["action"] = COMPACT
+        plan["agent_thread_id"] = agent_thread_id
+        plan["payload"] = {"input": {"query": sent, "thread_id": agent_thread_id}}
+        return plan
+
+    def record(self, plan, answer_text, response=None):
+        """Note a successful answer to a prepared request (failed requests are simply not recorded)."""
+        if plan["action"] == REPEAT or not plan["thread_id"]:
+            return
+        query = plan["query"]
+        key = _turn_key(query)
+        sent_tokens = estimate_tokens(plan["payload"]["input"]["query"])
+        with self._lock:
+            conversation = self._conversation(plan["thread_id"])
+            segment = conversation.segment + 1 if plan["action"] == COMPACT else conversation.segment
+            if plan["agent_thread_id"] != self._agent_thread_id(plan["thread_id"], segment):
+                return  # a concurrent request already moved the thread to another segment
+            if plan["action"] == COMPACT:
+                conversation.segment = segment
+                conversation.held_tokens = 0
+            conversation.held_tokens += sent_tokens + estimate_tokens(answer_text)
+            conversation.turns.append(("user", query, key))
+            conversation.turns.append(("assistant", answer_text or "", _turn_key(answer_text)))
+            conversation.last_key = key
+            conversation.last_answer = response if response is not None else answer_text
+
+    def forget(self, thread_id):
+        with self._lock:
+            self._conversations.pop(thread_id, None)
+
+    def stats(self, thread_id):
+        with self._lock:
+            conversation = self._conversations.get(thread_id)
+            if conversation is None:
+                return None
+            return {"segment": conversation.segment, "turns": len(conversation.turns),
+                    "held_tokens": conversation.held_tokens,
+                    "agent_thread_id": self._agent_thread_id(thread_id, conversation.segment)}
+
+    @staticmethod
+    def _agent_thread_id(thread_id, segment):
+        return thread_id if segment == 1 else f"{thread_id}~{segment}"
+
+    def _compact(self, turns, query):
+        """Summary of older turns plus the latest ones that fit the budget, then the query."""
+        unique = list({key: (role, content) for role, content, key in turns}.items())
+        unique = [turn for key, turn in unique if key]
+        budget = self.token_budget // 2 - estimate_tokens(query)
+        recent = []
+        for role, content in reversed(unique[-self.recent_turns:]):
+            cost = estimate_tokens(content)
+            if cost > budget:
+                break
+            recent.insert(0, (role, content))
+            budget -= cost
+        older = unique[:len(unique) - len(recent)]
+        summary = []
+        for role, content in reversed(older):  # newest first, so the oldest are dropped when over budget
+            line = f"- {'User' if role == 'user' else 'Agent'}: {_first_sentence(content)}"
+            budget -= estimate_tokens(line)
+            if budget < 0:
+                break
+            summary.insert(0, line)
+        lines = []
+        if summary:
+            lines.append("Earlier in this conversation (summary):")
+            lines.extend(summary)
+        if recent:
+            lines.append("Recent messages:")
+            lines.extend(f"{'User' if role == 'user' else 'Agent'}: {content}" for role, content in recent)
+        lines.extend(["", "Current message:", query])
+        return "\n".join(lines)
+
+
+_context = None
+_context_lock = threading.Lock()
+
+
+def get_context():
+    """Return the process-wide conversation context, created on first use."""
+    global _context
+    if _context is None:
+        with _context_lock:
+            if _context is None:
+                _context = ConversationContext()
+    return _context
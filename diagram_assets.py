@@ -0,0 +1,99 @@
+"""
+Build step for the "📊 Diagram" page.
+
+docs/index.html is patched once (white background for the embedded
+draw.io viewer) and written to static/ under a content-hashed name,
+static/diagram-<etag>.html. With server.enableStaticServing (see
+.streamlit/config.toml) the page is then just an iframe pointing at
+<server.baseUrlPath>/app/static/diagram-<etag>.html (static_url()), so it
+also works behind a path prefix. The browser fetches it once and keeps it
+until the diagram changes. Without static serving the page falls back to
+embedding the patched HTML, which mail.py memoizes with st.cache_data.
+
+The served file keeps the source's mtime, so the server's ETag and
+Last-Modified headers stay the same across rebuilds and restarts.
+
+Usage:
+    python diagram_assets.py            # build static/diagram-<etag>.html
+"""
+
+import glob
+import hashlib
+import os
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+DIAGRAM_PATH = os.path.join(ROOT, "docs", "index.html")
+STATIC_DIR = os.path.join(ROOT, "static")
+STATIC_URL = "app/static"  # where Streamlit serves static/, below server.baseUrlPath
+
+WHITE_BACKGROUND_STYLE = """
+<style>
+    body {
+        background-color: white !important;
+        margin: 0;
+        padding: 0;
+    }
+    html {
+        background-color: white !important;
+    }
+    .mxgraph {
+        background-color: white !important;
+    }
+    div[class*="mxgraph"] {
+        background-color: white !important;
+    }
+    iframe {
+        background-color: white !important;
+    }
+</style>
+"""
+
+
+def patch_html(html):
+    """Inject the white-background style into the diagram document."""
+    if "</head>" in html:
+        html = html.replace("</head>", WHITE_BACKGROUND_STYLE + "</head>", 1)
+    elif "<body>" in html:
+        return html.replace("<body>", WHITE_BACKGROUND_STYLE + "<body style='background-color: white;'>", 1)
+    else:
+        html = WHITE_BACKGROUND_STYLE + html
+    return html.replace("<body>", "<body style='background-color: white;'>", 1)
+
+
+def etag(html):
+    return hashlib.sha256(html.encode("utf-8")).hexdigest()[:16]
+
+
+def static_url(name, base_url_path=""):
+    """Absolute path of a file in static/ for an app served under `base_url_path` (server.baseUrlPath)."""
+    parts = [part for part in (base_url_path or "").split("/") if part]
+    return "/" + "/".join(parts + [STATIC_URL, name])
+
+
+def build(source=DIAGRAM_PATH, static_dir=STATIC_DIR):
+    """Patch `source`, write it to static_dir under its etag and return (html, etag, file name).
+
+    Older diagram-*.html builds are removed; an up-to-date file is left untouched.
+    """
+    with open(source, encoding="utf-8") as f:
+        html = patch_html(f.read())
+    tag = etag(html)
+    name = f"diagram-{tag}.html"
+    path = os.path.join(static_dir, name)
+    if not os.path.exists(path):
+        os.makedirs(static_dir, exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(html)
+        source_mtime = os.stat(source).st_mtime
+        os.utime(tmp_path, (source_mtime, source_mtime))
+        os.replace(tmp_path, path)
+    for old in glob.glob(os.path.join(static_dir, "diagram-*.html")):
+        if os.path.basename(old) != name:
+            os.remove(old)
+    return html, tag, name
+
+
+if __name__ == "__main__":
+    _, tag, name = build()
+    print(f"{os.path.join(STATIC_DIR, name)} (etag {tag})")
@@ -0,0 +1,68 @@
+"""
+Memoized per-email agent analyses for old_ui's Incoming page.
+
+Each analysis is stored under a hash of the email body
+(response_cache.make_key). A body is analysed once per process, however
+many times the page renders and whichever session sent it. Bodies seen
+for the first time all start together on a shared pool, so opening
+Incoming with N new emails costs about one agent call, not N calls in a
+row. A failed analysis is not kept; the next render tries it again.
+
+    ANALYSIS_WORKERS      agent calls running at once (default 8)
+    ANALYSIS_TIMEOUT      read timeout for one agent call in seconds (default 60)
+    ANALYSIS_MAX_ENTRIES  analyses kept before the least recently used is dropped (default 1000)
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import response_cache
+
+WORKERS = int(os.environ.get("ANALYSIS_WORKERS", "8"))
+TIMEOUT = float(os.environ.get("ANALYSIS_TIMEOUT", "60"))
+MAX_ENTRIES = int(os.environ.get("ANALYSIS_MAX_ENTRIES", "1000"))
+
+
+class AnalysisStore:
+    """fn(body) results keyed by body hash; each is computed at most once while it is kept."""
+
+    def __init__(self, fn, max_workers=WORKERS, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._fn = fn
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="analysis")
+        self._entries = OrderedDict()  # body key -> Future
+        self._lock = threading.Lock()
+        self.counts = {"computed": 0, "hits": 0, "failed": 0}
+
+    def submit(self, body):
+        """Future for the analysis of `body`; the agent is only called if none is stored or running."""
+        key = response_cache.make_key(body)
+        with self._lock:
+            future = self._entries.get(key)
+            if future is not None:
+                self._entries.move_to_end(key)
+                self.counts["hits"] += 1
+                return future
+            future = self._entries[key] = self._executor.submit(self._fn, body)
+            self.counts["computed"] += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        future.add_done_callback(lambda done: self._drop_failed(key, done))
+        return future
+
+    def analyze(self, bodies):
+        """Futures for every body, in order; all first-time analyses run in parallel."""
+        return [self.submit(body) for body in bodies]
+
+    def _drop_failed(self, key, future):
+        if future.cancelled() or future.exception() is not None:
+            with self._lock:
+                if self._entries.get(key) is future:
+                    del self._entries[key]
+                    self.counts["failed"] += 1
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
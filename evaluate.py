@@ -0,0 +1,176 @@
+"""
+Offline evaluation runner: send every question in a JSONL file to the agent.
+
+Questions are read one line at a time and sent concurrently (bounded by
+--concurrency and --rate) with the same payload get_ai_suggestion uses.
+Every answer is appended to a checkpoint file as soon as it arrives, so an
+interrupted run resumes where it stopped; rows that failed are retried.
+When all rows are done, results.json and results.csv are written in the
+same {question, response} shape as before.
+
+Usage:
+    python evaluate.py --input test_data.jsonl --concurrency 8 --rate 2
+    python mock_lambda.py --port 8765 &
+    python evaluate.py --url http://127.0.0.1:8765/ --checkpoint /tmp/eval.jsonl
+"""
+
+import argparse
+import csv
+import json
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from tqdm import tqdm
+
+import lambda_client
+
+DEFAULT_LAMBDA_URL = os.environ.get(
+    "LAMBDA_URL", "https://ngohy4i3pcv5j36nejdmjbcgpq0egfou.lambda-url.eu-central-1.on.aws/"
+)
+
+
+class RateLimiter:
+    """Spaces request starts at least 1/rate seconds apart across threads."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+def iter_questions(path):
+    """Yield (line_no, row) for each {id, question} line without loading the file."""
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f):
+            line = line.strip()
+            if not line:
+                continue
+            row = json.loads(line)
+            if row.get("question"):
+                yield line_no, row
+
+
+def load_checkpoint(path):
+    """Latest checkpoint record per row key ("id" or line number)."""
+    done = {}
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # torn last line from a crash
+            done[record["key"]] = record
+    return done
+
+
+def end_torn_line(path):
+    """Terminate a crash-torn last line, so the next appended record starts on a line of its own."""
+    if not os.path.exists(path) or not os.path.getsize(path):
+        return
+    with open(path, "rb+") as f:
+        f.seek(-1, os.SEEK_END)
+        if f.read(1) != b"\n":
+            f.write(b"\n")  # load_checkpoint() skips the torn line itself
+
+
+def ask_agent(url, question, thread_id, limiter):
+    limiter.wait()
+    payload = {"input": {"query": question, "thread_id": thread_id}}
+    started = time.perf_counter()
+    try:
+        data = lambda_client.post_json(url, payload)
+    except Exception as e:
+        return {"error": str(e), "latency_ms": (time.perf_counter() - started) * 1000}
+    return {
+        "response": data.get("result", "AI Suggestion received, but output key was missing."),
+        "redirection": data.get("redirection"),
+        "request_id": data.get("request_id"),
+        "latency_ms": (time.perf_counter() - started) * 1000,
+    }
+
+
+def run(args):
+    end_torn_line(args.checkpoint)
+    done = load_checkpoint(args.checkpoint)
+    limiter = RateLimiter(args.rate)
+    total = sum(1 for _ in iter_questions(args.input))
+    completed = sum(1 for record in done.values() if "error" not in record)
+
+    with open(args.checkpoint, "a", encoding="utf-8") as checkpoint, \
+            ThreadPoolExecutor(max_workers=args.concurrency) as executor, \
+            tqdm(total=total, initial=completed, desc="Evaluating") as progress:
+        in_flight = {}
+
+        def drain(return_when):
+            finished, _ = wait(in_flight, return_when=return_when)
+            for future in finished:
+                record = in_flight.pop(future)
+                record.update(future.result())
+                done[record["key"]] = record
+                checkpoint.write(json.dumps(record, ensure_ascii=False) + "\n")
+                checkpoint.flush()
+                if "error" not in record:
+                    progress.update(1)
+
+        for line_no, row in iter_questions(args.input):
+            key = row.get("id") or f"line-{line_no}"
+            previous = done.get(key)
+            if previous is not None and "error" not in previous:
+                continue
+            thread_id = row.get("id", "") if args.thread_id_from_id else ""
+            record = {"key": key, "line": line_no, "question": row["question"]}
+            future = executor.submit(ask_agent, args.url, row["question"], thread_id, limiter)
+            in_flight[future] = record
+            if len(in_flight) >= args.concurrency:
+                drain(FIRST_COMPLETED)
+        while in_flight:
+            drain(FIRST_COMPLETED)
+
+    records = sorted(done.values(), key=lambda record: record["line"])
+    failed = [record for record in records if "error" in record]
+    write_results(records, args.output_json, args.output_csv)
+    print(f"{len(records) - len(failed)} answered, {len(failed)} failed "
+          f"-> {args.output_json}, {args.output_csv}")
+    if failed:
+        print("Re-run the same command to retry failed rows.")
+
+
+def write_results(records, json_path, csv_path):
+    rows = [
+        {"question": record["question"], "response": record.get("response", f"ERROR: {record.get('error')}")}
+        for record in records
+    ]
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump(rows, f, indent=2)
+    with open(csv_path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=["question", "response"])
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluate the AI agent on a JSONL question set.")
+    parser.add_argument("--input", default="test_data.jsonl", help="JSONL file with {id, question} rows")
+    parser.add_argument("--url", default=DEFAULT_LAMBDA_URL, help="Lambda function URL (or a mock_lambda.py URL)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Requests in flight at once")
+    parser.add_argument("--rate", type=float, default=0, help="Max request starts per second (0 = unlimited)")
+    parser.add_argument("--checkpoint", default="results.checkpoint.jsonl", help="Append-only progress file")
+    parser.add_argument("--output-json", default="results.json")
+    parser.add_argument("--output-csv", default="results.csv")
+    parser.add_argument("--thread-id-from-id", action="store_true",
+                        help="Send each row's id as thread_id so the agent can use its thread context")
+    run(parser.parse_args())
@@ -2,27 +2,38 @@
 Helper script to generate password hashes for new users.
 Run this script to generate a bcrypt hash that you can use in environment variables.
 
+With --users it hashes a whole CSV of users (columns: username, name,
+email, password; "-" reads stdin) on a thread pool and prints the
+USER_<USERNAME>_* lines for all of them, ready for a .env file. bcrypt
+releases the GIL, so --workers hashes run in parallel.
+
 Usage:
     python generate_password_hash.py
+    python generate_password_hash.py --users users.csv --workers 8 > users.env
 """
 
-import bcrypt
+import argparse
+import csv
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import auth
 
 def generate_password_hash():
     """Generate a bcrypt password hash for a new user."""
     print("Password Hash Generator")
     print("=" * 50)
-    
+
     password = input("Enter the password to hash: ")
-    
+
     if not password:
         print("Error: Password cannot be empty!")
         return
-    
+
     # Generate bcrypt hash
-    salt = bcrypt.gensalt()
-    hashed_password = bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
-    
+    hashed_password = auth.hash_password(password)
+
     print("\n" + "=" * 50)
     print("Generated Password Hash:")
     print("=" * 50)
@@ -36,5 +47,44 @@ def generate_password_hash():
     print("USER_ADMIN_NAME=Admin User")
     print("USER_ADMIN_EMAIL=admin@example.com")
 
+def read_users(path):
+    """Rows of a username,name,email,password CSV; rows without a username or password are skipped."""
+    f = sys.stdin if path == "-" else open(path, newline="", encoding="utf-8")
+    try:
+        rows = list(csv.DictReader(f))
+    finally:
+        if f is not sys.stdin:
+            f.close()
+    users = []
+    for line, row in enumerate(rows, start=2):
+        username = auth.normalize_username(row.get("username"))
+        if not username or not row.get("password"):
+            print(f"Skipping line {line}: username and password are required", file=sys.stderr)
+            continue
+        users.append({"username": username, "name": (row.get("name") or "").strip() or username,
+                      "email": (row.get("email") or "").strip(), "password": row["password"]})
+    return users
+
+def hash_users(users, workers=os.cpu_count() or 1, rounds=auth.BCRYPT_ROUNDS):
+    """USER_<USERNAME>_* lines for every user, hashing the passwords in parallel."""
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        hashes = executor.map(lambda user: auth.hash_password(user["password"], rounds), users)
+        lines = []
+        for user, password_hash in zip(users, hashes):
+            prefix = f"USER_{user['username'].upper()}"
+            lines += [f"{prefix}_NAME={user['name']}", f"{prefix}_EMAIL={user['email']}",
+                      f"{prefix}_PASSWORD_HASH={password_hash}"]
+    return lines
+
 if __name__ == "__main__":
-    generate_password_hash()
+    parser = argparse.ArgumentParser(description="Generate bcrypt password hashes for old_ui users.")
+    parser.add_argument("--users", help="CSV with username,name,email,password columns ('-' for stdin)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--rounds", type=int, default=auth.BCRYPT_ROUNDS, help="bcrypt cost factor")
+    args = parser.parse_args()
+    if args.users:
+        users = read_users(args.users)
+        print("\n".join(hash_users(users, args.workers, args.rounds)))
+        print(f"Hashed {len(users)} users", file=sys.stderr)
+    else:
+        generate_password_hash()
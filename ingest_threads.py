@@ -0,0 +1,93 @@
+"""
+Build evaluation questions from monthly thread dumps (replaces test_data_prep.ipynb).
+
+Each dump is parsed as a stream with thread_corpus.iter_json_array, the
+first user message of every thread becomes the question, threads are
+deduplicated by thread_id across all inputs, and one {id, question} line is
+written per thread as it is read. Only the set of seen thread_ids is kept
+in memory, so a year of dumps costs no more memory than a single thread.
+
+Like the notebook, it writes output.jsonl by default. test_data.jsonl is
+the curated evaluation set (spam and bounce threads removed by hand), so
+an existing output is only replaced with --force; --append adds to it.
+
+Usage:
+    python ingest_threads.py 2025-November.json
+    python ingest_threads.py 2025-*.json --output output.jsonl --append
+"""
+
+import argparse
+import json
+import os
+
+import thread_corpus
+
+
+def iter_questions(paths, seen=None, min_length=1):
+    """Yield {id, question} rows, skipping repeated thread_ids and empty questions.
+
+    `seen` is updated in place, so callers can pre-load ids already written.
+    Yields (row, None) for kept threads and (None, reason) for skipped ones.
+    """
+    seen = set() if seen is None else seen
+    for thread in thread_corpus.iter_threads(paths):
+        thread_id = thread.get("thread_id")
+        if not thread_id:
+            yield None, "missing thread_id"
+            continue
+        if thread_id in seen:
+            yield None, "duplicate thread_id"
+            continue
+        question = thread_corpus.first_question(thread)
+        if len(question.strip()) < min_length:
+            yield None, "no question"
+            continue
+        seen.add(thread_id)
+        yield {"id": thread_id, "question": question}, None
+
+
+def read_ids(path):
+    """thread_ids already present in an existing JSONL output."""
+    ids = set()
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    ids.add(json.loads(line)["id"])
+    return ids
+
+
+def ingest(paths, output, append=False, min_length=1):
+    """Write questions from `paths` to `output`; returns counts per outcome."""
+    seen = read_ids(output) if append else set()
+    counts = {"written": 0}
+    tmp_path = output + ".tmp"
+    if append and os.path.exists(output):
+        # Appending goes straight to the file: the existing rows stay valid either way
+        out = open(output, "a", encoding="utf-8")
+    else:
+        out = open(tmp_path, "w", encoding="utf-8")
+    with out:
+        for row, skipped in iter_questions(paths, seen, min_length):
+            if row is None:
+                counts[skipped] = counts.get(skipped, 0) + 1
+                continue
+            out.write(json.dumps(row, ensure_ascii=False) + "\n")
+            counts["written"] += 1
+    if out.name == tmp_path:
+        os.replace(tmp_path, output)
+    return counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extract evaluation questions from thread dumps.")
+    parser.add_argument("inputs", nargs="+", help="Monthly thread dump JSON files")
+    parser.add_argument("--output", "-o", default="output.jsonl")
+    parser.add_argument("--append", action="store_true",
+                        help="Keep existing rows and only add threads not already in the output")
+    parser.add_argument("--force", action="store_true", help="Replace an existing output file")
+    parser.add_argument("--min-length", type=int, default=1, help="Skip questions shorter than this")
+    args = parser.parse_args()
+    if os.path.exists(args.output) and not (args.append or args.force):
+        parser.error(f"{args.output} already exists; pass --append to add to it or --force to replace it")
+    print(json.dumps(ingest(args.inputs, args.output, args.append, args.min_length)))
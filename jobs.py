@@ -0,0 +1,166 @@
+"""
+Background job queue for agent calls.
+
+Jobs run on a shared thread pool so the Streamlit script thread never waits
+on the Lambda. Each user may have a bounded number of jobs holding a
+worker, and jobs can be cancelled: queued jobs never start, running jobs
+have their result discarded. A cancelled running job still counts against
+its user until the call actually returns, so cancelling and resubmitting
+cannot take over the pool. Finished jobs are kept for finished_ttl seconds
+for the UI to collect, then dropped.
+"""
+
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+FINISHED_STATES = {DONE, FAILED, CANCELLED}
+
+
+class JobLimitExceeded(RuntimeError):
+    """Raised when a user already has the maximum number of unfinished jobs."""
+
+
+class Job:
+    __slots__ = ("id", "user", "label", "state", "result", "error",
+                 "created_at", "started_at", "finished_at", "future")
+
+    def __init__(self, job_id, user, label):
+        self.id = job_id
+        self.user = user
+        self.label = label
+        self.state = QUEUED
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.future = None
+
+    @property
+    def finished(self):
+        return self.state in FINISHED_STATES
+
+    @property
+    def elapsed(self):
+        end = self.finished_at or time.time()
+        return end - (self.started_at or self.created_at)
+
+
+class JobQueue:
+    def __init__(self, max_workers=8, max_jobs_per_user=5, finished_ttl=3600):
+        self.max_jobs_per_user = max_jobs_per_user
+        self.finished_ttl = finished_ttl
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="agent-job")
+        self._jobs = {}
+        self._busy = {}  # user -> jobs queued or still inside _run, cancelled or not
+        self._lock = threading.Lock()
+
+    def submit(self, user, fn, *args, label=""):
+        """Queue fn(*args) for `user` and return the job id immediately."""
+        with self._lock:
+            self._prune()
+            active = self._busy.get(user, 0)
+            if active >= self.max_jobs_per_user:
+                raise JobLimitExceeded(
+                    f"{active} jobs already in progress (limit {self.max_jobs_per_user})"
+                )
+            self._busy[user] = active + 1
+            job = Job(f"job-{uuid.uuid4().hex[:12]}", user, label)
+            self._jobs[job.id] = job
+        try:
+            job.future = self._executor.submit(self._run, job, fn, args)
+        except BaseException:
+            with self._lock:
+                self._jobs.pop(job.id, None)
+                self._release(user)
+            raise
+        return job.id
+
+    def _run(self, job, fn, args):
+        try:
+            with self._lock:
+                if job.state == CANCELLED:
+                    return
+                job.state = RUNNING
+                job.started_at = time.time()
+            try:
+                result = fn(*args)
+            except Exception as e:
+                result, error = None, e
+            else:
+                error = None
+            with self._lock:
+                if job.state == CANCELLED:
+                    return
+                job.finished_at = time.time()
+                job.result = result
+                job.error = error
+                job.state = FAILED if error else DONE
+        finally:
+            with self._lock:
+                self._release(job.user)
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs_for(self, user):
+        with self._lock:
+            self._prune()
+            return sorted(
+                (job for job in self._jobs.values() if job.user == user),
+                key=lambda job: job.created_at
+            )
+
+    def cancel(self, job_id):
+        """Cancel a job; returns False if it had already finished."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.finished:
+                return False
+            job.state = CANCELLED
+            job.finished_at = time.time()
+        if job.future is not None and job.future.cancel():
+            with self._lock:
+                self._release(job.user)  # never started, so _run will not release it
+        return True
+
+    def forget(self, job_id):
+        """Drop a finished job once its result has been consumed."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None and job.finished:
+                del self._jobs[job_id]
+
+    def active_count(self, user):
+        """Jobs counted against `user`'s limit: queued, running, or cancelled but still running."""
+        with self._lock:
+            return self._busy.get(user, 0)
+
+    # Callers hold self._lock for the helpers below.
+
+    def _release(self, user):
+        remaining = self._busy.get(user, 0) - 1
+        if remaining > 0:
+            self._busy[user] = remaining
+        else:
+            self._busy.pop(user, None)
+
+    def _prune(self):
+        """Drop jobs that finished more than finished_ttl seconds ago and were never collected."""
+        cutoff = time.time() - self.finished_ttl
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.finished and job.finished_at is not None and job.finished_at < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,224 @@
+"""
+Shared HTTP client for the AWS Lambda agent.
+
+A single pooled requests.Session is reused across Streamlit reruns and user
+sessions, so repeated calls skip the TCP+TLS handshake to the function URL.
+Settings can be overridden with environment variables:
+
+    LAMBDA_POOL_SIZE        max pooled connections per host (default 16)
+    LAMBDA_CONNECT_TIMEOUT  seconds to establish a connection (default 5)
+    LAMBDA_READ_TIMEOUT     seconds to wait for the response (default 500)
+    LAMBDA_MAX_RETRIES      retries on 429/5xx and failed connects (default 2)
+    LAMBDA_BATCH_CONCURRENCY  parallel requests in batch mode (default 8)
+"""
+
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+POOL_SIZE = int(os.environ.get("LAMBDA_POOL_SIZE", "16"))
+CONNECT_TIMEOUT = float(os.environ.get("LAMBDA_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.environ.get("LAMBDA_READ_TIMEOUT", "500"))
+MAX_RETRIES = int(os.environ.get("LAMBDA_MAX_RETRIES", "2"))
+BATCH_CONCURRENCY = int(os.environ.get("LAMBDA_BATCH_CONCURRENCY", "8"))
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 8.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session(pool_size=None):
+    """Return the process-wide pooled session, creating it on first use."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                size = pool_size or POOL_SIZE
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=size, pool_maxsize=size, max_retries=0)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+
+def reset_session():
+    """Close the shared session so the next call builds a fresh pool."""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+        _session = None
+
+
+def _backoff_delay(attempt, retry_after=None):
+    """Full-jitter exponential backoff, honouring a numeric Retry-After header."""
+    if retry_after:
+        try:
+            return min(float(retry_after), BACKOFF_CAP)
+        except ValueError:
+            pass
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * (2 ** attempt)))
+
+
+def _never_sent(error):
+    """True if the connection was never established (connect timeout or refused).
+
+    Any other connection error may have happened after the request went
+    out, and the agent call is not idempotent, so it must not be repeated.
+    """
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    cause = error.args[0] if error.args else None
+    for _ in range(5):  # requests error -> MaxRetryError -> NewConnectionError -> OSError
+        if cause is None:
+            return False
+        if isinstance(cause, ConnectionRefusedError):
+            return True
+        cause = getattr(cause, "reason", None) or cause.__cause__ or cause.__context__
+    return False
+
+
+def _post(url, payload, connect_timeout=None, read_timeout=None, max_retries=None,
+          session=None, **kwargs):
+    """POST with jittered retries on 429/5xx and on connects that failed before sending."""
+    session = session or get_session()
+    timeout = (connect_timeout or CONNECT_TIMEOUT, read_timeout or READ_TIMEOUT)
+    retries = MAX_RETRIES if max_retries is None else max_retries
+
+    for attempt in range(retries + 1):
+        try:
+            response = session.post(url, json=payload, timeout=timeout, **kwargs)
+        except requests.ConnectionError as e:
+            if attempt == retries or not _never_sent(e):
+                raise
+            time.sleep(_backoff_delay(attempt))
+            continue
+        if response.status_code in RETRY_STATUSES and attempt < retries:
+            delay = _backoff_delay(attempt, response.headers.get("Retry-After"))
+            response.close()
+            time.sleep(delay)
+            continue
+        response.raise_for_status()
+        return response
+
+
+def post_json(url, payload, connect_timeout=None, read_timeout=None, max_retries=None, session=None):
+    """POST a JSON payload and return the decoded JSON body.
+
+    429/5xx responses and connects that failed before the request was sent
+    are retried with jittered backoff; anything else, including a
+    connection dropped while waiting for the answer, raises straight away.
+    """
+    response = _post(url, payload, connect_timeout, read_timeout, max_retries, session)
+    return response.json()
+
+
+class AgentStream:
+    """Iterate over answer text as the Lambda streams it.
+
+    Works with response-streaming function URLs that send Server-Sent Events
+    (text/event-stream) or newline-delimited JSON (application/x-ndjson).
+    Each event is a JSON object: {"delta": "..."} carries answer text, any
+    other keys (result, redirection, trace, request_id) are metadata, and
+    "[DONE]" ends the stream. A plain application/json reply is treated as
+    a single chunk, so buffered Lambdas keep working unchanged.
+
+    After iteration, `text` holds the full answer and `metadata` the
+    trailing fields.
+    """
+
+    def __init__(self, response):
+        self.response = response
+        self.text = ""
+        self.metadata = {}
+        self.streamed = False
+
+    def __iter__(self):
+        content_type = self.response.headers.get("Content-Type", "")
+        try:
+            if "text/event-stream" in content_type or "ndjson" in content_type:
+                self.streamed = True
+                yield from self._iter_events()
+            else:
+                data = self.response.json()
+                self.metadata = {k: v for k, v in data.items() if k != "result"}
+                self.text = data.get("result") or ""
+                if self.text:
+                    yield self.text
+        finally:
+            self.response.close()
+
+    def _iter_events(self):
+        parts = []
+        for line in self.response.iter_lines(decode_unicode=True):
+            if not line or line.startswith((":", "event:", "id:", "retry:")):
+                continue
+            if line.startswith("data:"):
+                line = line[5:].strip()
+            if line == "[DONE]":
+                break
+            try:
+                event = json.loads(line)
+            except ValueError:
+                continue
+            if not isinstance(event, dict):
+                continue
+            delta = event.pop("delta", None)
+            if delta:
+                parts.append(delta)
+                yield delta
+            self.metadata.update(event)
+        self.text = "".join(parts) or self.metadata.get("result") or ""
+
+
+def stream_json(url, payload, connect_timeout=None, read_timeout=None, max_retries=None, session=None):
+    """POST a payload asking for a streamed answer and return an AgentStream."""
+    response = _post(
+        url, payload, connect_timeout, read_timeout, max_retries, session,
+        stream=True,
+        headers={"Accept": "text/event-stream, application/x-ndjson;q=0.9, application/json;q=0.5"}
+    )
+    if "charset" not in response.headers.get("Content-Type", ""):
+        # requests assumes ISO-8859-1 for text/* without a charset
+        response.encoding = "utf-8"
+    return AgentStream(response)
+
+
+def run_batch(fn, items, concurrency=None, on_result=None):
+    """Call fn(item) for every item with at most `concurrency` calls in flight.
+
+    on_result(index, result) is invoked on the calling thread as each call
+    finishes, so it can safely update Streamlit widgets. Returns the results
+    in input order.
+    """
+    items = list(items)
+    limit = max(1, min(concurrency or BATCH_CONCURRENCY, len(items) or 1))
+
+    async def _run(executor):
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(limit)
+
+        async def _one(index, item):
+            async with semaphore:
+                return index, await loop.run_in_executor(executor, fn, item)
+
+        results = [None] * len(items)
+        for future in asyncio.as_completed([_one(i, item) for i, item in enumerate(items)]):
+            index, result = await future
+            results[index] = result
+            if on_result:
+                on_result(index, result)
+        return results
+
+    with ThreadPoolExecutor(max_workers=limit) as executor:
+        return asyncio.run(_run(executor))
@@ -1,33 +1,143 @@
 import streamlit as st
 import streamlit.components.v1 as components
-import requests
 import os
 from datetime import datetime
 import time
-import boto3
+import uuid
+
+import bedrock_logs
+import compose_templates
+import conversation_context
+import diagram_assets
+import jobs
+import lambda_client
+import outbox_store
+import perf_metrics
+import prefetch
+import response_cache
+import router
+import similar_threads
+import startup_profile
+import trace_index
  
 # --- CONFIG & STYLING ---
 st.set_page_config(page_title="Mail Assistant Pro", page_icon="✨", layout="wide")
+# Per-section timings of this script run (no-op unless PROFILE_RERUNS=1)
+rerun_profile = startup_profile.get_profiler().start()
  
 # --- BACKEND FUNCTIONS ---
  
 # Goaltech Lambda URL
 LAMBDA_URL = "https://ngohy4i3pcv5j36nejdmjbcgpq0egfou.lambda-url.eu-central-1.on.aws/"
+# Render Compose answers as they stream in (falls back to buffered JSON automatically)
+STREAM_RESPONSES = os.environ.get("LAMBDA_STREAMING", "1") == "1"
+# Default for the Compose "Analyze in background" toggle
+BACKGROUND_ANALYSIS = os.environ.get("BACKGROUND_ANALYSIS", "0") == "1"
+
+# Skip the Lambda when the local department router is at least this confident (0 = always call it)
+ROUTER_SKIP_CONFIDENCE = float(os.environ.get("ROUTER_SKIP_CONFIDENCE", "0"))
+
+# Sent emails shown per Incoming page read
+INBOX_PAGE_SIZE = int(os.environ.get("INBOX_PAGE_SIZE", "20"))
+
+@st.cache_resource
+def get_outbox_store():
+    """Persistent outbox shared by every session of this server."""
+    return outbox_store.OutboxStore()
+
+@st.cache_resource
+def get_job_queue():
+    """Background agent job pool shared by every session of this server."""
+    return jobs.JobQueue(
+        max_workers=int(os.environ.get("AGENT_JOB_WORKERS", "8")),
+        max_jobs_per_user=int(os.environ.get("AGENT_JOBS_PER_USER", "5")),
+        finished_ttl=float(os.environ.get("AGENT_JOB_TTL", "3600")) # uncollected results are dropped after this
+    )
  
+def collect_job(job):
+    """Save a finished job's answer (or error) on its email and drop the job from the queue."""
+    store = get_outbox_store()
+    email = store.find_by_job(job.id)
+    if email is not None:
+        if job.state == jobs.DONE:
+            store.save_analysis(email["id"], job.result)
+        elif job.state == jobs.FAILED:
+            store.save_analysis(email["id"], {"result": f"⚠️ Error connecting to AI Agent: {job.error}"})
+        else:
+            store.set_job(email["id"], None)
+    get_job_queue().forget(job.id)
+
+def reconcile_job(email):
+    """The email as it should render: finished jobs are collected and lost ones cleared."""
+    job = get_job_queue().get(email["job_id"])
+    if job is None:
+        # Job was lost (e.g. server restart); allow analyzing again
+        get_outbox_store().set_job(email["id"], None)
+    elif job.finished:
+        collect_job(job)
+    else:
+        return email
+    return get_outbox_store().get(email["id"])
+
+def record_request_metrics(result, client_ms):
+    """Records client latency and per-node trace timings for the Performance page."""
+    request_id = result.get("request_id") or f"local-{uuid.uuid4().hex}"
+    try:
+        perf_metrics.get_store().record(request_id, client_ms, result.get("trace_index"))
+    except Exception:
+        pass # Metrics must never break the answer itself
+
+def local_route_answer(user_text, thread_id):
+    """Routing-only answer from the local router when it is confident enough to skip the Lambda."""
+    if not ROUTER_SKIP_CONFIDENCE or thread_id:
+        return None
+    match = router.get_router().confident_match(user_text, ROUTER_SKIP_CONFIDENCE)
+    if match is None:
+        return None
+    return {
+        "result": f"Routed locally to {match['name']} ({match['emails'] or 'no address listed'}); "
+                  "the AI Agent was not called.",
+        "redirection": router.as_redirection(match),
+        "trace": None,
+        "trace_index": {},
+        "request_id": None
+    }
+
 def get_ai_suggestion(user_text, thread_id):
-    """Fetches AI suggestion from AWS Lambda."""
-    payload = {"input": {"query": user_text, "thread_id": thread_id}}
+    """Fetches AI suggestion from AWS Lambda (thread-less queries are served from cache when possible)."""
+    # An answer on a thread depends on its history, which conversation_context tracks; only
+    # thread-less queries go through the response cache
+    cache = response_cache.get_cache()
+    cached = None if thread_id else cache.get(user_text, None)
+    if cached is not None:
+        return dict(cached)
+    local = local_route_answer(user_text, thread_id)
+    if local is not None:
+        return local
+    # Follow-ups on a thread only send what the agent does not already hold
+    conversation = conversation_context.get_context()
+    plan = conversation.prepare(thread_id, user_text)
+    if plan["answer"] is not None:
+        return dict(plan["answer"])
+    payload = plan["payload"]
     try:
-        # Real Call to Lambda
-        response = requests.post(LAMBDA_URL, json=payload, timeout=500)
-        response.raise_for_status()
-        data = response.json()
-        return {
+        # Real Call to Lambda (pooled keep-alive session with retries)
+        started = time.perf_counter()
+        data = lambda_client.post_json(LAMBDA_URL, payload)
+        client_ms = (time.perf_counter() - started) * 1000
+        result = {
             "result": data.get("result", "AI Suggestion received, but output key was missing."),
             "redirection": data.get("redirection"),
             "trace": data.get("trace"),
+            "trace_index": trace_index.build_trace_index(data.get("trace")),
             "request_id": data.get("request_id")
         }
+        # Only agent answers are cached (see response_cache.cacheable); errors fall through to the except branch
+        if not thread_id:
+            cache.put(user_text, None, result)
+        conversation.record(plan, result["result"], result)
+        record_request_metrics(result, client_ms)
+        return result
     except Exception as e:
         return {
             "result": f"⚠️ Error connecting to AI Agent: {str(e)}",
@@ -36,97 +146,169 @@ def get_ai_suggestion(user_text, thread_id):
             "request_id": None
         }
 
-def extract_prompt_fields(trace_data, node_name="Prompt_1"):
-    """Extract fields from first Prompt_1 trace match."""
-    if not trace_data:
-        return {}
-    if isinstance(trace_data, dict):
-        trace_items = [trace_data]
-    elif isinstance(trace_data, list):
-        trace_items = trace_data
-    else:
-        return {}
-
-    for item in trace_items:
-        if not isinstance(item, dict):
-            continue
-        trace = item.get("trace")
-        if not isinstance(trace, dict):
-            continue
-        for trace_type, trace_body in trace.items():
-            if not isinstance(trace_body, dict):
-                continue
-            if trace_body.get("nodeName") != node_name:
-                continue
-            if trace_type == "nodeInputTrace" and isinstance(trace_body.get("fields"), list):
-                return _map_fields(trace_body["fields"])
-    return {}
-
-def _map_fields(fields):
-    mapped = {}
-    for field in fields:
-        if not isinstance(field, dict):
-            continue
-        key = field.get("nodeInputName") or field.get("nodeOutputName")
-        content = field.get("content")
-        if not key or not isinstance(content, dict) or "document" not in content:
-            continue
-        mapped[key] = content["document"]
-    return mapped
-
-def extract_redirection_summary(redirection):
-    """Extract score, name, and email(s) from redirection payload."""
-    if not isinstance(redirection, dict):
-        return {}
-    metadata = redirection.get("metadata")
-    if not isinstance(metadata, dict):
-        metadata = {}
-    return {
-        "score": redirection.get("score"),
-        "name": metadata.get("name"),
-        "email": metadata.get("emails") or metadata.get("email")
-    }
+def stream_ai_suggestion(user_text, thread_id, response_holder):
+    """Yields AI suggestion text as the Lambda streams it.
 
-def fetch_bedrock_logs(request_id, limit=50, lookback_minutes=60):
-    """Fetch CloudWatch logs for a Bedrock invocation request_id."""
-    if not request_id:
-        return []
+    The complete response (result, redirection, trace, request_id) is written
+    into response_holder once the stream ends. Falls back to a single chunk
+    when the Lambda answers with buffered JSON.
+    """
+    cache = response_cache.get_cache()
+    cached = None if thread_id else cache.get(user_text, None) # threads: see get_ai_suggestion
+    if cached is not None:
+        response_holder.update(cached)
+        yield cached.get("result") or ""
+        return
+    local = local_route_answer(user_text, thread_id)
+    if local is not None:
+        response_holder.update(local)
+        yield local["result"]
+        return
+    conversation = conversation_context.get_context()
+    plan = conversation.prepare(thread_id, user_text)
+    if plan["answer"] is not None:
+        response_holder.update(plan["answer"])
+        yield plan["answer"].get("result") or ""
+        return
+    payload = plan["payload"]
     try:
-        logs = boto3.client("logs", region_name="eu-central-1")
-        end_time = int(time.time() * 1000)
-        start_time = end_time - (lookback_minutes * 60 * 1000)
-        response = logs.filter_log_events(
-            logGroupName="/aws/bedrock/invocations",
-            filterPattern=f'{{ $.requestId = "{request_id}" }}',
-            startTime=start_time,
-            endTime=end_time,
-            interleaved=True,
-            limit=limit
-        )
-        events = response.get("events", [])
-        if not events:
-            response = logs.filter_log_events(
-                logGroupName="/aws/bedrock/invocations",
-                filterPattern=f'"{request_id}"',
-                startTime=start_time,
-                endTime=end_time,
-                interleaved=True,
-                limit=limit
-            )
-            events = response.get("events", [])
-        return events
+        started = time.perf_counter()
+        stream = lambda_client.stream_json(LAMBDA_URL, payload)
+        yield from stream
+        client_ms = (time.perf_counter() - started) * 1000
+        result = {
+            "result": stream.text or "AI Suggestion received, but output key was missing.",
+            "redirection": stream.metadata.get("redirection"),
+            "trace": stream.metadata.get("trace"),
+            "trace_index": trace_index.build_trace_index(stream.metadata.get("trace")),
+            "request_id": stream.metadata.get("request_id")
+        }
+        if not thread_id:
+            cache.put(user_text, None, result)
+        conversation.record(plan, result["result"], result)
+        record_request_metrics(result, client_ms)
     except Exception as e:
-        return [{"message": f"⚠️ Unable to fetch Bedrock logs: {str(e)}"}]
+        result = {
+            "result": f"⚠️ Error connecting to AI Agent: {str(e)}",
+            "redirection": None,
+            "trace": None,
+            "request_id": None
+        }
+        yield "\n\n" + result["result"]
+    response_holder.update(result)
+
+def prefetched_or_fresh(future, body, thread_id):
+    """Answer of a claimed speculative call (waiting for the rest of it), else a fresh agent call."""
+    if future is not None:
+        response = future.result()
+        if not str(response.get("result", "")).startswith("⚠️"):
+            return response # a failed speculation is retried rather than shown
+    return get_ai_suggestion(body, thread_id)
+
+@st.cache_resource
+def get_prefetcher():
+    """Speculative Compose analyses shared by every session of this server."""
+    return prefetch.Prefetcher(get_ai_suggestion)
+
+@st.cache_data(show_spinner=False)
+def load_diagram(path, mtime):
+    """Patched diagram HTML, etag and static file name; rebuilt only when the file's mtime changes."""
+    return diagram_assets.build(path)
+
+def new_outbox_email(to_addr, subject, body, thread_id):
+    """Build an outbox entry for a sent message (AI fields are added later)."""
+    return {
+        "created_at": time.time(),
+        "thread_id": thread_id,
+        "to": to_addr,
+        "subject": subject,
+        "body": body,
+        "time": datetime.now().strftime("%d %b, %H:%M"),
+        "read": False
+    }
+
+def render_local_route(text):
+    """Instant department suggestion from the local router, shown before the agent answers."""
+    match = router.get_router().best(text)
+    if match:
+        st.caption(f"🧭 Likely department (local match): **{match['name']}** · {match['emails'] or '—'}")
+
+def remember_answer(email_id, email, ai_response):
+    """Makes a freshly answered message findable by later near-duplicate lookups."""
+    if not ai_response.get("request_id"):
+        return # errors and locally routed answers are not worth reusing
+    similar_threads.remember(
+        st.session_state.user_id, f"outbox-{email_id}", email["body"], ai_response.get("result") or "",
+        thread_id=email.get("thread_id") or None, subject=email.get("subject", "")
+    )
+
+def use_thread_id(thread_id):
+    st.session_state.form_thread_id = thread_id
+
+def render_similar_thread(body):
+    """Nearest previously answered thread for the current draft, offered as an instant draft."""
+    if not body or not body.strip():
+        return
+    matches = similar_threads.lookup(st.session_state.user_id, body, k=1)
+    if not matches:
+        return
+    match = matches[0]
+    st.markdown("**🔁 Similar answered thread**")
+    st.caption(f"{match['subject'] or match['thread_id'] or 'Earlier message'} · {match['similarity']:.0%} similar")
+    if match["answer"]:
+        with st.expander("Answer draft", expanded=False):
+            st.write(match["answer"])
+    if match["thread_id"] and match["thread_id"] != st.session_state.get("form_thread_id"):
+        st.button("🔗 Reuse this thread's context", key="use_similar_thread",
+                  on_click=use_thread_id, args=(match["thread_id"],))
+
+def render_bedrock_logs(request_id, key, sent_at=None):
+    """Show Bedrock logs for a request_id, querying CloudWatch only on demand."""
+    if request_id not in st.session_state.logs_requested:
+        if st.button("📜 Load Bedrock logs", key=f"logs_{key}"):
+            st.session_state.logs_requested.add(request_id)
+            st.rerun()
+        return
+    with st.expander("Bedrock logs", expanded=True):
+        if bedrock_logs.BACKEND == "insights":
+            # Logs Insights: scoped to the send time, partial results shown as they arrive
+            status_line = st.empty()
+            events_box = st.empty()
+            logs = []
+            for logs, status in bedrock_logs.iter_insights_results(request_id, sent_at):
+                status_line.caption(f"Logs Insights query: {status} · {len(logs)} events")
+                if logs:
+                    events_box.json(logs)
+        else:
+            logs = bedrock_logs.fetch_bedrock_logs(request_id)
+            if logs:
+                st.json(logs)
+        if not logs:
+            st.caption("No log events found for this request_id yet.")
+        if st.button("🔄 Refresh logs", key=f"logs_refresh_{key}"):
+            bedrock_logs.invalidate(request_id)
+            st.rerun()
  
 # --- INITIALIZATION ---
  
 # Initialize Session State Variables directly (No Auth needed)
-if "outbox" not in st.session_state:
-    st.session_state.outbox = []
+# There is no login, so each browser gets its own inbox id, kept in the URL (?inbox=...).
+# Sent emails, background jobs and prefetches are keyed by it; "Demo User" is only a
+# display name. The id is a capability: whoever has the URL sees that outbox.
+store = get_outbox_store()
 if "selected_example" not in st.session_state:
     st.session_state.selected_example = None
 if "name" not in st.session_state:
     st.session_state.name = "Demo User" # Default name for the UI
+if "logs_requested" not in st.session_state:
+    st.session_state.logs_requested = set() # request_ids whose Bedrock logs were asked for
+if "user_id" not in st.session_state:
+    inbox_id = st.query_params.get("inbox", "")
+    valid = len(inbox_id) == 32 and all(c in "0123456789abcdef" for c in inbox_id)
+    st.session_state.user_id = inbox_id if valid else uuid.uuid4().hex
+if st.query_params.get("inbox") != st.session_state.user_id:
+    st.query_params["inbox"] = st.session_state.user_id # Keep the id in the URL across reloads
+rerun_profile.mark("init")
  
 # --- MAIN APP LAYOUT ---
  
@@ -138,38 +320,24 @@ with st.sidebar:
     st.markdown("---")
     
     # Navigation
-    menu = st.radio("Navigation", ["📥 Incoming", "✍️ Compose", "📊 Diagram", "ℹ️ About"], label_visibility="collapsed")
+    menu = st.radio("Navigation", ["📥 Incoming", "✍️ Compose", "📈 Performance", "📊 Diagram", "ℹ️ About"], label_visibility="collapsed")
     
     st.markdown("---")
     st.caption("QUICK TEMPLATES")
     
-    # Example Questions
-    examples = [
-        # --- Orijinal Sorular ---
-        {"label": "🎓 Instructor Change", "to": "hotline@metu.edu.tr", "subject": "Instructor Change Request", "body": "Merhaba. Bu Dönem emekli olan bölümümüz hocalarından Prof.Dr. Ali Eryılmazın\nöğrencisi 2599686 numaralı öğrencisi Semra Sıkıra'ın Danışman değişikliği\nyapması gerekmektedir. Ali hocamız sisteme giremediği için öğrenciyi\nbırakamıyor. Nasıl yapabiliriz?\n\n\nKevser Özkan \n\n4049"},
-        {"label": "🔒 VPN Issue", "to": "hotline@metu.edu.tr", "subject": "VPN Connection Problem", "body": "Merhaba hocam,\n\nİyi günler, VPN indirdiğim masaüstü bilgisayarımda eklerde belirttiğim gibi bir uyarı alıyorum ve indirmek istediğim lisanslı uygulamaların olduğu “https:\/\/software.cc.metu.edu.tr\/download.php” linke ulaşamıyorum. VPN bağlandığı halde bu linke tıkladığımda güvenli bulunmadığından yine bağlanamıyorum. Yardımcı olursanız çok sevinirim.\n\nTeşekkürler,\nAzra"},
-        {"label": "❓ Eduroam", "to": "academic@metu.edu.tr", "subject": "Cannot Connect to Eduroam", "body": "Merhaba hocam,\n\nİyi günler, eduroma nasıl bağlanabilirim? İyi çalışmalar, Mert Ali Yalçın"},
-        
-        # --- Genel Bilgi Soruları ---
-        {"label": "🇬🇧 Eğitim Dili", "to": "tanitim@metu.edu.tr", "subject": "Eğitim Dili Hakkında Bilgi", "body": "Merhaba,\n\nODTÜ'de eğitim dili nedir? Tamamı İngilizce mi yoksa Türkçe bölümler de var mı?\n\nSaygılarımla."},
-        {"label": "💰 Burs Olanakları", "to": "bursofisi@metu.edu.tr", "subject": "Burs Olanakları Hakkında", "body": "İyi günler,\n\nÜniversitenizin sunduğu burs olanakları nelerdir? Başarı bursu ve ihtiyaç bursu kriterleri hakkında bilgi alabilir miyim?\n\nTeşekkürler."},
-        {"label": "🤝 Mezun Ağı", "to": "mezun@metu.edu.tr", "subject": "Mezun İletişim Ağı", "body": "Merhaba,\n\nODTÜ mezunları arası iletişim ve bilgi ağı ne kadar gelişmiş durumda? Mezunlar Derneği'nin aktif çalışmaları var mı?"},
-        {"label": "❓ Genel Sorular", "to": "iletisim@metu.edu.tr", "subject": "İlgili Birim Yönlendirmesi", "body": "Merhaba,\n\nODTÜ ile ilgili genel sorularım var, hangi birim ile görüşmeliyim? Yönlendirebilirseniz sevinirim."},
-        
-        # --- Öğrenci İşleri (Kayıt/Ders) Soruları ---
-        {"label": "📝 Ara Dönem Kayıt", "to": "oidb@metu.edu.tr", "subject": "Hazırlık Atlama ve Ara Dönem", "body": "Sayın Yetkili,\n\nKayıtlardan sonra birinci dönem sonunda İYS-IELTS-TOEFL-PTE belgelerinden herhangi birini vererek ara dönemde (Irregular olarak) birinci sınıf öğrencisi olunabilir mi?\n\nBilgilerinize arz ederim."},
-        {"label": "📋 Geç Kayıt/Ekle-Bırak", "to": "oidb@metu.edu.tr", "subject": "Ders Ekleme-Bırakma ve Geç Kayıt Prosedürü", "body": "Sayın Yetkili,\n\nDers ekleme-bırakma süresi bittikten sonra ders ekleme-bırakma işlemleri nasıl yapılmaktadır?\n\nAyrıca, etkileşimli kayıtlarda kayıt yaptırmayan öğrencilerin kayıt işlemleri için izlemesi gereken prosedür nedir?\n\nBilgilerinize arz ederim."},
-        {"label": "💼 Staj ve Sigorta", "to": "staj@metu.edu.tr", "subject": "Staj İşlemleri ve Sigorta Hakkında", "body": "Merhaba,\n\nStaj başvurusu ve staj süresince yaptırılan sigorta işlemleri ile ilgili detaylı bilgiyi nereden alabilirim? Başvuru sürecinde hangi belgeler gereklidir?\n\nYardımlarınız için teşekkürler."},
- 
-        # --- YENİ EKLENENLER (Diploma & Yan Dal) ---
-        {"label": "📜 Diploma Kaybı", "to": "oidb@metu.edu.tr", "subject": "Diploma İkinci Nüsha Talebi", "body": "Sayın Yetkili,\n\nDiplomamı kaybettim. İkinci kopya (nüsha) sizden alabilir miyim? Bunun için gerekli prosedür ve belgeler nelerdir?\n\nBilgilerinize arz ederim."},
-        {"label": "📚 İkinci Yan Dal", "to": "oidb@metu.edu.tr", "subject": "İkinci Yan Dal Programı Başvurusu", "body": "Merhaba,\n\nŞu anda bir yan dal programına kayıtlıyım. Başka bir program için başvuru yapabilir miyim? Kabul olmam halinde aynı anda iki yan dal programı izleyebilir miyim?\n\nSaygılarımla."}
-    ]
-    
-    for ex in examples:
+    # Example questions (compose_templates.QUICK_TEMPLATES, built once per process)
+    for ex in compose_templates.QUICK_TEMPLATES:
         if st.button(ex["label"], key=f"btn_{ex['label']}", use_container_width=True):
             st.session_state.selected_example = ex
             st.toast(f"Template loaded: {ex['label']}")
+
+    st.markdown("---")
+    cache_stats = response_cache.get_cache().stats()
+    st.caption(
+        f"RESPONSE CACHE · {cache_stats['hits']} hits / {cache_stats['misses']} misses "
+        f"({cache_stats['hit_rate']:.0%}) · {cache_stats['entries']} entries"
+    )
+rerun_profile.mark("sidebar")
  
 # --- PAGE: COMPOSE ---
 if menu == "✍️ Compose":
@@ -210,7 +378,12 @@ if menu == "✍️ Compose":
                 st.session_state.form_body = default_body
                 st.session_state.form_thread_id = default_thread
  
-            with st.form("compose_form", clear_on_submit=False): # Formu temizlemiyoruz ki yazı kalsın
+            if default_body and prefetch.ENABLED:
+                # Templates are analyzed speculatively right away; Send then claims the answer
+                get_prefetcher().observe(st.session_state.user_id, default_body, immediate=True)
+
+            # Plain widgets rather than st.form, so a typed draft is visible to the prefetch debounce
+            with st.container(border=True):
                 # --- THREAD ID EKLENDİ ---
                 thread_id = st.text_input("Thread ID", key="form_thread_id", placeholder="Optional: Enter Thread ID")
                 
@@ -220,38 +393,78 @@ if menu == "✍️ Compose":
                 
                 col_sub1, col_sub2 = st.columns([1, 5])
                 with col_sub1:
-                    submitted = st.form_submit_button("🚀 Send", use_container_width=True, type="primary")
+                    submitted = st.button("🚀 Send", use_container_width=True, type="primary")
+                with col_sub2:
+                    background = st.toggle("Analyze in background", value=BACKGROUND_ANALYSIS, key="form_background")
                 
                 if submitted:
-                    if to_addr and subject and body:
+                    if to_addr and subject and body and background:
+                        # Sıraya al, sonuç Incoming sayfasında görünecek
+                        new_email = new_outbox_email(to_addr, subject, body, thread_id)
+                        prefetched = get_prefetcher().claim(st.session_state.user_id, body, thread_id)
+                        try:
+                            new_email["job_id"] = get_job_queue().submit(
+                                st.session_state.user_id, prefetched_or_fresh, prefetched, body, thread_id,
+                                label=subject
+                            )
+                        except jobs.JobLimitExceeded as e:
+                            st.warning(f"Please wait for running analyses to finish: {e}")
+                        else:
+                            store.add(st.session_state.user_id, new_email)
+                            st.session_state.latest_result = None
+                            st.success(f"Message saved! Analysis queued as {new_email['job_id']}; it will appear in 'Incoming'.")
+                    elif to_addr and subject and body and STREAM_RESPONSES:
+                        # Cevap aşağıdaki analiz alanında akış halinde gösterilecek
+                        st.session_state.latest_result = None
+                        st.session_state.pending_stream = new_outbox_email(to_addr, subject, body, thread_id)
+                    elif to_addr and subject and body:
+                        render_local_route(body)
                         # İşlem başladığını göster
                         with st.spinner("AI Agent is analyzing the request..."):
                             # 1. AI'dan cevabı al
-                            ai_response = get_ai_suggestion(body, thread_id)
+                            ai_response = prefetched_or_fresh(
+                                get_prefetcher().claim(st.session_state.user_id, body, thread_id), body, thread_id
+                            )
                             
                             # 2. Hem ekranda göstermek için kaydet
                             st.session_state.latest_result = ai_response
                             
                             # 3. Hem de Inbox'a (Incoming) kaydet
-                            new_email = {
-                                "id": int(time.time()),
-                                "thread_id": thread_id, # --- THREAD ID KAYDEDİLDİ ---
-                                "to": to_addr,
-                                "subject": subject,
-                                "body": body,
-                                "time": datetime.now().strftime("%d %b, %H:%M"),
-                                "read": False,
-                                "ai_hint": ai_response.get("result"),
-                                "ai_redirection": ai_response.get("redirection"),
-                                "ai_trace": ai_response.get("trace"),
-                                "ai_request_id": ai_response.get("request_id")
-                            }
-                            st.session_state.outbox.append(new_email)
+                            new_email = new_outbox_email(to_addr, subject, body, thread_id)
+                            email_id = store.add(st.session_state.user_id, new_email, ai_response)
+                            remember_answer(email_id, new_email, ai_response)
                         
                         st.success("Message processed and saved!")
                     else:
                         st.warning("Please fill in all fields.")
  
+        # --- STREAMING: cevabı geldikçe yaz, bitince kaydet ---
+        pending_email = st.session_state.get("pending_stream")
+        if pending_email:
+            st.markdown("---")
+            st.subheader("⚡ Instant AI Analysis")
+            render_local_route(pending_email["body"])
+            ai_response = {}
+            prefetched = get_prefetcher().claim(
+                st.session_state.user_id, pending_email["body"], pending_email["thread_id"]
+            )
+            with st.chat_message("assistant", avatar="🤖"):
+                st.markdown(f"**AI Suggestion:**")
+                if prefetched is not None:
+                    with st.spinner("Finishing the prefetched analysis..."):
+                        ai_response.update(prefetched_or_fresh(
+                            prefetched, pending_email["body"], pending_email["thread_id"]
+                        ))
+                    st.write(ai_response.get("result"))
+                else:
+                    st.write_stream(stream_ai_suggestion(pending_email["body"], pending_email["thread_id"], ai_response))
+            email_id = store.add(st.session_state.user_id, pending_email, ai_response)
+            remember_answer(email_id, pending_email, ai_response)
+            st.session_state.latest_result = ai_response
+            st.session_state.pending_stream = None
+            st.toast("Message processed and saved!")
+            st.rerun()
+
         # --- SONUCU EKRANDA GÖSTERME ALANI ---
         if st.session_state.latest_result:
             st.markdown("---")
@@ -261,13 +474,12 @@ if menu == "✍️ Compose":
             with st.chat_message("assistant", avatar="🤖"):
                 st.markdown(f"**AI Suggestion:**")
                 st.write(st.session_state.latest_result.get("result"))
-                redirection_summary = extract_redirection_summary(
+                redirection_summary = trace_index.extract_redirection_summary(
                     st.session_state.latest_result.get("redirection")
                 )
                 st.markdown("**Redirection:**")
                 st.json(redirection_summary)
-                trace_data = st.session_state.latest_result.get("trace")
-                prompt_fields = extract_prompt_fields(trace_data)
+                prompt_fields = trace_index.node_fields(st.session_state.latest_result.get("trace_index"))
                 if prompt_fields:
                     st.markdown("**Trace (Prompt_1):**")
                     with st.expander("faq_answer", expanded=False):
@@ -278,12 +490,7 @@ if menu == "✍️ Compose":
                         st.write(prompt_fields.get("mail_answer", ""))
                 request_id = st.session_state.latest_result.get("request_id")
                 if request_id:
-                    with st.expander("Bedrock logs", expanded=False):
-                        logs = fetch_bedrock_logs(request_id)
-                        if logs:
-                            st.json(logs)
-                        else:
-                            st.caption("No log events found for this request_id yet.")
+                    render_bedrock_logs(request_id, "latest")
                 
                 # Aksiyon butonları (Görsel amaçlı)
                 c1, c2 = st.columns(2)
@@ -294,12 +501,30 @@ if menu == "✍️ Compose":
  
     with col2:
         st.info("💡 **Tip:** The result will appear instantly below the form and will also be saved in your 'Incoming' folder.")
+        if prefetch.ENABLED:
+            # Re-checks the draft after the debounce without rerunning the page
+            @st.fragment(run_every=prefetch.DEBOUNCE)
+            def render_prefetch_status():
+                status = get_prefetcher().observe(
+                    st.session_state.user_id, st.session_state.get("form_body") or "",
+                    st.session_state.get("form_thread_id") or None
+                )
+                if status == prefetch.RUNNING:
+                    st.caption("⚙️ Analyzing this draft ahead of Send...")
+                elif status == prefetch.READY:
+                    st.caption("⚡ Analysis ready: Send will show it instantly")
+                elif status == prefetch.OVER_BUDGET:
+                    st.caption("Prefetch budget used up; the draft is analyzed on Send")
+
+            render_prefetch_status()
+        render_similar_thread(st.session_state.get("form_body"))
  
 # --- PAGE: INCOMING ---
 elif menu == "📥 Incoming":
     st.title("📥 Inbox")
     
-    if not st.session_state.outbox:
+    total_emails = store.count(st.session_state.user_id)
+    if not total_emails:
         st.container().markdown("""
         <div style="text-align: center; padding: 50px; color: #666;">
             <h3>📭 Nothing here yet</h3>
@@ -307,8 +532,94 @@ elif menu == "📥 Incoming":
         </div>
         """, unsafe_allow_html=True)
     else:
-        # Reverse list to show newest first
-        for email in reversed(st.session_state.outbox):
+        # --- BACKGROUND JOBS: polled without rerunning the whole page ---
+        @st.fragment(run_every=2)
+        def render_job_status():
+            queue = get_job_queue()
+            user_jobs = queue.jobs_for(st.session_state.user_id)
+            if not user_jobs:
+                return
+            finished_any = False
+            st.caption("BACKGROUND ANALYSES")
+            for job in user_jobs:
+                if job.finished:
+                    collect_job(job)
+                    finished_any = True
+                    continue
+                icon = "⏳" if job.state == jobs.QUEUED else "⚙️"
+                col_job1, col_job2 = st.columns([5, 1])
+                col_job1.markdown(f"{icon} **{job.label}** · {job.state} · {job.elapsed:.0f}s")
+                if col_job2.button("✖ Cancel", key=f"cancel_{job.id}"):
+                    queue.cancel(job.id)
+            if finished_any:
+                st.rerun()
+
+        render_job_status()
+
+        # --- ANALYZE ALL: pending emails are sent to the agent concurrently ---
+        pending_count = store.count_pending(st.session_state.user_id)
+        if pending_count:
+            col_all1, col_all2 = st.columns([3, 1])
+            with col_all2:
+                concurrency = st.number_input(
+                    "Parallel requests", min_value=1, max_value=32,
+                    value=lambda_client.BATCH_CONCURRENCY, key="batch_concurrency"
+                )
+            with col_all1:
+                analyze_all = st.button(f"🧠 Analyze all ({pending_count} pending)", type="primary")
+            if analyze_all:
+                pending = store.pending(st.session_state.user_id)
+                progress = st.progress(0.0, text=f"Analyzing 0/{len(pending)} emails...")
+                done = []
+
+                def on_result(index, ai_response):
+                    email = pending[index]
+                    store.save_analysis(email["id"], ai_response)
+                    done.append(email)
+                    progress.progress(
+                        len(done) / len(pending),
+                        text=f"Analyzed {len(done)}/{len(pending)}: {email['subject']}"
+                    )
+
+                lambda_client.run_batch(
+                    lambda email: get_ai_suggestion(email["body"], email.get("thread_id")),
+                    pending,
+                    concurrency=int(concurrency),
+                    on_result=on_result
+                )
+                st.rerun()
+
+        # --- PAGINATION: only one page is read from the store per rerun ---
+        if "inbox_page" not in st.session_state:
+            st.session_state.inbox_page = 0
+        if "open_emails" not in st.session_state:
+            st.session_state.open_emails = set()
+        page_sizes = sorted({10, 20, 50, 100, INBOX_PAGE_SIZE})
+        col_nav1, col_nav2, col_nav3, col_nav4 = st.columns([1, 3, 1, 2])
+        with col_nav4:
+            page_size = st.selectbox(
+                "Per page", page_sizes, index=page_sizes.index(INBOX_PAGE_SIZE),
+                key="inbox_page_size", label_visibility="collapsed",
+                format_func=lambda n: f"{n} per page"
+            )
+        page_count = max(1, -(-total_emails // page_size))
+        current_page = min(st.session_state.inbox_page, page_count - 1)
+        with col_nav1:
+            if st.button("◀ Newer", disabled=current_page == 0, use_container_width=True):
+                st.session_state.inbox_page = current_page - 1
+                st.rerun()
+        with col_nav3:
+            if st.button("Older ▶", disabled=current_page >= page_count - 1, use_container_width=True):
+                st.session_state.inbox_page = current_page + 1
+                st.rerun()
+        with col_nav2:
+            st.caption(f"Page {current_page + 1} of {page_count} · {total_emails} messages")
+
+        # Newest first
+        for email in store.page(st.session_state.user_id, current_page * page_size, page_size):
+            if email.get("job_id"):
+                # The job may belong to an earlier browser session whose status fragment is gone
+                email = reconcile_job(email)
             
             # --- THREAD ID GÖRÜNTÜLEME ---
             thread_display = f" | 🧵 {email['thread_id']}" if email.get('thread_id') else ""
@@ -324,40 +635,49 @@ elif menu == "📥 Incoming":
             </div>
             """, unsafe_allow_html=True)
  
-            with st.expander("📄 View Content & AI Insights", expanded=False):
+            is_open = email["id"] in st.session_state.open_emails
+            toggle_label = "📄 Hide Content & AI Insights" if is_open else "📄 View Content & AI Insights"
+            if st.button(toggle_label, key=f"open_{email['id']}"):
+                st.session_state.open_emails ^= {email["id"]}
+                st.rerun()
+            if not is_open:
+                continue
+
+            # Body, trace and logs are only built for emails the user opened
+            with st.container(border=True):
                 st.markdown("**Message Content:**")
                 st.text_area("", value=email['body'], height=100, disabled=True, key=f"body_{email['id']}")
                 
                 st.markdown("---")
                 st.markdown("#### ✨ AI Agent Analysis")
                 
-                # Check if we already have the hint to avoid re-calling Lambda on every render
-                if "ai_hint" not in email:
+                if email.get("job_id"):
+                    st.caption("⏳ Analysis is running in the background...")
+                elif email.get("ai_hint") is None:
                     if st.button("🧠 Analyze with AI Agent", key=f"analyze_{email['id']}"):
-                        with st.status("Connecting to Neural Network...", expanded=True) as status:
-                            st.write("Extracting context...")
-                            time.sleep(0.5)
-                            st.write("Querying Lambda Knowledge Base...")
-                            suggestion = get_ai_suggestion(email['body'], email['thread_id'])
-                            email["ai_hint"] = suggestion.get("result")
-                            email["ai_redirection"] = suggestion.get("redirection")
-                            email["ai_trace"] = suggestion.get("trace")
-                            email["ai_request_id"] = suggestion.get("request_id")
-                            status.update(label="Analysis Complete!", state="complete", expanded=False)
-                        st.rerun()
+                        try:
+                            job_id = get_job_queue().submit(
+                                st.session_state.user_id, get_ai_suggestion,
+                                email['body'], email.get('thread_id'), label=email['subject']
+                            )
+                        except jobs.JobLimitExceeded as e:
+                            st.warning(f"Please wait for running analyses to finish: {e}")
+                        else:
+                            store.set_job(email["id"], job_id)
+                            st.rerun()
                 
                 # If analysis exists, show it nicely
-                if "ai_hint" in email:
+                if email.get("ai_hint") is not None:
                     # Using Chat Message UI for the Agent
                     with st.chat_message("assistant", avatar="🤖"):
                         st.markdown(f"**Suggestion:**")
                         st.markdown(email["ai_hint"])
-                        redirection_summary = extract_redirection_summary(
+                        redirection_summary = trace_index.extract_redirection_summary(
                             email.get("ai_redirection")
                         )
                         st.markdown("**Redirection:**")
                         st.json(redirection_summary)
-                        prompt_fields = extract_prompt_fields(email.get("ai_trace"))
+                        prompt_fields = store.node_fields(email["id"], "Prompt_1")
                         if prompt_fields:
                             st.markdown("**Trace (Prompt_1):**")
                             with st.expander("faq_answer", expanded=False):
@@ -368,12 +688,7 @@ elif menu == "📥 Incoming":
                                 st.write(prompt_fields.get("mail_answer", ""))
                         request_id = email.get("ai_request_id")
                         if request_id:
-                            with st.expander("Bedrock logs", expanded=False):
-                                logs = fetch_bedrock_logs(request_id)
-                                if logs:
-                                    st.json(logs)
-                                else:
-                                    st.caption("No log events found for this request_id yet.")
+                            render_bedrock_logs(request_id, email["id"], email.get("created_at"))
                         
                         st.markdown("---")
                         col_act1, col_act2 = st.columns(2)
@@ -382,57 +697,75 @@ elif menu == "📥 Incoming":
                         with col_act2:
                             st.button("🛠️ Edit Response", key=f"edit_{email['id']}")
 
+# --- PAGE: PERFORMANCE ---
+elif menu == "📈 Performance":
+    st.title("📈 Performance")
+    st.markdown("Client round-trip time and per-node Bedrock Flow latency and tokens, per answered request.")
+
+    window_options = {"Last hour": 3600, "Last 24 hours": 86400, "Last 7 days": 7 * 86400, "All time": None}
+    window = st.selectbox("Time window", list(window_options))
+    since = time.time() - window_options[window] if window_options[window] else None
+    metric_rows = perf_metrics.get_store().rows(since=since)
+
+    if not metric_rows:
+        st.info("No requests recorded yet. Send a message from Compose to collect metrics.")
+    else:
+        summary = perf_metrics.summarize(metric_rows)
+        request_count = len({row["request_id"] for row in metric_rows})
+        client_stats = next((item for item in summary if item["node"] == perf_metrics.CLIENT_NODE), {})
+        col_m1, col_m2, col_m3 = st.columns(3)
+        col_m1.metric("Requests", request_count)
+        col_m2.metric("Client p50", f"{client_stats.get('p50_ms') or 0:.0f} ms")
+        col_m3.metric("Client p95", f"{client_stats.get('p95_ms') or 0:.0f} ms")
+
+        st.markdown("#### Per-node breakdown")
+        st.dataframe(
+            [{key: item[key] for key in ("node", "count", "p50_ms", "p95_ms", "avg_input_tokens", "avg_output_tokens")}
+             for item in summary],
+            use_container_width=True, hide_index=True
+        )
+        chart_data = {item["node"]: item["p95_ms"] for item in summary
+                      if item["p95_ms"] is not None and item["node"] != perf_metrics.CLIENT_NODE}
+        if chart_data:
+            st.markdown("#### Node p95 latency (ms)")
+            st.bar_chart(chart_data)
+
+        col_e1, col_e2 = st.columns(2)
+        col_e1.download_button(
+            "⬇️ Export JSONL", perf_metrics.to_jsonl(metric_rows),
+            file_name="request_metrics.jsonl", mime="application/x-ndjson"
+        )
+        col_e2.download_button(
+            "⬇️ Export Prometheus", perf_metrics.to_prometheus(summary),
+            file_name="request_metrics.prom", mime="text/plain"
+        )
+
+    profiler = startup_profile.get_profiler()
+    if profiler.enabled:
+        st.markdown("#### Script rerun sections")
+        rerun_summary = profiler.summary()
+        if rerun_summary:
+            st.dataframe(rerun_summary, use_container_width=True, hide_index=True)
+        else:
+            st.caption("No reruns recorded yet.")
+
 # --- PAGE: DIAGRAM ---
 elif menu == "📊 Diagram":
     st.title("📊 System Architecture Diagram")
     st.markdown("Visual representation of the METU Mail Assistant system architecture.")
     
-    # Read and display the diagram HTML
-    diagram_path = os.path.join(os.path.dirname(__file__), "docs", "index.html")
     try:
-        with open(diagram_path, "r", encoding="utf-8") as f:
-            diagram_html = f.read()
-        
-        # Inject CSS to make background white
-        white_bg_style = """
-        <style>
-            body {
-                background-color: white !important;
-                margin: 0;
-                padding: 0;
-            }
-            html {
-                background-color: white !important;
-            }
-            .mxgraph {
-                background-color: white !important;
-            }
-            div[class*="mxgraph"] {
-                background-color: white !important;
-            }
-            iframe {
-                background-color: white !important;
-            }
-        </style>
-        """
-        # Insert style tag in head section
-        if "</head>" in diagram_html:
-            diagram_html = diagram_html.replace("</head>", white_bg_style + "</head>")
-        elif "<body>" in diagram_html:
-            # If no head tag, add style before body
-            diagram_html = diagram_html.replace("<body>", white_bg_style + "<body style='background-color: white;'>")
+        diagram_html, _, diagram_file = load_diagram(
+            diagram_assets.DIAGRAM_PATH, os.path.getmtime(diagram_assets.DIAGRAM_PATH)
+        )
+        if st.get_option("server.enableStaticServing"):
+            # Served as a static file: the browser only downloads it again when the diagram changes
+            diagram_url = diagram_assets.static_url(diagram_file, st.get_option("server.baseUrlPath"))
+            components.iframe(diagram_url, height=1200, scrolling=True)
         else:
-            # Fallback: prepend style
-            diagram_html = white_bg_style + diagram_html
-        
-        # Also modify body tag directly if it exists
-        if "<body>" in diagram_html and 'style=' not in diagram_html.split("<body>")[1].split(">")[0]:
-            diagram_html = diagram_html.replace("<body>", "<body style='background-color: white;'>")
-        
-        # Display the diagram with appropriate height
-        components.html(diagram_html, height=1200, scrolling=True)
+            components.html(diagram_html, height=1200, scrolling=True)
     except FileNotFoundError:
-        st.error(f"Diagram file not found at: {diagram_path}")
+        st.error(f"Diagram file not found at: {diagram_assets.DIAGRAM_PATH}")
     except Exception as e:
         st.error(f"Error loading diagram: {str(e)}")
 
@@ -449,4 +782,7 @@ elif menu == "ℹ️ About":
     * **AI Model:** AWS Bedrock / Custom LLM Agent
     
     Built for demonstrating automated email classification and response drafting capabilities.
-    """)
\ No newline at end of file
+    """)
+
+rerun_profile.mark(f"page {menu}")
+rerun_profile.finish()
@@ -0,0 +1,213 @@
+"""
+Local stand-in for the Lambda function URL, used by benchmarks and offline runs.
+
+It accepts the same {"input": {"query", "thread_id"}} payload and answers with
+the same keys get_ai_suggestion reads (result, redirection, trace, request_id).
+
+When started with --stream and the client accepts text/event-stream, the
+answer is sent as chunked Server-Sent Events: {"delta": ...} events followed
+by one metadata event and "[DONE]", the format lambda_client.AgentStream reads.
+
+With --answers the replies are replayed from a recorded results.json: a
+known question gets its recorded response, any other query is mapped to a
+recorded response by a stable hash. --trace-kb attaches a synthetic Bedrock
+Flow trace of about that size. Jitter is seeded from the query, so the same
+query always gets the same delay and runs are repeatable.
+
+Like the real agent, the mock remembers every query and answer per
+thread_id and replays them into the prompt: each answer reports the
+estimated prompt size as context_tokens, and --token-delay adds that many
+seconds per 1000 prompt tokens, so long threads get slower as they grow.
+
+Usage:
+    python mock_lambda.py --port 8765 --delay 0.2 --jitter 0.05
+    python mock_lambda.py --stream --chunk-delay 0.05
+    python mock_lambda.py --answers results.json --trace-kb 200 --delay 0.5 --jitter 0.2
+    python mock_lambda.py --token-delay 0.05
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class MockLambdaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        query = (payload.get("input") or {}).get("query") or ""
+        thread_id = (payload.get("input") or {}).get("thread_id")
+
+        server = self.server
+        query_hash = zlib.crc32(query.encode("utf-8"))
+        result = server.answer_for(query, query_hash)
+        context_tokens = server.remember(thread_id, query, result)
+        rng = random.Random(query_hash ^ server.seed)
+        delay = server.delay + rng.uniform(-server.jitter, server.jitter)
+        delay += server.token_delay * context_tokens / 1000
+        if delay > 0:
+            time.sleep(delay)
+
+        answer = {
+            "result": result,
+            "redirection": {"score": 0.9, "metadata": {"name": "Hotline", "emails": "hotline@metu.edu.tr"}},
+            "trace": server.trace,
+            "request_id": str(uuid.uuid4()),
+            "context_tokens": context_tokens,
+        }
+        if server.stream and "text/event-stream" in (self.headers.get("Accept") or ""):
+            self._send_stream(answer)
+            return
+
+        # Buffered replies still pay the simulated generation time up front.
+        if server.chunk_delay:
+            time.sleep(server.chunk_delay * len(answer["result"].split(" ")))
+        body = json.dumps(answer).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_stream(self, answer):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        text = answer.pop("result")
+        for i, word in enumerate(text.split(" ")):
+            delta = word if i == 0 else " " + word
+            self._write_chunk(f"data: {json.dumps({'delta': delta})}\n\n")
+            if self.server.chunk_delay:
+                time.sleep(self.server.chunk_delay)
+        self._write_chunk(f"data: {json.dumps(answer)}\n\n")
+        self._write_chunk("data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _write_chunk(self, text):
+        data = text.encode("utf-8")
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+
+class MockLambdaServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def answer_for(self, query, query_hash):
+        if not self.answers:
+            return f"Mock answer for: {query[:80]}"
+        recorded = self.answers_by_question.get(query.strip())
+        if recorded is not None:
+            return recorded
+        return self.answers[query_hash % len(self.answers)]["response"]
+
+    def remember(self, thread_id, query, result):
+        """Estimated prompt tokens (held history + query); the turn is then added to the thread's memory."""
+        prompt = len(query) // 4 + 1
+        if not thread_id:
+            return prompt
+        with self.memory_lock:
+            held = self.memory.get(thread_id, 0)
+            self.memory[thread_id] = held + prompt + len(result) // 4 + 1
+        return held + prompt
+
+
+def load_answers(path):
+    """Recorded [{question, response}] rows, e.g. results.json."""
+    with open(path, encoding="utf-8") as f:
+        return [row for row in json.load(f) if row.get("response")]
+
+
+def synthetic_trace(size_kb):
+    """A Bedrock Flow-shaped trace of roughly size_kb KB.
+
+    Retrieval nodes carry the bulk of the payload and Prompt_1's input
+    comes last, like the real flow; every node has input and output
+    timestamps and Prompt_1 reports token usage.
+    """
+    if size_kb <= 0:
+        return []
+    trace = []
+    document = "Lorem ipsum ODTÜ bilgi işlem destek " * 28  # ~1 KB
+    for i, node_name in enumerate(("FAQ_Retrieval", "RSS_Retrieval", "Mail_Retrieval")):
+        trace.append({"trace": {"nodeInputTrace": {
+            "nodeName": node_name, "timestamp": f"2025-11-18T12:00:0{i}Z",
+            "fields": [{"nodeInputName": "query", "content": {"document": "query"}}],
+        }}})
+        trace.append({"trace": {"nodeOutputTrace": {
+            "nodeName": node_name, "timestamp": f"2025-11-18T12:00:0{i}.800Z",
+            "fields": [{"nodeOutputName": f"doc_{j}", "content": {"document": document}}
+                       for j in range(max(1, size_kb // 3))],
+        }}})
+    trace.append({"trace": {"nodeInputTrace": {
+        "nodeName": "Prompt_1", "timestamp": "2025-11-18T12:00:04Z",
+        "fields": [{"nodeInputName": name, "content": {"document": document * 2}}
+                   for name in ("faq_answer", "rss_answer", "mail_answer", "query")],
+    }}})
+    trace.append({"trace": {"nodeOutputTrace": {
+        "nodeName": "Prompt_1", "timestamp": "2025-11-18T12:00:09Z",
+        "fields": [{"nodeOutputName": "modelCompletion", "content": {"document": "answer"}}],
+        "usage": {"inputTokens": 3200, "outputTokens": 400},
+    }}})
+    return trace
+
+
+def start_mock_server(port=0, delay=0.0, jitter=0.0, stream=False, chunk_delay=0.0,
+                      answers=None, trace_kb=0, seed=0, token_delay=0.0):
+    """Start the mock server on a background thread and return (server, url).
+
+    answers is a list of recorded {question, response} rows (see load_answers).
+    """
+    server = MockLambdaServer(("127.0.0.1", port), MockLambdaHandler)
+    server.delay = delay
+    server.jitter = jitter
+    server.stream = stream
+    server.chunk_delay = chunk_delay
+    server.seed = seed
+    server.token_delay = token_delay
+    server.memory = {}  # thread_id -> estimated tokens held
+    server.memory_lock = threading.Lock()
+    server.answers = answers or []
+    server.answers_by_question = {row["question"].strip(): row["response"] for row in server.answers}
+    server.trace = synthetic_trace(trace_kb)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a local mock of the Lambda agent.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--delay", type=float, default=0.0, help="Base response delay in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Random +/- delay in seconds")
+    parser.add_argument("--stream", action="store_true", help="Answer with chunked Server-Sent Events")
+    parser.add_argument("--chunk-delay", type=float, default=0.0, help="Delay between streamed chunks")
+    parser.add_argument("--answers", help="Recorded results.json to replay answers from")
+    parser.add_argument("--trace-kb", type=int, default=0, help="Size of the synthetic trace in each answer")
+    parser.add_argument("--seed", type=int, default=0, help="Seed mixed into the per-query jitter")
+    parser.add_argument("--token-delay", type=float, default=0.0,
+                        help="Extra seconds per 1000 prompt tokens held for the thread")
+    args = parser.parse_args()
+
+    server, url = start_mock_server(
+        args.port, args.delay, args.jitter, args.stream, args.chunk_delay,
+        answers=load_answers(args.answers) if args.answers else None,
+        trace_kb=args.trace_kb, seed=args.seed, token_delay=args.token_delay
+    )
+    print(f"Mock Lambda listening on {url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
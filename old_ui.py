@@ -1,9 +1,12 @@
-import requests
 import streamlit as st
 from datetime import datetime, time
 import time
 import os
-import bcrypt
+from concurrent.futures import as_completed
+
+import auth
+import email_analysis
+import lambda_client
 
 from dotenv import load_dotenv
 load_dotenv()
@@ -15,87 +18,44 @@ load_dotenv()
 LAMBDA_URL = "https://wrbpo5x2jap3crtgxxhpaxufdm0dacub.lambda-url.eu-central-1.on.aws/"
 
 def get_ai_suggestion(user_text):
+    """Agent suggestion for an email body; errors propagate so failed analyses are not stored."""
     payload = {
         "input": {
             "query": user_text
         }
     }
+    data = lambda_client.post_json(LAMBDA_URL, payload, read_timeout=email_analysis.TIMEOUT)
+    # Adjust 'text' key based on your actual Lambda JSON response structure
+    return data.get("result", "AI Suggestion received, but output key was missing.")
+
+@st.cache_resource
+def get_analysis_store():
+    """Per-email analyses shared by every session of this server."""
+    return email_analysis.AnalysisStore(get_ai_suggestion)
+
+def show_suggestion(slot, analysis):
+    """Render a finished analysis (or its error) into its placeholder."""
     try:
-        response = requests.post(LAMBDA_URL, json=payload)
-        response.raise_for_status()
-        # Adjust 'text' key based on your actual Lambda JSON response structure
-        return response.json().get("result", "AI Suggestion received, but output key was missing.")
+        slot.warning(analysis.result())
     except Exception as e:
-        return f"Error connecting to AI Agent: {e}"
+        slot.error(f"Error connecting to AI Agent: {e}")
 
 # 1. Setup Page Config
 st.set_page_config(page_title="MockMail", page_icon="📧", layout="wide")
 
 # 2. Simple Authentication System
-# Load credentials from environment variables or Streamlit secrets
-def get_users_from_env():
-    """Load user credentials from environment variables or Streamlit secrets."""
-    users = {}
-    
-    # Try to get from Streamlit secrets first (for Streamlit Cloud)
-    # Then fall back to os.environ (for local development)
-    env_source = {}
-    
-    try:
-        # Check if we're on Streamlit Cloud (secrets are available)
-        if hasattr(st, 'secrets') and st.secrets:
-            # Streamlit Cloud uses st.secrets which is a dict-like object
-            for key in st.secrets.keys():
-                if key.startswith('USER_'):
-                    env_source[key] = st.secrets[key]
-    except:
-        pass
-    
-    # Also check os.environ (for local development or if secrets not available)
-    for key in os.environ:
-        if key.startswith('USER_') and key not in env_source:
-            env_source[key] = os.environ[key]
-    
-    # Parse user data from environment variables
-    # Format: USER_ADMIN_NAME, USER_ADMIN_EMAIL, USER_ADMIN_PASSWORD_HASH
-    user_prefixes = set()
-    for key in env_source:
-        if key.startswith('USER_') and key.endswith('_NAME'):
-            prefix = key.replace('_NAME', '')
-            user_prefixes.add(prefix)
-    
-    for prefix in user_prefixes:
-        username = prefix.replace('USER_', '').lower()
-        name = env_source.get(f'{prefix}_NAME')
-        email = env_source.get(f'{prefix}_EMAIL', '')
-        password_hash = env_source.get(f'{prefix}_PASSWORD_HASH')
-        
-        if name and password_hash:
-            users[username] = {
-                'name': name,
-                'email': email or '',
-                'password_hash': password_hash
-            }
-    
-    return users
+# Credentials come from Streamlit secrets or environment variables (see auth.py)
+@st.cache_resource(ttl=auth.USERS_TTL, show_spinner=False)
+def load_users():
+    """User records shared by every session; secrets and environment are rescanned once per AUTH_USERS_TTL."""
+    return auth.parse_users(auth.user_source(st.secrets if hasattr(st, 'secrets') else None))
 
-# Load users from environment variables, fallback to default for development
-USERS = get_users_from_env()
+USERS = load_users()
 
 # Development fallback - only used if no environment variables are set
 if not USERS:
     st.warning("⚠️ No users found in environment variables. Using development defaults.")
-    # Use a fixed hash for development (password: password123)
-    # This hash was generated once and is reused so the password always works
-    # Hash for 'password123': $2b$12$eOE.V.ef3pL.ctWcUepXE.XegxGNQZGEbwBT03HPsOqDSvTvNHRCS
-    default_hash = '$2b$12$eOE.V.ef3pL.ctWcUepXE.XegxGNQZGEbwBT03HPsOqDSvTvNHRCS'
-    USERS = {
-        'admin': {
-            'password_hash': default_hash,
-            'name': 'Admin User',
-            'email': 'admin@metu.edu.tr'
-        }
-    }
+    USERS = auth.DEV_USERS
 
 # Initialize session state for authentication
 if 'authenticated' not in st.session_state:
@@ -105,6 +65,26 @@ if 'username' not in st.session_state:
 if 'name' not in st.session_state:
     st.session_state['name'] = None
 
+def sign_in(username):
+    st.session_state['authenticated'] = True
+    st.session_state['username'] = username
+    st.session_state['name'] = USERS[username]['name']
+
+def sign_out():
+    st.session_state['authenticated'] = False
+    st.session_state['username'] = None
+    st.session_state['name'] = None
+    st.query_params.pop("session", None)
+
+# A returning browser presents its signed session token instead of the password
+session_token = st.query_params.get("session")
+token_user = auth.verify_token(session_token, USERS) if session_token else None
+if not st.session_state['authenticated'] and token_user:
+    sign_in(token_user)
+elif st.session_state['authenticated'] and session_token and token_user != st.session_state['username']:
+    # Logged out in another tab, or idle past the token's lifetime
+    sign_out()
+
 # Authentication check
 if not st.session_state['authenticated']:
     st.title("🔐 Login Required")
@@ -115,38 +95,35 @@ if not st.session_state['authenticated']:
         submit = st.form_submit_button("Login")
         
         if submit:
-            # Normalize username to lowercase for matching
-            username_lower = username.lower().strip()
-            
-            if username_lower in USERS:
-                # Verify password against stored hash
-                stored_hash = USERS[username_lower]['password_hash']
-                try:
-                    # Try to verify the password
-                    if bcrypt.checkpw(password.encode('utf-8'), stored_hash.encode('utf-8')):
-                        st.session_state['authenticated'] = True
-                        st.session_state['username'] = username_lower
-                        st.session_state['name'] = USERS[username_lower]['name']
-                        st.success(f"Welcome, {USERS[username_lower]['name']}!")
-                        st.rerun()
-                    else:
-                        st.error("Invalid username or password")
-                except Exception as e:
-                    st.error(f"Authentication error: {e}")
-                    st.error(f"Debug: username='{username_lower}', hash exists={bool(stored_hash)}")
+            try:
+                # The bcrypt check runs on the bounded auth pool; this rerun waits for its result
+                username_lower = auth.authenticate(USERS, username, password)
+            except auth.LoginBusy as e:
+                st.warning(str(e))
+            except Exception as e:
+                st.error(f"Authentication error: {e}")
             else:
-                st.error("Invalid username or password")
-                st.error(f"Debug: Available usernames: {list(USERS.keys())}, entered: '{username_lower}'")
+                if username_lower:
+                    sign_in(username_lower)
+                    st.query_params["session"] = auth.issue_token(username_lower, USERS[username_lower])
+                    st.success(f"Welcome, {USERS[username_lower]['name']}!")
+                    st.rerun()
+                else:
+                    st.error("Invalid username or password")
     
     st.stop()
 
+# Short-lived tokens are reissued while the user is active
+if session_token and auth.needs_refresh(session_token):
+    st.query_params["session"] = auth.issue_token(st.session_state['username'], USERS[st.session_state['username']])
+
 # User is authenticated - show logout button and continue with app
 with st.sidebar:
     st.write(f"Welcome *{st.session_state['name']}*")
     if st.button("Logout"):
-        st.session_state['authenticated'] = False
-        st.session_state['username'] = None
-        st.session_state['name'] = None
+        # Revoking also invalidates copies of the token in other tabs, history or shared links
+        auth.revoke(st.session_state['username'])
+        sign_out()
         st.rerun()
 
 # 3. Initialize "Database" in Session State (only accessible after authentication)
@@ -251,6 +228,8 @@ if page == "Compose":
                 }
                 # "Send" it by saving to our list
                 st.session_state.outbox.append(new_email)
+                # Start the analysis now so Incoming usually finds it ready
+                get_analysis_store().submit(body_val)
                 # Clear the selected example after successful submission
                 st.session_state.selected_example = None
                 st.success(f"Message sent to {recipient_val}!")
@@ -265,7 +244,11 @@ elif page == "Incoming":
         st.info("Your inbox is empty.")
     else:
         # Display emails in reverse order (newest first)
-        for idx, email in enumerate(reversed(st.session_state.outbox)):
+        emails = list(reversed(st.session_state.outbox))
+        # Known bodies come straight from the store; new ones are all analysed in parallel
+        analyses = get_analysis_store().analyze([email['body'] for email in emails])
+        pending = {}
+        for idx, (email, analysis) in enumerate(zip(emails, analyses)):
             with st.expander(f"To: {email['to']} | {email['subject']} ({email['time']})"):
                 st.write(f"**Subject:** {email['subject']}")
                 st.write(f"**Body:**")
@@ -273,21 +256,22 @@ elif page == "Incoming":
 
                 st.write("---")
                 st.write("**✨ AI Suggestion:**")
-                
-                # Check if we already have the suggestion stored
-                print("email", email)
-                with st.spinner("Agent is thinking..."):
-                    # Call your Lambda URL
-                    suggestion = get_ai_suggestion(email['body'])
-                    # Store it so it doesn't call the API again on next rerun
-                    email["ai_hint"] = suggestion
-                
-                st.warning(email["ai_hint"])
+                suggestion_slot = st.empty()
+                if analysis.done():
+                    show_suggestion(suggestion_slot, analysis)
+                else:
+                    suggestion_slot.caption("Agent is thinking...")
+                    pending.setdefault(analysis, []).append(suggestion_slot)
 
                 if st.button(f"Delete Message {idx}", key=f"del_{idx}"):
                     # Logic to remove could go here
                     pass
 
+        # Fill in each suggestion as its call returns
+        for analysis in as_completed(pending):
+            for suggestion_slot in pending[analysis]:
+                show_suggestion(suggestion_slot, analysis)
+
 # --- About Page ---
 else:
     st.header("About This App")
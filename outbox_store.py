@@ -0,0 +1,244 @@
+"""
+Persistent outbox storage for sent and analyzed emails.
+
+Emails live in a SQLite database in WAL mode so they survive browser
+refreshes and can be shared by several app replicas pointing at the same
+file. The table is indexed on (owner, created_at) and thread_id, and the
+bulky Bedrock traces are stored out of line so page reads never touch them.
+Each trace is also broken into one trace_nodes row per (node name, trace
+type), so the UI reads a single node's fields by primary key; the raw trace
+is only kept for export and debugging.
+
+    OUTBOX_DB   path of the SQLite file (default outbox.db next to this file)
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from trace_index import build_trace_index
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "outbox.db")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS emails (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    owner TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    thread_id TEXT,
+    to_addr TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    body TEXT NOT NULL,
+    time TEXT NOT NULL,
+    read INTEGER NOT NULL DEFAULT 0,
+    job_id TEXT,
+    ai_hint TEXT,
+    ai_redirection TEXT,
+    ai_request_id TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_emails_owner_created ON emails (owner, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_emails_thread ON emails (thread_id);
+CREATE INDEX IF NOT EXISTS idx_emails_job ON emails (job_id) WHERE job_id IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_emails_pending ON emails (owner, created_at DESC)
+    WHERE ai_hint IS NULL AND job_id IS NULL;
+CREATE TABLE IF NOT EXISTS traces (
+    email_id INTEGER PRIMARY KEY REFERENCES emails (id) ON DELETE CASCADE,
+    trace TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS trace_nodes (
+    email_id INTEGER NOT NULL REFERENCES emails (id) ON DELETE CASCADE,
+    node_name TEXT NOT NULL,
+    trace_type TEXT NOT NULL,
+    fields TEXT NOT NULL,
+    timestamp TEXT,
+    last_timestamp TEXT,
+    count INTEGER NOT NULL DEFAULT 1,
+    PRIMARY KEY (email_id, node_name, trace_type)
+) WITHOUT ROWID;
+"""
+
+_COLUMNS = ("id, created_at, thread_id, to_addr, subject, body, time, read, "
+            "job_id, ai_hint, ai_redirection, ai_request_id")
+
+
+def _row_to_email(row):
+    """Convert a row into the dict shape the UI has always used."""
+    (email_id, created_at, thread_id, to_addr, subject, body, sent_time, read,
+     job_id, ai_hint, ai_redirection, ai_request_id) = row
+    return {
+        "id": email_id,
+        "created_at": created_at,
+        "thread_id": thread_id or "",
+        "to": to_addr,
+        "subject": subject,
+        "body": body,
+        "time": sent_time,
+        "read": bool(read),
+        "job_id": job_id,
+        "ai_hint": ai_hint,
+        "ai_redirection": json.loads(ai_redirection) if ai_redirection else None,
+        "ai_request_id": ai_request_id,
+    }
+
+
+class OutboxStore:
+    """Small repository API over the emails/traces tables."""
+
+    def __init__(self, path=None):
+        self.path = path or os.environ.get("OUTBOX_DB") or DEFAULT_DB_PATH
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _conn(self):
+        # sqlite3 connections are per thread; Streamlit reruns hop between threads.
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    def add(self, owner, email, ai_response=None):
+        """Insert an email (optionally with its analysis) and return its id."""
+        conn = self._conn()
+        with conn:
+            cursor = conn.execute(
+                "INSERT INTO emails (owner, created_at, thread_id, to_addr, subject, body, time, read, job_id) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (owner, email.get("created_at") or time.time(), email.get("thread_id") or "",
+                 email["to"], email["subject"], email["body"], email["time"],
+                 int(bool(email.get("read"))), email.get("job_id"))
+            )
+            email_id = cursor.lastrowid
+            if ai_response is not None:
+                self._write_analysis(conn, email_id, ai_response)
+        return email_id
+
+    def save_analysis(self, email_id, ai_response):
+        """Store an agent response on an email and clear its job_id."""
+        conn = self._conn()
+        with conn:
+            self._write_analysis(conn, email_id, ai_response)
+
+    def _write_analysis(self, conn, email_id, ai_response):
+        redirection = ai_response.get("redirection")
+        conn.execute(
+            "UPDATE emails SET ai_hint = ?, ai_redirection = ?, ai_request_id = ?, job_id = NULL WHERE id = ?",
+            (ai_response.get("result"),
+             json.dumps(redirection, ensure_ascii=False) if redirection is not None else None,
+             ai_response.get("request_id"), email_id)
+        )
+        trace = ai_response.get("trace")
+        conn.execute("DELETE FROM trace_nodes WHERE email_id = ?", (email_id,))
+        if trace:
+            conn.execute(
+                "INSERT OR REPLACE INTO traces (email_id, trace) VALUES (?, ?)",
+                (email_id, json.dumps(trace, ensure_ascii=False))
+            )
+            index = ai_response.get("trace_index")
+            self._write_trace_index(conn, email_id, build_trace_index(trace) if index is None else index)
+        else:
+            conn.execute("DELETE FROM traces WHERE email_id = ?", (email_id,))
+
+    def _write_trace_index(self, conn, email_id, index):
+        conn.executemany(
+            "INSERT OR REPLACE INTO trace_nodes "
+            "(email_id, node_name, trace_type, fields, timestamp, last_timestamp, count) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [
+                (email_id, node_name, trace_type, json.dumps(entry["fields"], ensure_ascii=False),
+                 entry.get("timestamp"), entry.get("last_timestamp"), entry.get("count", 1))
+                for node_name, node in index.items()
+                for trace_type, entry in node.items()
+            ]
+        )
+
+    def set_job(self, email_id, job_id):
+        conn = self._conn()
+        with conn:
+            conn.execute("UPDATE emails SET job_id = ? WHERE id = ?", (job_id, email_id))
+
+    def get(self, email_id):
+        row = self._conn().execute(
+            f"SELECT {_COLUMNS} FROM emails WHERE id = ?", (email_id,)
+        ).fetchone()
+        return _row_to_email(row) if row else None
+
+    def get_trace(self, email_id):
+        row = self._conn().execute(
+            "SELECT trace FROM traces WHERE email_id = ?", (email_id,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def node_fields(self, email_id, node_name="Prompt_1", trace_type="nodeInputTrace"):
+        """One node's mapped fields, read by primary key without touching the raw trace."""
+        row = self._conn().execute(
+            "SELECT fields FROM trace_nodes WHERE email_id = ? AND node_name = ? AND trace_type = ?",
+            (email_id, node_name, trace_type)
+        ).fetchone()
+        return json.loads(row[0]) if row else {}
+
+    def get_trace_index(self, email_id, with_fields=False):
+        """The trace index of an email ({node: {trace_type: entry}})."""
+        columns = "node_name, trace_type, timestamp, last_timestamp, count"
+        if with_fields:
+            columns += ", fields"
+        rows = self._conn().execute(
+            f"SELECT {columns} FROM trace_nodes WHERE email_id = ?", (email_id,)
+        ).fetchall()
+        index = {}
+        for row in rows:
+            entry = {"timestamp": row[2], "count": row[4]}
+            if row[3] is not None:
+                entry["last_timestamp"] = row[3]
+            if with_fields:
+                entry["fields"] = json.loads(row[5])
+            index.setdefault(row[0], {})[row[1]] = entry
+        return index
+
+    def count(self, owner):
+        return self._conn().execute(
+            "SELECT COUNT(*) FROM emails WHERE owner = ?", (owner,)
+        ).fetchone()[0]
+
+    def page(self, owner, offset=0, limit=20):
+        """Newest-first slice of an owner's emails, without traces."""
+        rows = self._conn().execute(
+            f"SELECT {_COLUMNS} FROM emails WHERE owner = ? "
+            "ORDER BY created_at DESC, id DESC LIMIT ? OFFSET ?",
+            (owner, limit, offset)
+        ).fetchall()
+        return [_row_to_email(row) for row in rows]
+
+    def count_pending(self, owner):
+        return self._conn().execute(
+            "SELECT COUNT(*) FROM emails WHERE owner = ? AND ai_hint IS NULL AND job_id IS NULL",
+            (owner,)
+        ).fetchone()[0]
+
+    def pending(self, owner, limit=500):
+        """Emails that have neither an analysis nor a running job."""
+        rows = self._conn().execute(
+            f"SELECT {_COLUMNS} FROM emails WHERE owner = ? AND ai_hint IS NULL AND job_id IS NULL "
+            "ORDER BY created_at DESC, id DESC LIMIT ?",
+            (owner, limit)
+        ).fetchall()
+        return [_row_to_email(row) for row in rows]
+
+    def find_by_job(self, job_id):
+        row = self._conn().execute(
+            f"SELECT {_COLUMNS} FROM emails WHERE job_id = ?", (job_id,)
+        ).fetchone()
+        return _row_to_email(row) if row else None
+
+    def by_thread(self, thread_id, limit=100):
+        rows = self._conn().execute(
+            f"SELECT {_COLUMNS} FROM emails WHERE thread_id = ? ORDER BY created_at LIMIT ?",
+            (thread_id, limit)
+        ).fetchall()
+        return [_row_to_email(row) for row in rows]
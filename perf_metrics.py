@@ -0,0 +1,225 @@
+"""
+Per-request latency and token metrics for the agent pipeline.
+
+For every answered request we record the client-side wall-clock time of the
+POST plus, from the Bedrock Flow trace index, each node's duration (first
+input event to last output event) and token usage. Rows are kept per
+request_id in SQLite and summarized into per-node p50/p95 for the
+Performance page, JSONL export and Prometheus text exposition.
+
+    PERF_METRICS_DB   path of the SQLite file (default perf_metrics.db next to this file)
+"""
+
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "perf_metrics.db")
+
+# Pseudo node names for whole-request measurements
+CLIENT_NODE = "client"  # POST round trip as seen by the Streamlit server
+FLOW_NODE = "flow"      # first to last timestamp in the Bedrock Flow trace
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS request_metrics (
+    request_id TEXT NOT NULL,
+    recorded_at REAL NOT NULL,
+    node TEXT NOT NULL,
+    duration_ms REAL,
+    input_tokens INTEGER,
+    output_tokens INTEGER,
+    PRIMARY KEY (request_id, node)
+);
+CREATE INDEX IF NOT EXISTS idx_request_metrics_recorded ON request_metrics (recorded_at DESC);
+"""
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of numbers."""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def parse_timestamp(value):
+    """Epoch seconds from an ISO-8601 string or an epoch number (s or ms)."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return value / 1000 if value > 1e11 else float(value)
+    try:
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        try:
+            return parse_timestamp(float(value))
+        except ValueError:
+            return None
+
+
+def node_timings(index):
+    """Per-node duration and tokens from a trace index.
+
+    A node's duration runs from its earliest to its latest trace event
+    (e.g. nodeInputTrace -> nodeOutputTrace); nodes with a single
+    timestamp get duration None. A FLOW_NODE entry spans the whole trace.
+    """
+    timings = {}
+    flow_start = flow_end = None
+    for node_name, node in (index or {}).items():
+        stamps = []
+        input_tokens = output_tokens = None
+        for entry in node.values():
+            for key in ("timestamp", "last_timestamp"):
+                parsed = parse_timestamp(entry.get(key))
+                if parsed is not None:
+                    stamps.append(parsed)
+            if "input_tokens" in entry:
+                input_tokens = (input_tokens or 0) + entry["input_tokens"]
+                output_tokens = (output_tokens or 0) + entry.get("output_tokens", 0)
+        duration = (max(stamps) - min(stamps)) * 1000 if len(stamps) > 1 else None
+        timings[node_name] = {
+            "duration_ms": duration,
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+        }
+        if stamps:
+            flow_start = min(stamps) if flow_start is None else min(flow_start, min(stamps))
+            flow_end = max(stamps) if flow_end is None else max(flow_end, max(stamps))
+    if flow_start is not None and flow_end > flow_start:
+        timings[FLOW_NODE] = {
+            "duration_ms": (flow_end - flow_start) * 1000,
+            "input_tokens": sum(t["input_tokens"] or 0 for t in timings.values()) or None,
+            "output_tokens": sum(t["output_tokens"] or 0 for t in timings.values()) or None,
+        }
+    return timings
+
+
+class MetricsStore:
+    def __init__(self, path=None):
+        self.path = path or os.environ.get("PERF_METRICS_DB") or DEFAULT_DB_PATH
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def record(self, request_id, client_ms, index=None, recorded_at=None):
+        """Store the client round trip and per-node timings for one request."""
+        recorded_at = recorded_at or time.time()
+        rows = [(request_id, recorded_at, CLIENT_NODE, client_ms, None, None)]
+        for node_name, timing in node_timings(index).items():
+            rows.append((request_id, recorded_at, node_name, timing["duration_ms"],
+                         timing["input_tokens"], timing["output_tokens"]))
+        conn = self._conn()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO request_metrics "
+                "(request_id, recorded_at, node, duration_ms, input_tokens, output_tokens) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+
+    def rows(self, limit=10000, since=None):
+        """Most recent metric rows as dicts, newest first."""
+        query = ("SELECT request_id, recorded_at, node, duration_ms, input_tokens, output_tokens "
+                 "FROM request_metrics")
+        params = []
+        if since is not None:
+            query += " WHERE recorded_at >= ?"
+            params.append(since)
+        query += " ORDER BY recorded_at DESC LIMIT ?"
+        params.append(limit)
+        keys = ("request_id", "recorded_at", "node", "duration_ms", "input_tokens", "output_tokens")
+        return [dict(zip(keys, row)) for row in self._conn().execute(query, params)]
+
+
+def summarize(rows):
+    """Per-node count, p50/p95 duration and mean tokens, client and flow first."""
+    by_node = {}
+    for row in rows:
+        by_node.setdefault(row["node"], []).append(row)
+    order = {CLIENT_NODE: 0, FLOW_NODE: 1}
+    summary = []
+    for node in sorted(by_node, key=lambda name: (order.get(name, 2), name)):
+        node_rows = by_node[node]
+        durations = [r["duration_ms"] for r in node_rows if r["duration_ms"] is not None]
+        input_tokens = [r["input_tokens"] for r in node_rows if r["input_tokens"] is not None]
+        output_tokens = [r["output_tokens"] for r in node_rows if r["output_tokens"] is not None]
+        summary.append({
+            "node": node,
+            "count": len(node_rows),
+            "samples": len(durations),
+            "p50_ms": _round(percentile(durations, 50)),
+            "p95_ms": _round(percentile(durations, 95)),
+            "sum_ms": _round(sum(durations)),
+            "avg_input_tokens": _round(sum(input_tokens) / len(input_tokens)) if input_tokens else None,
+            "avg_output_tokens": _round(sum(output_tokens) / len(output_tokens)) if output_tokens else None,
+            "input_tokens_total": sum(input_tokens),
+            "output_tokens_total": sum(output_tokens),
+        })
+    return summary
+
+
+def _round(value):
+    return round(value, 3) if value is not None else None
+
+
+def to_jsonl(rows):
+    return "".join(json.dumps(row, ensure_ascii=False) + "\n" for row in rows)
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def to_prometheus(summary, prefix="mail_assistant"):
+    """Prometheus text exposition of a summarize() result."""
+    lines = [
+        f"# HELP {prefix}_node_duration_ms Bedrock Flow node and client request latency in milliseconds.",
+        f"# TYPE {prefix}_node_duration_ms summary",
+    ]
+    for item in summary:
+        node = _label(item["node"])
+        for quantile, key in (("0.5", "p50_ms"), ("0.95", "p95_ms")):
+            if item[key] is not None:
+                lines.append(f'{prefix}_node_duration_ms{{node="{node}",quantile="{quantile}"}} {item[key]}')
+        lines.append(f'{prefix}_node_duration_ms_sum{{node="{node}"}} {item["sum_ms"] or 0}')
+        lines.append(f'{prefix}_node_duration_ms_count{{node="{node}"}} {item["samples"]}')
+    lines += [
+        f"# HELP {prefix}_node_tokens_total Tokens reported by Bedrock Flow nodes.",
+        f"# TYPE {prefix}_node_tokens_total counter",
+    ]
+    for item in summary:
+        if item["node"] == FLOW_NODE:
+            continue
+        node = _label(item["node"])
+        if item["input_tokens_total"] or item["output_tokens_total"]:
+            lines.append(f'{prefix}_node_tokens_total{{node="{node}",direction="input"}} {item["input_tokens_total"]}')
+            lines.append(f'{prefix}_node_tokens_total{{node="{node}",direction="output"}} {item["output_tokens_total"]}')
+    return "\n".join(lines) + "\n"
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """Return the process-wide metrics store."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = MetricsStore()
+    return _store
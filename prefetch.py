@@ -0,0 +1,141 @@
+"""
+Speculative prefetch of agent answers for Compose drafts.
+
+When a quick template is loaded, or a typed draft has stayed unchanged for
+PREFETCH_DEBOUNCE seconds, the agent call for that exact draft starts in
+the background. Pressing Send with the same draft claims that call: its
+answer is shown at once, or after whatever is left of the running call,
+instead of paying the full agent latency again.
+
+Any edit cancels the speculation. A call that has not started yet never
+runs, and a running call's result is simply dropped (get_ai_suggestion has
+still cached it). Each user may start at most PREFETCH_BUDGET speculative
+calls per PREFETCH_WINDOW seconds, so typing cannot run up the Bedrock bill.
+
+Drafts with a thread_id are never prefetched, because the agent would add
+the unsent draft to that thread's memory.
+
+    PREFETCH_ENABLED   "0" turns speculation off (default 1)
+    PREFETCH_DEBOUNCE  seconds a typed draft must stay unchanged (default 2)
+    PREFETCH_BUDGET    speculative calls per user per window (default 10)
+    PREFETCH_WINDOW    budget window in seconds (default 3600)
+    PREFETCH_WORKERS   threads running speculative calls (default 4)
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+import response_cache
+
+ENABLED = os.environ.get("PREFETCH_ENABLED", "1") == "1"
+DEBOUNCE = float(os.environ.get("PREFETCH_DEBOUNCE", "2"))
+BUDGET = int(os.environ.get("PREFETCH_BUDGET", "10"))
+WINDOW = float(os.environ.get("PREFETCH_WINDOW", "3600"))
+WORKERS = int(os.environ.get("PREFETCH_WORKERS", "4"))
+# Users whose drafts are remembered before the least recently seen is dropped
+MAX_USERS = 1000
+
+IDLE = "idle"
+WAITING = "waiting"
+RUNNING = "running"
+READY = "ready"
+OVER_BUDGET = "over_budget"
+
+
+class _Draft:
+    __slots__ = ("key", "seen_at", "future", "claimed")
+
+    def __init__(self, key, seen_at):
+        self.key = key
+        self.seen_at = seen_at
+        self.future = None
+        self.claimed = False
+
+
+class Prefetcher:
+    """Per-user speculative calls of fn(body, thread_id), one draft per user."""
+
+    def __init__(self, fn, debounce=DEBOUNCE, budget=BUDGET, window=WINDOW, max_workers=WORKERS):
+        self.debounce = debounce
+        self.budget = budget
+        self.window = window
+        self._fn = fn
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="prefetch")
+        self._drafts = OrderedDict()  # user -> _Draft
+        self._spent = {}  # user -> deque of start times inside the window
+        self._lock = threading.Lock()
+        self.counts = {"started": 0, "claimed": 0, "cancelled": 0, "over_budget": 0}
+
+    def observe(self, user, body, thread_id=None, immediate=False):
+        """Report the user's current draft; starts a speculative call once it is due.
+
+        immediate skips the debounce (a template was just loaded). Returns
+        one of IDLE, WAITING, RUNNING, READY or OVER_BUDGET.
+        """
+        now = time.monotonic()
+        with self._lock:
+            draft = self._drafts.get(user)
+            if not (body or "").strip() or thread_id:
+                if draft is not None:
+                    self._cancel(draft)
+                    del self._drafts[user]
+                return IDLE
+            key = response_cache.make_key(body)
+            if draft is None or draft.key != key:
+                if draft is not None:
+                    self._cancel(draft)
+                draft = self._drafts[user] = _Draft(key, now)
+                while len(self._drafts) > MAX_USERS:
+                    self._cancel(self._drafts.popitem(last=False)[1])
+            self._drafts.move_to_end(user)
+            if draft.claimed:
+                return IDLE  # already sent; not speculated again until it is edited
+            if draft.future is not None:
+                return READY if draft.future.done() else RUNNING
+            if not immediate and now - draft.seen_at < self.debounce:
+                return WAITING
+            spent = self._spent.setdefault(user, deque())
+            while spent and now - spent[0] > self.window:
+                spent.popleft()
+            if len(spent) >= self.budget:
+                self.counts["over_budget"] += 1
+                return OVER_BUDGET
+            spent.append(now)
+            self.counts["started"] += 1
+            draft.future = self._executor.submit(self._fn, body, thread_id)
+            return RUNNING
+
+    def claim(self, user, body, thread_id=None):
+        """The speculative call (a Future) for exactly this draft, or None; it is handed over once."""
+        if thread_id:
+            return None
+        key = response_cache.make_key(body or "")
+        with self._lock:
+            draft = self._drafts.get(user)
+            if draft is None or draft.key != key:
+                return None
+            future, draft.future, draft.claimed = draft.future, None, True
+            if future is None or future.cancelled():
+                return None
+            self.counts["claimed"] += 1
+            return future
+
+    def cancel(self, user):
+        with self._lock:
+            draft = self._drafts.pop(user, None)
+            if draft is not None:
+                self._cancel(draft)
+
+    def _cancel(self, draft):
+        if draft.future is not None and not draft.future.done():
+            draft.future.cancel()  # only stops calls that have not started; running ones are dropped
+            self.counts["cancelled"] += 1
+
+    def remaining_budget(self, user):
+        now = time.monotonic()
+        with self._lock:
+            spent = self._spent.get(user, ())
+            return self.budget - sum(1 for started in spent if now - started <= self.window)
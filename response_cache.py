@@ -0,0 +1,182 @@
+"""
+Content-addressed cache for Lambda agent responses.
+
+Entries are keyed by a hash of the normalized query plus thread_id, expire
+after a TTL and are evicted least-recently-used once the in-memory copy
+grows past a byte budget (entries are counted by their UTF-8 JSON size).
+Setting RESPONSE_CACHE_DB persists entries to a SQLite file so they
+survive restarts. Only answers the agent produced are kept: error replies
+and locally routed answers carry no request_id and are never cached.
+mail.py only caches queries without a thread_id; an answer on a thread
+depends on its history, which conversation_context keeps track of.
+
+    RESPONSE_CACHE_TTL        seconds an entry stays valid (default 86400)
+    RESPONSE_CACHE_MAX_BYTES  in-memory budget in bytes (default 64 MB)
+    RESPONSE_CACHE_DB         optional path to a SQLite file
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import text_normalize
+
+DEFAULT_TTL = float(os.environ.get("RESPONSE_CACHE_TTL", "86400"))
+DEFAULT_MAX_BYTES = int(os.environ.get("RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+DEFAULT_DB_PATH = os.environ.get("RESPONSE_CACHE_DB") or None
+
+
+def normalize_query(text):
+    """Turkish-aware lowercase, ASCII fold, leading greeting and whitespace removed.
+
+    Signatures and personal data stay in the key on purpose: answers
+    address the sender and quote their numbers, so they must not be shared.
+    """
+    return text_normalize.normalize(text, greetings=True, signature=False, pii=False)
+
+
+def make_key(query, thread_id=None):
+    raw = f"{normalize_query(query)}\x1f{(thread_id or '').strip()}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def cacheable(value):
+    """True for an agent answer; errors ("⚠️ ...") and local routing replies have no request_id."""
+    return (isinstance(value, dict) and bool(value.get("request_id"))
+            and not str(value.get("result") or "").startswith("⚠️"))
+
+
+class ResponseCache:
+    """Thread-safe LRU + TTL cache with an optional SQLite backing store."""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, ttl=DEFAULT_TTL, db_path=DEFAULT_DB_PATH):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (expires_at, size, value)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    @property
+    def size_bytes(self):
+        return self._bytes
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, query, thread_id=None):
+        """Return the cached response or None, updating hit/miss counters."""
+        key = make_key(query, thread_id)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[2]
+            if entry:
+                self._drop(key)
+            value = self._load(key, now)
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return value
+
+    def put(self, query, thread_id, value, ttl=None):
+        """Store an agent answer; returns False (storing nothing) when it is not cacheable()."""
+        if not cacheable(value):
+            return False
+        key = make_key(query, thread_id)
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        encoded = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            self._store(key, expires_at, len(encoded.encode("utf-8")), value)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, encoded, expires_at)
+                )
+                self._db.commit()
+        return True
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.hits = 0
+            self.misses = 0
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+        }
+
+    # Callers hold self._lock for the helpers below.
+
+    def _store(self, key, expires_at, size, value):
+        if key in self._entries:
+            self._drop(key)
+        if size > self.max_bytes:
+            return
+        self._entries[key] = (expires_at, size, value)
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+
+    def _drop(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def _load(self, key, now):
+        if self._db is None:
+            return None
+        row = self._db.execute(
+            "SELECT value, expires_at FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        encoded, expires_at = row
+        if expires_at <= now:
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._db.commit()
+            return None
+        value = json.loads(encoded)
+        self._store(key, expires_at, len(encoded.encode("utf-8")), value)
+        return value
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """Return the process-wide response cache shared by all Streamlit sessions."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResponseCache()
+    return _cache
@@ -0,0 +1,196 @@
+"""
+Local department router over the `department data` knowledge base.
+
+Each department has a `<id>.txt` file (a description line followed by a
+keyword list) and a `<id>.txt.metadata.json` with its display name and
+e-mail addresses. The files are read once into a small BM25 index, so a
+query is routed in microseconds without calling the Lambda:
+
+    router.get_router().route("eduroma nasıl bağlanabilirim?")
+    -> [{"department": "network", "name": "Ağ Grubu", "emails": "...",
+         "score": 7.1, "confidence": 0.62}, ...]
+
+Keywords and the department name count more than the description.
+Queries go through text_normalize (greetings, signatures and personal data
+removed) and every token is ASCII-folded and cut to a 5 character prefix,
+which is a cheap but effective stemmer for Turkish suffixes
+("bağlanabilirim" and "bağlantı" both become "bagla").
+
+`confidence` is the top score's relative margin over the runner-up
+(0..1). as_redirection() wraps a match in the same shape the Lambda
+returns in `redirection`, so the UI can show it interchangeably.
+
+    DEPARTMENT_DATA_DIR  directory with the department files (default "department data")
+"""
+
+import json
+import math
+import os
+import re
+import threading
+
+import text_normalize
+
+DEFAULT_DATA_DIR = os.environ.get("DEPARTMENT_DATA_DIR") or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "department data"
+)
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+# Field weights (term frequency multipliers)
+DESCRIPTION_WEIGHT = 1
+KEYWORD_WEIGHT = 3
+NAME_WEIGHT = 2
+PREFIX_LENGTH = 5
+# A match needs at least this BM25 score before it may stand in for the agent
+MIN_CONFIDENT_SCORE = 5.0
+
+_TOKEN_RE = re.compile(r"\w+")
+_STOPWORDS = {
+    "ve", "veya", "ile", "bir", "bu", "şu", "o", "da", "de", "mi", "mı", "mu", "mü", "ne", "için",
+    "gibi", "çok", "daha", "ama", "ancak", "nasıl", "neden", "hangi", "var", "yok", "olarak",
+    "merhaba", "merhabalar", "selam", "iyi", "günler", "çalışmalar", "hocam", "sayın", "yetkili",
+    "teşekkürler", "teşekkür", "ederim", "saygılarımla", "rica", "arz", "bilgilerinize",
+    "the", "and", "for", "you", "please", "hello", "thanks", "regards",
+}
+_FOLDED_STOPWORDS = {text_normalize.fold_ascii(word) for word in _STOPWORDS}
+_FOLDED_STOPWORDS.update(placeholder.strip("<>") for placeholder in text_normalize.PLACEHOLDERS)
+
+
+def tokenize(text, clean=False):
+    """Normalize, drop stopwords and digits, cut to a prefix stem.
+
+    clean=True also strips greetings, signatures and personal data, which
+    is what incoming messages need; department profiles are indexed as is.
+    """
+    normalized = text_normalize.normalize(text, greetings=clean, signature=clean, pii=clean)
+    tokens = []
+    for token in _TOKEN_RE.findall(normalized):
+        if len(token) < 2 or token.isdigit() or token in _FOLDED_STOPWORDS:
+            continue
+        tokens.append(token[:PREFIX_LENGTH])
+    return tokens
+
+
+def load_departments(data_dir=DEFAULT_DATA_DIR):
+    """Read every department profile as {department, name, emails, description, keywords}."""
+    departments = []
+    for filename in sorted(os.listdir(data_dir)):
+        if not filename.endswith(".txt"):
+            continue
+        with open(os.path.join(data_dir, filename), encoding="utf-8") as f:
+            lines = f.read().strip().splitlines()
+        metadata = {}
+        metadata_path = os.path.join(data_dir, filename + ".metadata.json")
+        if os.path.exists(metadata_path):
+            with open(metadata_path, encoding="utf-8") as f:
+                metadata = json.load(f).get("metadataAttributes", {})
+        department_id = filename[:-len(".txt")]
+        departments.append({
+            "department": department_id,
+            "name": metadata.get("name") or department_id,
+            "emails": metadata.get("emails") or "",
+            "description": lines[0] if lines else "",
+            "keywords": " ".join(lines[1:]).strip('" '),
+        })
+    return departments
+
+
+class DepartmentRouter:
+    """BM25 index over department profiles (sparse postings, pure Python)."""
+
+    def __init__(self, departments):
+        self.departments = departments
+        self._postings = {}  # term -> [(doc, weighted tf)]
+        lengths = []
+        for doc, department in enumerate(departments):
+            counts = {}
+            for text, weight in ((department["description"], DESCRIPTION_WEIGHT),
+                                 (department["keywords"], KEYWORD_WEIGHT),
+                                 (department["name"], NAME_WEIGHT)):
+                for token in tokenize(text):
+                    counts[token] = counts.get(token, 0) + weight
+            lengths.append(sum(counts.values()))
+            for token, tf in counts.items():
+                self._postings.setdefault(token, []).append((doc, tf))
+        avg_length = sum(lengths) / len(lengths) if lengths else 1.0
+        self._norms = [K1 * (1 - B + B * length / avg_length) for length in lengths]
+        n = len(departments)
+        self._idf = {
+            term: math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for term, postings in self._postings.items()
+        }
+
+    @classmethod
+    def from_directory(cls, data_dir=DEFAULT_DATA_DIR):
+        return cls(load_departments(data_dir))
+
+    def scores(self, tokens):
+        """BM25 score per matching department index."""
+        scores = {}
+        for term in set(tokens):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = self._idf[term]
+            for doc, tf in postings:
+                scores[doc] = scores.get(doc, 0.0) + idf * tf * (K1 + 1) / (tf + self._norms[doc])
+        return scores
+
+    def route(self, text, k=3):
+        """Top-k departments for a message, best first; empty when nothing matches."""
+        scores = self.scores(tokenize(text, clean=True))
+        if not scores:
+            return []
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        top = ranked[0][1]
+        runner_up = ranked[1][1] if len(ranked) > 1 else 0.0
+        confidence = (top - runner_up) / top if top > 0 else 0.0
+        matches = []
+        for rank, (doc, score) in enumerate(ranked[:k]):
+            department = self.departments[doc]
+            matches.append({
+                "department": department["department"],
+                "name": department["name"],
+                "emails": department["emails"],
+                "score": round(score, 4),
+                "confidence": round(confidence, 4) if rank == 0 else None,
+            })
+        return matches
+
+    def best(self, text):
+        matches = self.route(text, k=1)
+        return matches[0] if matches else None
+
+    def confident_match(self, text, min_confidence, min_score=MIN_CONFIDENT_SCORE):
+        """Best match if it is both strong and clearly ahead of the runner-up, else None."""
+        match = self.best(text)
+        if match and match["score"] >= min_score and match["confidence"] >= min_confidence:
+            return match
+        return None
+
+
+def as_redirection(match):
+    """A route() match in the Lambda's `redirection` shape."""
+    if not match:
+        return None
+    return {
+        "score": match["confidence"],
+        "source": "local_router",
+        "metadata": {"name": match["name"], "emails": match["emails"]},
+    }
+
+
+_router = None
+_router_lock = threading.Lock()
+
+
+def get_router():
+    """Return the process-wide router, indexing the department files on first use."""
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                _router = DepartmentRouter.from_directory()
+    return _router
@@ -0,0 +1,239 @@
+"""
+Near-duplicate lookup of previously answered threads (MinHash + LSH).
+
+Every thread in the corpus is indexed twice: by its first message (the
+question) and by its llm_context_text. A Compose body is normalized with
+text_normalize, cut into character 5-gram shingles and turned into a
+MinHash signature; LSH banding finds candidate threads without comparing
+against the whole corpus, and candidates are ranked by the fraction of
+equal signature slots (an estimate of Jaccard similarity).
+
+Signatures use one-permutation hashing: each shingle is hashed once with
+crc32 and kept as the minimum of one of NUM_HASHES bins, empty bins are
+filled from their right neighbour. That is a single pass over the shingles
+instead of NUM_HASHES passes, which keeps a lookup well under a
+millisecond in pure Python.
+
+The index is incremental: add() accepts new threads at any time and
+replaces an existing entry with the same key.
+
+The corpus index is shared by the whole process. Answers sent from the app
+go into a separate index per inbox (remember()), and lookup() only searches
+the corpus and the caller's own inbox, so one user's mail is never offered
+to another.
+
+    THREAD_CORPUS        thread dump(s) to index, separated by os.pathsep
+                         (default 2025-November.json)
+    SIMILAR_MAX_INBOXES  inbox indexes kept before the least recently used is dropped (default 1000)
+"""
+
+import os
+import threading
+import zlib
+from collections import OrderedDict
+
+import text_normalize
+import thread_corpus
+
+DEFAULT_CORPUS_PATHS = os.environ.get("THREAD_CORPUS") or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "2025-November.json"
+)
+
+MAX_INBOXES = int(os.environ.get("SIMILAR_MAX_INBOXES", "1000"))
+
+SHINGLE_SIZE = 5
+NUM_HASHES = 64
+BANDS = 16  # 4 rows per band: pairs above ~0.5 similarity usually share a bucket
+MIN_SIMILARITY = 0.3
+_BIN_BITS = NUM_HASHES.bit_length() - 1
+_EMPTY = 1 << 32
+
+
+def shingles(text):
+    """Character shingles of the normalized text (the whole text if shorter)."""
+    normalized = text_normalize.normalize(text)
+    if len(normalized) <= SHINGLE_SIZE:
+        return {normalized} if normalized else set()
+    return {normalized[i:i + SHINGLE_SIZE] for i in range(len(normalized) - SHINGLE_SIZE + 1)}
+
+
+def signature(text):
+    """One-permutation MinHash signature (tuple of NUM_HASHES ints), None for empty text."""
+    values = [_EMPTY] * NUM_HASHES
+    mask = NUM_HASHES - 1
+    found = False
+    for shingle in shingles(text):
+        h = zlib.crc32(shingle.encode("utf-8"))
+        slot = h & mask
+        value = h >> _BIN_BITS
+        if value < values[slot]:
+            values[slot] = value
+            found = True
+    if not found:
+        return None
+    # Densify: an empty bin borrows the next non-empty bin's value
+    for i in range(NUM_HASHES):
+        if values[i] == _EMPTY:
+            j = (i + 1) % NUM_HASHES
+            while values[j] == _EMPTY:
+                j = (j + 1) % NUM_HASHES
+            values[i] = values[j] + (j - i) % NUM_HASHES * (1 << 27)
+    return tuple(values)
+
+
+def similarity(sig_a, sig_b):
+    """Estimated Jaccard similarity of two signatures."""
+    return sum(a == b for a, b in zip(sig_a, sig_b)) / NUM_HASHES
+
+
+def first_answer(thread):
+    """First message in the thread from someone other than the original sender."""
+    history = thread.get("llm_chat_history") or []
+    if not history:
+        return ""
+    sender = history[0].get("name")
+    for message in history[1:]:
+        if message.get("name") != sender and (message.get("content") or "").strip():
+            return message["content"]
+    return ""
+
+
+class SimilarThreadIndex:
+    """Incremental LSH index from entry key to MinHash signature and payload."""
+
+    def __init__(self):
+        self._rows = NUM_HASHES // BANDS
+        self._buckets = [{} for _ in range(BANDS)]  # band -> {band values: set(keys)}
+        self._signatures = {}
+        self._payloads = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._signatures)
+
+    def _bands(self, sig):
+        rows = self._rows
+        return [sig[band * rows:(band + 1) * rows] for band in range(BANDS)]
+
+    def add(self, key, text, payload):
+        """Index text under key (replacing a previous entry); False if text has no shingles."""
+        sig = signature(text)
+        if sig is None:
+            return False
+        with self._lock:
+            self._remove(key)
+            for bucket, band in zip(self._buckets, self._bands(sig)):
+                bucket.setdefault(band, set()).add(key)
+            self._signatures[key] = sig
+            self._payloads[key] = payload
+        return True
+
+    def _remove(self, key):
+        old = self._signatures.pop(key, None)
+        if old is None:
+            return
+        self._payloads.pop(key, None)
+        for bucket, band in zip(self._buckets, self._bands(old)):
+            keys = bucket.get(band)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del bucket[band]
+
+    def add_thread(self, thread, source="corpus"):
+        """Index a corpus-shaped thread by its first question and its context text."""
+        thread_id = thread.get("thread_id")
+        payload = {
+            "thread_id": thread_id,
+            "subject": thread.get("subject") or "",
+            "question": thread_corpus.first_question(thread),
+            "answer": first_answer(thread),
+            "source": source,
+        }
+        self.add((thread_id, "question"), payload["question"], payload)
+        if thread.get("llm_context_text"):
+            self.add((thread_id, "context"), thread["llm_context_text"], payload)
+
+    def add_answer(self, key, question, answer, thread_id=None, subject="", source="outbox"):
+        """Index a question answered in this app so later near-duplicates find it."""
+        payload = {"thread_id": thread_id, "subject": subject, "question": question,
+                   "answer": answer, "source": source}
+        return self.add((key, "question"), question, payload)
+
+    def query(self, text, k=3, min_similarity=MIN_SIMILARITY):
+        """Up to k most similar threads as payload dicts with a `similarity`, best first."""
+        sig = signature(text)
+        if sig is None:
+            return []
+        with self._lock:
+            candidates = set()
+            for bucket, band in zip(self._buckets, self._bands(sig)):
+                candidates.update(bucket.get(band, ()))
+            best = {}
+            for key in candidates:
+                score = similarity(sig, self._signatures[key])
+                payload = self._payloads[key]
+                thread_key = payload["thread_id"] or key
+                if score >= min_similarity and score > best.get(thread_key, (0.0,))[0]:
+                    best[thread_key] = (score, payload)
+        ranked = sorted(best.values(), key=lambda item: item[0], reverse=True)[:k]
+        return [dict(payload, similarity=round(score, 3)) for score, payload in ranked]
+
+
+def load_threads(paths=DEFAULT_CORPUS_PATHS):
+    return thread_corpus.iter_threads(paths.split(os.pathsep) if isinstance(paths, str) else paths)
+
+
+def build_index(threads):
+    index = SimilarThreadIndex()
+    for thread in threads:
+        index.add_thread(thread)
+    return index
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    """Return the process-wide index, built from THREAD_CORPUS on first use."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = build_index(load_threads())
+    return _index
+
+
+_inboxes = OrderedDict()  # user_id -> SimilarThreadIndex of answers sent from that inbox
+_inboxes_lock = threading.Lock()
+
+
+def _inbox_index(user_id, create=False):
+    with _inboxes_lock:
+        index = _inboxes.get(user_id)
+        if index is not None:
+            _inboxes.move_to_end(user_id)
+        elif create:
+            index = _inboxes[user_id] = SimilarThreadIndex()
+            while len(_inboxes) > MAX_INBOXES:
+                _inboxes.popitem(last=False)
+        return index
+
+
+def remember(user_id, key, question, answer, thread_id=None, subject=""):
+    """Index an answer sent from user_id's inbox; only that inbox's lookups will see it."""
+    return _inbox_index(user_id, create=True).add_answer(key, question, answer, thread_id=thread_id,
+                                                         subject=subject)
+
+
+def lookup(user_id, text, k=3, min_similarity=MIN_SIMILARITY):
+    """Up to k matches from the shared corpus and user_id's own answers, best first."""
+    matches = get_index().query(text, k, min_similarity)
+    inbox = _inbox_index(user_id)
+    if inbox is not None:
+        matches += inbox.query(text, k, min_similarity)
+    best = {}
+    for match in sorted(matches, key=lambda match: match["similarity"], reverse=True):
+        best.setdefault(match["thread_id"] or id(match), match)
+    return list(best.values())[:k]
@@ -0,0 +1,177 @@
+"""
+Cold-start and per-rerun profiling for the Streamlit entry point.
+
+import_report() runs the top-level imports of mail.py in a fresh
+interpreter under `python -X importtime` and returns per-module self and
+cumulative times. check_budget() (the `check` command) fails when their
+total goes over IMPORT_BUDGET_MS. It is the regression gate for heavy
+dependencies slipping back into the import path; tests/test_startup.py
+runs it with the test suite.
+
+RerunProfiler times the sections of each script run (init, sidebar, the
+page) between mark() calls. It keeps the most recent runs for the
+Performance page. With PROFILE_RERUNS unset, start() returns a run whose
+marks do nothing.
+
+    PROFILE_RERUNS     "1" records per-section rerun timings (default 0)
+    IMPORT_BUDGET_MS   cold-start import budget for `check` (default 1000)
+
+Usage:
+    python startup_profile.py report --top 15
+    python startup_profile.py check --budget-ms 1000
+"""
+
+import argparse
+import ast
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+ENTRY_SCRIPT = os.path.join(ROOT, "mail.py")
+PROFILE_RERUNS = os.environ.get("PROFILE_RERUNS", "0") == "1"
+IMPORT_BUDGET_MS = float(os.environ.get("IMPORT_BUDGET_MS", "1000"))
+KEEP_RUNS = 50
+
+
+def entry_imports(script=ENTRY_SCRIPT):
+    """Module names imported at the top level of `script`, in order."""
+    with open(script, encoding="utf-8") as f:
+        tree = ast.parse(f.read(), script)
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            modules.append(node.module)
+    return list(dict.fromkeys(modules))
+
+
+def import_report(modules=None, python=sys.executable):
+    """Import `modules` (default: mail.py's) in a fresh interpreter; -X importtime results.
+
+    Returns {"total_ms", "modules": [{"module", "self_ms", "cumulative_ms", "depth"}]},
+    where total_ms sums the top-level entries except interpreter startup.
+    """
+    modules = entry_imports() if modules is None else modules
+    completed = subprocess.run(
+        [python, "-X", "importtime", "-c", "import " + ", ".join(modules)],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    rows = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append({"module": name.strip(), "self_ms": int(self_us) / 1000,
+                     "cumulative_ms": int(cumulative_us) / 1000, "depth": depth})
+    # "site" is interpreter startup, not something the entry point imports
+    total = sum(row["cumulative_ms"] for row in rows if row["depth"] == 0 and row["module"] != "site")
+    return {"total_ms": round(total, 3), "modules": rows}
+
+
+def check_budget(budget_ms=IMPORT_BUDGET_MS, runs=3):
+    """(ok, best total_ms of `runs` cold imports, report of that run)."""
+    reports = [import_report() for _ in range(runs)]
+    best = min(reports, key=lambda report: report["total_ms"])
+    return best["total_ms"] <= budget_ms, best["total_ms"], best
+
+
+class _Run:
+    __slots__ = ("profiler", "started", "last", "sections")
+
+    def __init__(self, profiler):
+        self.profiler = profiler
+        self.started = self.last = time.perf_counter()
+        self.sections = []
+
+    def mark(self, name):
+        """Close the section that ran since the previous mark (or the start) under `name`."""
+        now = time.perf_counter()
+        self.sections.append((name, (now - self.last) * 1000))
+        self.last = now
+
+    def finish(self):
+        self.profiler._add(self.sections, (time.perf_counter() - self.started) * 1000)
+
+
+class _NoRun:
+    def mark(self, name):
+        pass
+
+    def finish(self):
+        pass
+
+
+class RerunProfiler:
+    """Per-section timings of the most recent script runs, shared by all sessions."""
+
+    def __init__(self, enabled=PROFILE_RERUNS, keep=KEEP_RUNS):
+        self.enabled = enabled
+        self._runs = deque(maxlen=keep)
+        self._lock = threading.Lock()
+
+    def start(self):
+        return _Run(self) if self.enabled else _NoRun()
+
+    def _add(self, sections, total_ms):
+        with self._lock:
+            self._runs.append({"at": time.time(), "total_ms": total_ms, "sections": sections})
+
+    def runs(self):
+        with self._lock:
+            return list(self._runs)
+
+    def summary(self):
+        """[{section, runs, p50_ms, max_ms}] over the kept runs, slowest median first."""
+        samples = {}
+        for run in self.runs():
+            for name, ms in run["sections"]:
+                samples.setdefault(name, []).append(ms)
+            samples.setdefault("total", []).append(run["total_ms"])
+        rows = [{"section": name, "runs": len(values), "p50_ms": round(statistics.median(values), 3),
+                 "max_ms": round(max(values), 3)} for name, values in samples.items()]
+        return sorted(rows, key=lambda row: row["p50_ms"], reverse=True)
+
+
+_profiler = None
+_profiler_lock = threading.Lock()
+
+
+def get_profiler():
+    """Return the process-wide rerun profiler."""
+    global _profiler
+    if _profiler is None:
+        with _profiler_lock:
+            if _profiler is None:
+                _profiler = RerunProfiler()
+    return _profiler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Profile mail.py's cold-start imports.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    report_parser = commands.add_parser("report", help="Slowest imports of mail.py in a fresh interpreter")
+    report_parser.add_argument("--top", type=int, default=15)
+    check_parser = commands.add_parser("check", help="Exit 1 if the cold import goes over the budget")
+    check_parser.add_argument("--budget-ms", type=float, default=IMPORT_BUDGET_MS)
+    check_parser.add_argument("--runs", type=int, default=3, help="Best of this many cold imports")
+    args = parser.parse_args()
+
+    if args.command == "report":
+        report = import_report()
+        slowest = sorted(report["modules"], key=lambda row: row["cumulative_ms"], reverse=True)[:args.top]
+        print(json.dumps({"total_ms": report["total_ms"], "slowest": slowest}, indent=2))
+    else:
+        ok, total_ms, report = check_budget(args.budget_ms, args.runs)
+        top_level = [row for row in report["modules"] if row["depth"] == 0 and row["module"] != "site"]
+        heaviest = sorted(top_level, key=lambda row: row["cumulative_ms"], reverse=True)[:5]
+        print(json.dumps({"ok": ok, "total_ms": total_ms, "budget_ms": args.budget_ms,
+                          "heaviest": [(row["module"], row["cumulative_ms"]) for row in heaviest]}))
+        sys.exit(0 if ok else 1)
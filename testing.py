@@ -1,8 +1,9 @@
 import streamlit as st
-import requests
 import os
 from datetime import datetime
 import time
+
+import lambda_client
  
 # --- CONFIG & STYLING ---
 st.set_page_config(page_title="Mail Assistant Pro", page_icon="✨", layout="wide")
@@ -67,10 +68,9 @@ def get_ai_suggestion(user_text):
     """Fetches AI suggestion from AWS Lambda."""
     payload = {"input": {"query": user_text}}
     try:
-        # Real Call to Lambda
-        response = requests.post(LAMBDA_URL, json=payload, timeout=500)
-        response.raise_for_status()
-        return response.json().get("result", "AI Suggestion received, but output key was missing.")
+        # Real Call to Lambda (pooled keep-alive session with retries)
+        data = lambda_client.post_json(LAMBDA_URL, payload)
+        return data.get("result", "AI Suggestion received, but output key was missing.")
     except Exception as e:
         return f"⚠️ Error connecting to AI Agent: {str(e)}"
  
@@ -0,0 +1,46 @@
+import time
+
+import auth
+
+USERS = {"admin": {"name": "Admin User", "email": "", "password_hash": auth.DEV_PASSWORD_HASH}}
+
+
+def test_token_round_trip_and_expiry():
+    token = auth.issue_token("admin", USERS["admin"])
+    assert auth.verify_token(token, USERS) == "admin"
+    assert auth.verify_token(token, USERS, now=time.time() + auth.TOKEN_TTL + 1) is None
+    assert auth.verify_token(token[:-2] + "xx", USERS) is None
+    assert auth.verify_token("not-a-token", USERS) is None
+
+
+def test_revoke_invalidates_earlier_tokens_only():
+    before = auth.issue_token("admin", USERS["admin"])
+    auth.revoke("admin")
+    after = auth.issue_token("admin", USERS["admin"])
+    assert auth.verify_token(before, USERS) is None
+    assert auth.verify_token(after, USERS) == "admin"
+
+
+def test_password_change_invalidates_token():
+    token = auth.issue_token("admin", USERS["admin"])
+    changed = {"admin": dict(USERS["admin"], password_hash=auth.hash_password("other", rounds=4))}
+    assert auth.verify_token(token, changed) is None
+
+
+def test_needs_refresh_after_half_the_lifetime():
+    now = time.time()
+    token = auth.issue_token("admin", USERS["admin"], now=now)
+    assert not auth.needs_refresh(token, now=now)
+    assert auth.needs_refresh(token, now=now + auth.TOKEN_TTL * 0.6)
+
+
+def test_authenticate():
+    assert auth.authenticate(USERS, " Admin ", "password123") == "admin"
+    assert auth.authenticate(USERS, "admin", "wrong") is None
+    assert auth.authenticate(USERS, "nobody", "password123") is None
+
+
+def test_parse_users():
+    source = {"USER_ALI_NAME": "Ali", "USER_ALI_PASSWORD_HASH": "h", "USER_BOB_NAME": "Bob"}
+    assert auth.parse_users(source) == {"ali": {"name": "Ali", "email": "", "password_hash": "h"}}
+    assert auth.fingerprint(source) != auth.fingerprint(dict(source, USER_BOB_PASSWORD_HASH="h"))
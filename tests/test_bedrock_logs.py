@@ -0,0 +1,112 @@
+import time
+
+import botocore.session
+import pytest
+from botocore.stub import ANY, Stubber
+
+import bedrock_logs
+
+REQUEST_ID = "req-123"
+
+
+@pytest.fixture
+def client():
+    logs = botocore.session.get_session().create_client(
+        "logs", region_name=bedrock_logs.REGION, aws_access_key_id="test", aws_secret_access_key="test"
+    )
+    bedrock_logs.clear_cache()
+    with Stubber(logs) as stubber:
+        logs.stubber = stubber
+        yield logs
+        stubber.assert_no_pending_responses()
+    bedrock_logs.clear_cache()
+
+
+def _event(i):
+    return {"timestamp": 1700000000000 + i, "message": f'{{"requestId": "{REQUEST_ID}", "n": {i}}}',
+            "logStreamName": "stream", "eventId": str(i)}
+
+
+def _filter_params(pattern=f'{{ $.requestId = "{REQUEST_ID}" }}', limit=50, next_token=None):
+    params = {"logGroupName": bedrock_logs.LOG_GROUP, "filterPattern": pattern, "startTime": ANY,
+              "endTime": ANY, "interleaved": True, "limit": limit}
+    if next_token:
+        params["nextToken"] = next_token
+    return params
+
+
+def _advance(monkeypatch, seconds):
+    now = time.time() + seconds
+    monkeypatch.setattr(bedrock_logs.time, "time", lambda: now)
+
+
+def test_follows_next_token(client):
+    client.stubber.add_response("filter_log_events", {"events": [_event(0), _event(1)], "nextToken": "page-2"},
+                                _filter_params(limit=3))
+    client.stubber.add_response("filter_log_events", {"events": [_event(2)], "nextToken": "page-3"},
+                                _filter_params(limit=1, next_token="page-2"))
+    events = bedrock_logs.fetch_bedrock_logs(REQUEST_ID, limit=3, client=client)
+    assert [event["eventId"] for event in events] == ["0", "1", "2"]
+
+
+def test_found_events_are_cached_until_ttl(client, monkeypatch):
+    client.stubber.add_response("filter_log_events", {"events": [_event(0)]}, _filter_params())
+    first = bedrock_logs.fetch_bedrock_logs(REQUEST_ID, client=client)
+    assert bedrock_logs.fetch_bedrock_logs(REQUEST_ID, client=client) == first  # no call queued: cache hit
+
+    _advance(monkeypatch, bedrock_logs.CACHE_TTL + 1)
+    client.stubber.add_response("filter_log_events", {"events": [_event(0), _event(1)]}, _filter_params())
+    assert len(bedrock_logs.fetch_bedrock_logs(REQUEST_ID, client=client)) == 2
+
+
+def test_empty_result_is_cached_for_the_shorter_ttl(client, monkeypatch):
+    # Nothing under the JSON pattern, nor under the plain-text fallback
+    client.stubber.add_response("filter_log_events", {"events": []}, _filter_params())
+    client.stubber.add_response("filter_log_events", {"events": []}, _filter_params(pattern=f'"{REQUEST_ID}"'))
+    assert bedrock_logs.fetch_bedrock_logs(REQUEST_ID, client=client) == []
+    assert bedrock_logs.fetch_bedrock_logs(REQUEST_ID, client=client) == []
+
+    _advance(monkeypatch, bedrock_logs.EMPTY_TTL + 1)
+    client.stubber.add_response("filter_log_events", {"events": [_event(0)]}, _filter_params())
+    assert len(bedrock_logs.fetch_bedrock_logs(REQUEST_ID, client=client)) == 1
+
+
+def test_errors_are_not_cached(client):
+    client.stubber.add_client_error("filter_log_events", "ThrottlingException", "Rate exceeded")
+    error = bedrock_logs.fetch_bedrock_logs(REQUEST_ID, client=client)
+    assert "Unable to fetch Bedrock logs" in error[0]["message"]
+
+    client.stubber.add_response("filter_log_events", {"events": [_event(0)]}, _filter_params())
+    assert bedrock_logs.fetch_bedrock_logs(REQUEST_ID, client=client)[0]["eventId"] == "0"
+
+
+def _row(i):
+    return [{"field": "@timestamp", "value": f"2025-11-18 12:00:0{i}.000"},
+            {"field": "@message", "value": f"message {i}"}, {"field": "@logStream", "value": "stream"}]
+
+
+def test_insights_yields_partial_results_and_caches_only_complete(client):
+    client.stubber.add_response("start_query", {"queryId": "q-1"},
+                                {"logGroupName": bedrock_logs.LOG_GROUP, "startTime": ANY, "endTime": ANY,
+                                 "queryString": ANY, "limit": 50})
+    for status, rows in (("Running", [_row(0)]), ("Running", [_row(0), _row(1)]),
+                         ("Complete", [_row(0), _row(1), _row(2)])):
+        client.stubber.add_response("get_query_results", {"status": status, "results": rows}, {"queryId": "q-1"})
+
+    progress = list(bedrock_logs.iter_insights_results(REQUEST_ID, sent_at=time.time() - 5, client=client,
+                                                       poll_interval=0))
+    assert [(len(events), status) for events, status in progress] == [(1, "Running"), (2, "Running"),
+                                                                      (3, "Complete")]
+    assert progress[-1][0][2]["message"] == "message 2"
+    assert bedrock_logs.query_bedrock_logs_insights(REQUEST_ID, client=client) == progress[-1][0]
+
+
+def test_insights_failure_is_not_cached(client):
+    client.stubber.add_response("start_query", {"queryId": "q-2"})
+    client.stubber.add_response("get_query_results", {"status": "Failed", "results": []}, {"queryId": "q-2"})
+    assert list(bedrock_logs.iter_insights_results(REQUEST_ID, client=client, poll_interval=0)) == [([], "Failed")]
+
+    client.stubber.add_response("start_query", {"queryId": "q-3"})
+    client.stubber.add_response("get_query_results", {"status": "Complete", "results": [_row(0)]},
+                                {"queryId": "q-3"})
+    assert len(bedrock_logs.query_bedrock_logs_insights(REQUEST_ID, client=client)) == 1
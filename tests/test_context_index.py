@@ -0,0 +1,42 @@
+import os
+
+import pytest
+
+import context_index
+import thread_corpus
+
+CORPUS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "2025-November.json")
+
+
+@pytest.fixture(scope="module")
+def index():
+    return context_index.build_index(thread_corpus.iter_threads([CORPUS]))
+
+
+def test_verify_corpus():
+    report = context_index.verify([CORPUS], mutations=20, seed=0)
+    assert report["threads"] and report["mutations"]
+    assert not report["mismatched_threads"]
+    assert not report["round_trip_failures"]
+    assert not report["mutation_failures"]
+    assert report["ok"]
+
+
+def _scan(index, sender=None, kind=None, since=None, until=None):
+    """The same filters as ContextIndex.query, checked message by message."""
+    return [message for message in index.messages
+            if (sender is None or message.address == context_index.address(sender))
+            and (kind is None or message.kind == kind)
+            and (since is None or message.date != -1 and message.date >= since)
+            and (until is None or message.date != -1 and message.date <= until)]
+
+
+def test_query_matches_a_full_scan(index):
+    dates = sorted(message.date for message in index.messages if message.date != -1)
+    since, until = dates[len(dates) // 4], dates[len(dates) // 2]
+    busiest = max(index.senders().items(), key=lambda item: item[1])[0]
+    for filters in ({"sender": busiest}, {"kind": "Reply"}, {"since": since, "until": until},
+                    {"sender": busiest, "kind": "Reply", "since": since, "until": until}):
+        expected = _scan(index, **filters)
+        assert expected
+        assert {id(message) for message in index.query(**filters)} == {id(message) for message in expected}
@@ -0,0 +1,12 @@
+import diagram_assets
+
+
+def test_static_url_without_prefix():
+    assert diagram_assets.static_url("diagram-abc.html") == "/app/static/diagram-abc.html"
+    assert diagram_assets.static_url("diagram-abc.html", None) == "/app/static/diagram-abc.html"
+
+
+def test_static_url_under_base_url_path():
+    for base in ("mail", "/mail", "/mail/", "mail/"):
+        assert diagram_assets.static_url("diagram-abc.html", base) == "/mail/app/static/diagram-abc.html"
+    assert diagram_assets.static_url("diagram-abc.html", "tools/mail") == "/tools/mail/app/static/diagram-abc.html"
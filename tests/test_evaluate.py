@@ -0,0 +1,84 @@
+import csv
+import json
+import threading
+from argparse import Namespace
+
+import pytest
+
+import evaluate
+import mock_lambda
+
+
+@pytest.fixture
+def mock_url():
+    server, url = mock_lambda.start_mock_server()
+    yield url
+    server.shutdown()
+    server.server_close()
+
+
+def _args(tmp_path, url):
+    return Namespace(input=str(tmp_path / "questions.jsonl"), url=url, concurrency=2, rate=0,
+                     checkpoint=str(tmp_path / "checkpoint.jsonl"), output_json=str(tmp_path / "results.json"),
+                     output_csv=str(tmp_path / "results.csv"), thread_id_from_id=False)
+
+
+def test_interrupted_run_resumes_without_repeats_or_losses(tmp_path, mock_url, monkeypatch):
+    questions = [f"Soru {i}: eduroam bağlantısı kurulamıyor" for i in range(12)]
+    with open(tmp_path / "questions.jsonl", "w", encoding="utf-8") as f:
+        for i, question in enumerate(questions):
+            f.write(json.dumps({"id": f"q{i}", "question": question}, ensure_ascii=False) + "\n")
+            if i == 5:
+                f.write("\n")  # blank lines are skipped, not counted
+    args = _args(tmp_path, mock_url)
+
+    asked = []
+    lock = threading.Lock()
+    real_ask = evaluate.ask_agent
+
+    def interrupted_ask(url, question, thread_id, limiter):
+        with lock:
+            asked.append(question)
+            count = len(asked)
+        if count == 7:
+            raise KeyboardInterrupt  # Ctrl+C during the run
+        if question == questions[1]:
+            return {"error": "502 Bad Gateway", "latency_ms": 1.0}
+        return real_ask(url, question, thread_id, limiter)
+
+    monkeypatch.setattr(evaluate, "ask_agent", interrupted_ask)
+    with pytest.raises(KeyboardInterrupt):
+        evaluate.run(args)
+    with open(args.checkpoint, "a", encoding="utf-8") as f:
+        f.write('{"key": "q11", "que')  # torn last line from a crash
+
+    checkpointed = evaluate.load_checkpoint(args.checkpoint)
+    answered_first = {record["question"] for record in checkpointed.values() if "error" not in record}
+    assert answered_first and len(answered_first) < len(questions)
+    assert "error" in checkpointed["q1"]
+
+    resumed = []
+
+    def counting_ask(url, question, thread_id, limiter):
+        with lock:
+            resumed.append(question)
+        return real_ask(url, question, thread_id, limiter)
+
+    monkeypatch.setattr(evaluate, "ask_agent", counting_ask)
+    evaluate.run(args)
+
+    # Only rows without an answer are sent again (including the failed one), each exactly once
+    assert sorted(resumed) == sorted(set(questions) - answered_first)
+    assert questions[1] in resumed
+
+    with open(args.output_json, encoding="utf-8") as f:
+        results = json.load(f)
+    assert [row["question"] for row in results] == questions
+    assert all(row["response"] == f"Mock answer for: {row['question'][:80]}" for row in results)
+    with open(args.output_csv, encoding="utf-8", newline="") as f:
+        assert list(csv.DictReader(f)) == results
+
+    # A third run has nothing left to do
+    resumed.clear()
+    evaluate.run(args)
+    assert resumed == []
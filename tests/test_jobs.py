@@ -0,0 +1,64 @@
+import threading
+import time
+
+import pytest
+
+import jobs
+
+
+def _wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def queue():
+    queue = jobs.JobQueue(max_workers=2, max_jobs_per_user=1)
+    yield queue
+    queue.shutdown()
+
+
+def test_cancelled_running_job_holds_its_slot_until_it_returns(queue):
+    release = threading.Event()
+    job_id = queue.submit("alice", release.wait)
+    _wait_for(lambda: queue.get(job_id).state == jobs.RUNNING)
+
+    assert queue.cancel(job_id)
+    queue.forget(job_id)
+    with pytest.raises(jobs.JobLimitExceeded):
+        queue.submit("alice", time.sleep, 0)
+
+    release.set()
+    _wait_for(lambda: queue.active_count("alice") == 0)
+    queue.submit("alice", time.sleep, 0)
+
+
+def test_cancelled_queued_job_frees_its_slot_at_once():
+    queue = jobs.JobQueue(max_workers=1, max_jobs_per_user=1)
+    release = threading.Event()
+    try:
+        queue.submit("bob", release.wait)
+        queued = queue.submit("alice", time.sleep, 0)
+        assert queue.get(queued).state == jobs.QUEUED
+
+        assert queue.cancel(queued)
+        assert queue.active_count("alice") == 0
+        queue.submit("alice", time.sleep, 0)
+    finally:
+        release.set()
+        queue.shutdown()
+
+
+def test_uncollected_finished_jobs_are_pruned(queue, monkeypatch):
+    queue.finished_ttl = 60
+    job_id = queue.submit("alice", lambda: "answer")
+    _wait_for(lambda: queue.get(job_id).state == jobs.DONE)
+    finished_at = queue.get(job_id).finished_at
+
+    monkeypatch.setattr(jobs.time, "time", lambda: finished_at + 59)
+    assert [job.id for job in queue.jobs_for("alice")] == [job_id]
+    monkeypatch.setattr(jobs.time, "time", lambda: finished_at + 61)
+    assert queue.jobs_for("alice") == []
+    assert queue.get(job_id) is None
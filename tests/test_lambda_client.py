@@ -0,0 +1,68 @@
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+import lambda_client
+
+
+class CountingSession(requests.Session):
+    def __init__(self):
+        super().__init__()
+        self.posts = 0
+
+    def post(self, *args, **kwargs):
+        self.posts += 1
+        return super().post(*args, **kwargs)
+
+
+class DropHandler(BaseHTTPRequestHandler):
+    """Reads the request, then closes the connection without answering (the agent may have run)."""
+
+    received = 0
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        DropHandler.received += 1
+        self.close_connection = True
+        self.connection.shutdown(socket.SHUT_RDWR)
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(lambda_client.time, "sleep", lambda seconds: None)
+
+
+def _closed_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_refused_connection_is_retried():
+    session = CountingSession()
+    with pytest.raises(requests.ConnectionError):
+        lambda_client.post_json(f"http://127.0.0.1:{_closed_port()}/", {"query": "VPN"}, max_retries=2,
+                                session=session)
+    assert session.posts == 3
+
+
+def test_connection_lost_after_sending_is_not_retried():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), DropHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    session = CountingSession()
+    try:
+        with pytest.raises(requests.ConnectionError):
+            lambda_client.post_json(f"http://127.0.0.1:{server.server_address[1]}/", {"query": "VPN"},
+                                    max_retries=2, session=session)
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert session.posts == 1
+    assert DropHandler.received == 1
@@ -0,0 +1,75 @@
+import json
+
+import response_cache
+
+ANSWER = {"result": "Şifrenizi ODTÜ hesap sayfasından sıfırlayabilirsiniz.", "redirection": None,
+          "trace": None, "request_id": "req-1"}
+
+
+def _size(value):
+    return len(json.dumps(value, ensure_ascii=False).encode("utf-8"))
+
+
+def test_entry_expires_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(response_cache.time, "time", lambda: now[0])
+    cache = response_cache.ResponseCache(ttl=60)
+    cache.put("Şifremi unuttum", None, ANSWER)
+
+    now[0] += 59
+    assert cache.get("Şifremi unuttum", None) == ANSWER
+    now[0] += 2
+    assert cache.get("Şifremi unuttum", None) is None
+    assert len(cache) == 0 and cache.size_bytes == 0
+
+
+def test_expired_entry_is_not_loaded_from_disk(monkeypatch, tmp_path):
+    now = [1000.0]
+    monkeypatch.setattr(response_cache.time, "time", lambda: now[0])
+    db_path = str(tmp_path / "cache.db")
+    response_cache.ResponseCache(ttl=60, db_path=db_path).put("Şifremi unuttum", None, ANSWER)
+
+    assert response_cache.ResponseCache(ttl=60, db_path=db_path).get("Şifremi unuttum", None) == ANSWER
+    now[0] += 61
+    assert response_cache.ResponseCache(ttl=60, db_path=db_path).get("Şifremi unuttum", None) is None
+
+
+def test_budget_counts_utf8_bytes():
+    cache = response_cache.ResponseCache()
+    cache.put("Şifremi unuttum", None, ANSWER)
+    assert cache.size_bytes == _size(ANSWER) > len(json.dumps(ANSWER, ensure_ascii=False))
+
+
+def test_least_recently_used_is_evicted_past_the_budget():
+    answers = {f"soru {i}": dict(ANSWER, request_id=f"req-{i}") for i in range(3)}
+    cache = response_cache.ResponseCache(max_bytes=2 * _size(answers["soru 0"]) + 1)
+    cache.put("soru 0", None, answers["soru 0"])
+    cache.put("soru 1", None, answers["soru 1"])
+    assert cache.get("soru 0", None) is not None  # soru 1 is now the least recently used
+    cache.put("soru 2", None, answers["soru 2"])
+
+    assert cache.get("soru 1", None) is None
+    assert cache.get("soru 0", None) == answers["soru 0"]
+    assert cache.get("soru 2", None) == answers["soru 2"]
+    assert cache.size_bytes <= cache.max_bytes
+
+
+def test_entry_larger_than_the_budget_is_not_kept():
+    cache = response_cache.ResponseCache(max_bytes=_size(ANSWER) - 1)
+    cache.put("Şifremi unuttum", None, ANSWER)
+    assert len(cache) == 0 and cache.size_bytes == 0
+
+
+def test_error_and_routing_replies_are_never_cached(tmp_path):
+    cache = response_cache.ResponseCache(db_path=str(tmp_path / "cache.db"))
+    error = {"result": "⚠️ Error connecting to AI Agent: timed out", "redirection": None, "trace": None,
+             "request_id": None}
+    routed = {"result": "Routed locally to Hotline (hotline@metu.edu.tr); the AI Agent was not called.",
+              "redirection": {"score": 0.95, "metadata": {"name": "Hotline"}}, "trace": None, "request_id": None}
+
+    assert cache.put("VPN çalışmıyor", None, error) is False
+    assert cache.put("Mailime giremiyorum", None, routed) is False
+    assert cache.get("VPN çalışmıyor", None) is None
+    assert cache.get("Mailime giremiyorum", None) is None
+    assert len(cache) == 0
+    assert cache.put("Şifremi unuttum", None, ANSWER) is True
@@ -0,0 +1,39 @@
+import pytest
+
+import similar_threads
+
+QUESTION = "Merhaba, yurt odamdaki ethernet prizi çalışmıyor, bağlantı kuramıyorum. Yardımcı olabilir misiniz?"
+
+
+@pytest.fixture(autouse=True)
+def empty_indexes(monkeypatch):
+    monkeypatch.setattr(similar_threads, "_index", similar_threads.SimilarThreadIndex())
+    monkeypatch.setattr(similar_threads, "_inboxes", similar_threads.OrderedDict())
+
+
+def test_answer_is_only_found_from_its_own_inbox():
+    similar_threads.remember("inbox-a", "outbox-1", QUESTION, "Priz arızası kaydı açtık.",
+                             thread_id="thread-a", subject="Ethernet")
+
+    assert [match["thread_id"] for match in similar_threads.lookup("inbox-a", QUESTION)] == ["thread-a"]
+    assert similar_threads.lookup("inbox-b", QUESTION) == []
+
+
+def test_corpus_threads_are_shared():
+    similar_threads.get_index().add_thread({
+        "thread_id": "corpus-1", "subject": "Ethernet",
+        "llm_chat_history": [{"name": "student", "content": QUESTION},
+                             {"name": "hotline", "content": "Priz değiştirilecek."}],
+    })
+
+    for inbox in ("inbox-a", "inbox-b"):
+        assert [match["thread_id"] for match in similar_threads.lookup(inbox, QUESTION)] == ["corpus-1"]
+
+
+def test_least_recently_used_inbox_is_dropped(monkeypatch):
+    monkeypatch.setattr(similar_threads, "MAX_INBOXES", 1)
+    similar_threads.remember("inbox-a", "outbox-1", QUESTION, "answer")
+    similar_threads.remember("inbox-b", "outbox-2", QUESTION, "answer")
+
+    assert similar_threads.lookup("inbox-a", QUESTION) == []
+    assert len(similar_threads.lookup("inbox-b", QUESTION)) == 1
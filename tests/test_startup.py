@@ -0,0 +1,16 @@
+import startup_profile
+
+
+def test_entry_imports_stay_within_budget():
+    ok, total_ms, report = startup_profile.check_budget(startup_profile.IMPORT_BUDGET_MS)
+    top_level = [row for row in report["modules"] if row["depth"] == 0 and row["module"] != "site"]
+    heaviest = sorted(top_level, key=lambda row: row["cumulative_ms"], reverse=True)[:5]
+    assert ok, (f"mail.py imports took {total_ms} ms, over the {startup_profile.IMPORT_BUDGET_MS} ms budget; "
+                f"heaviest: {[(row['module'], row['cumulative_ms']) for row in heaviest]}")
+
+
+def test_probe_covers_the_entry_point_imports():
+    report = startup_profile.import_report()
+    imported = {row["module"] for row in report["modules"]}
+    assert set(startup_profile.entry_imports()) <= imported
+    assert report["total_ms"] > 0
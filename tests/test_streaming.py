@@ -0,0 +1,143 @@
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+import lambda_client
+import response_cache
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DELTAS = ["VPN ", "bağlantısı ", "için ", "Cisco ", "istemcisini ", "kurun."]
+METADATA = {"redirection": {"score": 0.9}, "request_id": "req-1"}
+
+
+class ChunkHandler(BaseHTTPRequestHandler):
+    """SSE answers, one chunk per event: /ok completes, /disconnect drops mid-answer, /empty has no text."""
+
+    def log_message(self, *args):
+        pass
+
+    received = []  # payloads of every request, in order
+
+    def do_POST(self):
+        ChunkHandler.received.append(json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0)))))
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        if self.path == "/ok":
+            for delta in DELTAS:
+                self._chunk({"delta": delta})
+            self._chunk(METADATA)
+        elif self.path == "/disconnect":
+            for delta in DELTAS[:2]:
+                self._chunk({"delta": delta})
+            self.wfile.write(b"40\r\ndata: {\"delta\"")  # chunk cut short, then the connection drops
+            self.wfile.flush()
+            self.connection.shutdown(2)
+            self.close_connection = True
+            return
+        self._write("data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _chunk(self, event):
+        self._write(f"data: {json.dumps(event, ensure_ascii=False)}\n\n")
+
+    def _write(self, text):
+        data = text.encode("utf-8")
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+
+@pytest.fixture(scope="module")
+def base_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ChunkHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+PAYLOAD = {"input": {"query": "VPN çalışmıyor", "thread_id": ""}}
+
+
+def test_stream_completes(base_url):
+    stream = lambda_client.stream_json(base_url + "/ok", PAYLOAD)
+    assert list(stream) == DELTAS
+    assert stream.streamed
+    assert stream.text == "".join(DELTAS)
+    assert stream.metadata == METADATA
+
+
+def test_mid_stream_disconnect_raises_after_partial_text(base_url):
+    stream = lambda_client.stream_json(base_url + "/disconnect", PAYLOAD, max_retries=0)
+    received = []
+    with pytest.raises(requests.RequestException):
+        for delta in stream:
+            received.append(delta)
+    assert received == DELTAS[:2]
+    assert stream.text == ""  # an incomplete answer is never reported as the full text
+
+
+def test_empty_stream(base_url):
+    stream = lambda_client.stream_json(base_url + "/empty", PAYLOAD)
+    assert list(stream) == []
+    assert stream.text == ""
+    assert stream.metadata == {}
+
+
+def _compose_app(monkeypatch, tmp_path, url):
+    from streamlit.testing.v1 import AppTest
+
+    monkeypatch.setenv("OUTBOX_DB", str(tmp_path / "outbox.db"))
+    monkeypatch.setenv("PERF_METRICS_DB", str(tmp_path / "perf.db"))
+    real_stream_json = lambda_client.stream_json
+    monkeypatch.setattr(lambda_client, "stream_json", lambda _url, payload, **kw: real_stream_json(url, payload, **kw))
+    at = AppTest.from_file(os.path.join(ROOT, "mail.py"), default_timeout=30).run()
+    at.sidebar.radio[0].set_value("✍️ Compose").run()
+    return at
+
+
+def _send(at, body, thread_id=""):
+    at.text_input(key="form_to").input("hotline@metu.edu.tr")
+    at.text_input(key="form_sub").input("VPN")
+    at.text_input(key="form_thread_id").input(thread_id)
+    at.text_area(key="form_body").input(body)
+    next(button for button in at.button if "Send" in button.label).click().run()
+    assert not at.exception
+    return at.session_state["latest_result"]
+
+
+def _send_from_compose(monkeypatch, tmp_path, url, body):
+    return _send(_compose_app(monkeypatch, tmp_path, url), body)
+
+
+def test_compose_shows_streamed_answer(monkeypatch, tmp_path, base_url):
+    result = _send_from_compose(monkeypatch, tmp_path, base_url + "/ok", "Cisco VPN bağlanmıyor, ne yapmalıyım?")
+    assert result["result"] == "".join(DELTAS)
+    assert result["request_id"] == "req-1"
+
+
+def test_compose_reports_disconnect_and_does_not_cache_it(monkeypatch, tmp_path, base_url):
+    body = "VPN bağlantım yarıda kesiliyor, yardımcı olur musunuz?"
+    result = _send_from_compose(monkeypatch, tmp_path, base_url + "/disconnect", body)
+    assert result["result"].startswith("⚠️ Error connecting to AI Agent")
+    assert response_cache.get_cache().get(body, None) is None
+
+
+def test_follow_up_on_a_thread_is_not_answered_from_the_cache(monkeypatch, tmp_path, base_url):
+    at = _compose_app(monkeypatch, tmp_path, base_url + "/ok")
+    question = "Eduroam şifremi değiştirdim, bağlanamıyorum."
+    sent = len(ChunkHandler.received)
+    _send(at, question)
+    _send(at, question, "thread-eduroam")
+    _send(at, "Telefonda da aynı sorun var.", "thread-eduroam")
+    _send(at, question, "thread-eduroam")
+
+    threaded = [payload["input"] for payload in ChunkHandler.received[sent:] if payload["input"]["thread_id"]]
+    assert [entry["query"] for entry in threaded] == [question, "Telefonda da aynı sorun var.", question]
+    assert response_cache.get_cache().get(question, "thread-eduroam") is None
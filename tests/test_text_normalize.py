@@ -0,0 +1,30 @@
+import pytest
+
+import router
+import text_normalize
+
+
+@pytest.mark.parametrize("text, expected", [
+    # Messages that open with a closing phrase keep their question
+    ("İyi çalışmalar, eduroam şifremi unuttum nasıl bağlanabilirim?",
+     "eduroam sifremi unuttum nasil baglanabilirim?"),
+    ("Kolay gelsin hocam, VPN bağlantısı kurulamıyor.", "kolay gelsin hocam, vpn baglantisi kurulamiyor."),
+    ("Teşekkür ederim, şifremi sıfırlar mısınız?", "tesekkur ederim, sifremi sifirlar misiniz?"),
+    ("Bilgilerinize arz ederim.\nEkte dilekçem var, ders kaydı yapamıyorum.",
+     "bilgilerinize arz ederim. ekte dilekcem var, ders kaydi yapamiyorum."),
+    # A contact label inside a sentence is content, not a signature line
+    ("Sayın Yaman,\n\nTelefon ile iletişime geçer misiniz? 0312 210 33 55",
+     "telefon ile iletisime gecer misiniz? <phone>"),
+    # Real trailers are still cut
+    ("Merhaba,\nVPN çalışmıyor.\n\nSaygılarımla,\nAli\nTel: 0312 210 11 22\nali@metu.edu.tr", "vpn calismiyor."),
+    ("VPN çalışmıyor.\nTel:\n\n2926", "vpn calismiyor."),
+    ("Merhaba hocam,\n\nİyi günler, eduroma nasıl bağlanabilirim? İyi çalışmalar, Mert Ali Yalçın",
+     "eduroma nasil baglanabilirim?"),
+])
+def test_normalize(text, expected):
+    assert text_normalize.normalize(text) == expected
+    assert text_normalize.normalize_batch([text]) == [expected]
+
+
+def test_message_opening_with_closing_is_routed():
+    assert router.get_router().best("İyi çalışmalar, eduroam şifremi unuttum nasıl bağlanabilirim?") is not None
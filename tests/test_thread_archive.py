@@ -0,0 +1,34 @@
+import json
+import os
+
+import pytest
+
+import thread_archive
+
+CORPUS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "2025-November.json")
+
+
+@pytest.fixture(scope="module")
+def archive_path(tmp_path_factory):
+    with open(CORPUS, encoding="utf-8") as f:
+        threads = json.load(f)[:30]
+    path = tmp_path_factory.mktemp("archive") / "threads.mtar"
+    thread_archive.build_archive(threads, str(path))
+    return str(path)
+
+
+def test_columns_outlive_close(archive_path):
+    with thread_archive.ThreadArchive(archive_path) as archive:
+        dates = archive.column("messages", "date")
+        subjects = archive.column("threads", "subject")
+        messages = archive.thread_messages(0)
+        expected = (dates[0], subjects[0])
+    assert (dates[0], subjects[0]) == expected
+    assert messages[0]["sender"]
+
+
+def test_close_is_idempotent(archive_path):
+    archive = thread_archive.ThreadArchive(archive_path)
+    archive.column("messages", "content")[0]
+    archive.close()
+    archive.close()
@@ -0,0 +1,187 @@
+"""
+Turkish-aware normalization of e-mail bodies for cache keys and matching.
+
+Queries arrive with irregular casing and diacritics ("İyi günler",
+"eduroma", "tesekkurler") and carry greetings, signatures and personal data
+that say nothing about the question. normalize() runs, in order:
+
+    lower_tr      Turkish-correct lowercase (İ -> i, I -> ı)
+    greetings     drop leading "Merhaba hocam," / "Sayın Yetkili," lines
+    signature     cut the trailer from a closing line that follows content
+                  ("Saygılarımla", "Teşekkürler", "Kind regards", ...) or
+                  trailing contact lines
+    pii           mask e-mails, phone numbers, TC kimlik and student numbers
+    fold          optional ASCII folding (ç ğ ı ö ş ü -> c g i o s u)
+
+and collapses whitespace. Patterns accept both the Turkish and the ASCII
+spelling of each letter, so "Teşekkürler" and "Tesekkurler" are treated
+alike whether or not the text is folded.
+
+normalize_batch() applies the same pipeline stage by stage over a list of
+messages, normalizing repeated messages once, and can fan large batches
+out to worker processes.
+"""
+
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+PLACEHOLDERS = ("<email>", "<phone>", "<tckn>", "<student_no>", "<iban>")
+
+_ASCII_FOLD = tuple(zip("çğıöşüâîû", "cgiosuaiu"))
+_TR_CLASSES = {"c": "[cç]", "g": "[gğ]", "i": "[iı]", "o": "[oö]", "s": "[sş]", "u": "[uü]"}
+
+# Written in ASCII; _tr_pattern widens every letter to its Turkish variants
+_GREETINGS = (
+    r"merhabalar", r"merhaba", r"selamlar", r"selam", r"iyi gunler", r"iyi calismalar",
+    r"sayin yetkililer?", r"sayin \w+", r"degerli \w+", r"hocam", r"hocamiz",
+    r"dear \w+(?: \w+)?", r"hello", r"hi", r"good (?:morning|afternoon|evening)",
+)
+_CLOSINGS = (
+    r"saygilarimla", r"saygilar", r"tesekkurler", r"tesekkur ederim", r"simdiden tesekkur",
+    r"iyi calismalar", r"kolay gelsin", r"bilgilerinize", r"geregini", r"gereginin",
+    r"yardimlariniz icin", r"thank you", r"thanks", r"kind regards", r"best regards",
+    r"regards", r"sincerely", r"best,",
+)
+_CONTACT_LABELS = r"tel|tlf|telefon|gsm|dahili|phone|mobile|fax|e-?posta|e-?mail|student id|ogrenci no"
+# A contact label followed by nothing but a number or an address, or a bare number line;
+# "Telefon ile iletişime geçer misiniz" is content
+_CONTACT_VALUE = r"\s*[:.]?\s*(?:e?[+(\d][\d\s()+./-]*|[\w.+-]+@[\w.-]+|<email>)?"
+# Closing lines longer than this are treated as content, not a trailer
+MAX_CLOSING_WORDS = 12
+# Only the last few non-empty lines are searched for a signature
+SIGNATURE_LINES = 8
+
+
+def _tr_pattern(pattern):
+    return "".join(_TR_CLASSES.get(char, char) for char in pattern)
+
+
+_GREETING_RE = re.compile(
+    r"^\s*(?:(?:" + "|".join(_tr_pattern(p) for p in _GREETINGS) + r")\b[\s,.!:;-]*)+"
+)
+_CLOSING_RE = re.compile(r"^\s*(?:" + "|".join(_tr_pattern(p) for p in _CLOSINGS) + r")")
+# "... bağlanabilirim? İyi çalışmalar, Mert Ali Yalçın" on a single line
+_INLINE_CLOSING_RE = re.compile(
+    r"(?<=[.?!,])\s*(?:" + "|".join(_tr_pattern(p) for p in _CLOSINGS) + r")[^.?!\n]{0,60}$"
+)
+_CONTACT_RE = re.compile(
+    r"^\s*(?:(?:" + _tr_pattern(_CONTACT_LABELS) + r")\b" + _CONTACT_VALUE + r"|[\d\s()+-]+)\s*$"
+)
+_EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+# One alternation so a message is scanned once; earlier branches win at the same position
+_NUMBER_RE = re.compile(
+    r"(?P<iban>\btr\d{2}(?: ?\d{4}){5} ?\d{2}\b)"
+    r"|(?P<phone>(?<![\w+])(?:\+90[\s.-]*|0[\s.-]*)?\(?[2-5]\d{2}\)?[\s.-]*\d{3}[\s.-]*\d{2}[\s.-]*\d{2}(?!\d)"
+    r"|\b(?:tel|tlf|telefon|dahili|phone)\b\s*[:.]?\s*\d[\d\s-]{2,}\d)"
+    r"|(?P<tckn>\b[1-9]\d{10}\b)"
+    r"|(?P<student_no>\be?\d{7}\b)"
+)
+_DIGIT_RE = re.compile(r"\d")
+# The inline closing check only looks at the end of the message
+_INLINE_TAIL = 200
+
+
+def lower_tr(text):
+    """Lowercase with Turkish dotted/dotless i rules."""
+    return (text or "").replace("İ", "i").replace("I", "ı").lower()
+
+
+def fold_ascii(text):
+    """Map Turkish letters to their ASCII base letters (expects lowercase input)."""
+    # Chained replace() is several times faster than str.translate on non-ASCII text
+    for letter, ascii_letter in _ASCII_FOLD:
+        text = text.replace(letter, ascii_letter)
+    return text
+
+
+def strip_greetings(text):
+    """Remove greeting phrases at the very start of a lowercased message."""
+    return _GREETING_RE.sub("", text, count=1)
+
+
+def strip_signature(text):
+    """Cut a lowercased message at its closing line, or drop trailing contact lines.
+
+    A closing only starts the signature when content comes before it, so a
+    message that opens with "Kolay gelsin" or "Teşekkür ederim" keeps its
+    question. Strip greetings first so they do not count as that content.
+    """
+    lines = text.splitlines()
+    content = [i for i, line in enumerate(lines) if line.strip()]
+    for i in content[-SIGNATURE_LINES:]:
+        line = lines[i]
+        if i > content[0] and _CLOSING_RE.match(line) and len(line.split()) <= MAX_CLOSING_WORDS:
+            return "\n".join(lines[:i])
+    while content and _CONTACT_RE.match(lines[content[-1]]):
+        content.pop()
+    if not content:
+        return ""
+    text = "\n".join(lines[:content[-1] + 1])
+    head, tail = text[:-_INLINE_TAIL], text[-_INLINE_TAIL:]
+    return head + _INLINE_CLOSING_RE.sub("", tail, count=1)
+
+
+def mask_pii(text):
+    """Replace e-mail addresses, phone, IBAN, TC kimlik and student numbers with placeholders."""
+    if "@" in text:
+        text = _EMAIL_RE.sub("<email>", text)
+    if _DIGIT_RE.search(text):
+        text = _NUMBER_RE.sub(_number_placeholder, text)
+    return text
+
+
+def _number_placeholder(match):
+    return f"<{match.lastgroup}>"
+
+
+def normalize(text, fold=True, greetings=True, signature=True, pii=True):
+    """Full pipeline for one message; see the module docstring for the stages."""
+    text = lower_tr(text)
+    if greetings:
+        text = strip_greetings(text)
+    if signature:
+        text = strip_signature(text)
+    if pii:
+        text = mask_pii(text)
+    if fold:
+        text = fold_ascii(text)
+    return " ".join(text.split())
+
+
+def _normalize_stages(texts, fold, greetings, signature, pii):
+    texts = [lower_tr(text) for text in texts]
+    if greetings:
+        texts = [_GREETING_RE.sub("", text, count=1) for text in texts]
+    if signature:
+        texts = [strip_signature(text) for text in texts]
+    if pii:
+        texts = [_EMAIL_RE.sub("<email>", text) if "@" in text else text for text in texts]
+        texts = [_NUMBER_RE.sub(_number_placeholder, text) if _DIGIT_RE.search(text) else text
+                 for text in texts]
+    if fold:
+        joined = "\x00".join(texts)
+        if joined.count("\x00") == len(texts) - 1:
+            # One joined string folds faster than many short ones
+            texts = fold_ascii(joined).split("\x00")
+        else:
+            texts = [fold_ascii(text) for text in texts]
+    return [" ".join(text.split()) for text in texts]
+
+
+def normalize_batch(texts, fold=True, greetings=True, signature=True, pii=True, workers=None, chunk_size=2000):
+    """normalize() over a list, same order; duplicates are only normalized once.
+
+    With workers > 1, unique messages are split into chunk_size chunks and
+    normalized in that many processes.
+    """
+    unique = list(dict.fromkeys(text or "" for text in texts))
+    options = (fold, greetings, signature, pii)
+    if workers and workers > 1 and len(unique) > chunk_size:
+        chunks = [unique[i:i + chunk_size] for i in range(0, len(unique), chunk_size)]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = executor.map(_normalize_stages, chunks, *([option] * len(chunks) for option in options))
+            normalized = [text for chunk in results for text in chunk]
+    else:
+        normalized = _normalize_stages(unique, *options)
+    lookup = dict(zip(unique, normalized))
+    return [lookup[text or ""] for text in texts]
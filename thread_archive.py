@@ -0,0 +1,334 @@
+"""
+Columnar, memory-mapped archive of thread dumps (.mtar).
+
+Converting a monthly dump once lets every tool open it with mmap and read
+only the columns it needs, instead of json.load-ing the whole file and
+re-parsing llm_chat_history each time.
+
+Layout (all arrays in the byte order recorded in the directory, 8-byte aligned):
+
+    b"MTAR0001"  uint64 directory offset  uint64 directory length
+    sections ...
+    directory    JSON: {"byteorder", "tables": {table: {"rows", "columns": {...}}}}
+
+Column kinds:
+
+    int     array of fixed-size integers ("typecode": q/I/...)
+    str     uint64 end offsets (rows entries) into a slice of the shared
+            UTF-8 string buffer; strings are decoded only when indexed
+    dict    uint32 codes into a small list of values kept in the directory
+            (sender, role, message type: few distinct values, many rows)
+
+Tables:
+
+    threads   thread_id, subject, msg_count, context (llm_context_text),
+              participant_start/participant_end -> participants.name,
+              message_start/message_end -> messages rows
+    messages  thread, date (epoch seconds, -1 if unparsable), sender, role,
+              kind (Original/Reply), content
+    participants  thread, name
+
+Usage:
+    python thread_archive.py build 2025-November.json -o 2025-November.mtar
+    python thread_archive.py info 2025-November.mtar
+"""
+
+import argparse
+import json
+import mmap
+import os
+import shutil
+import struct
+import sys
+import tempfile
+from array import array
+
+import thread_corpus
+
+MAGIC = b"MTAR0001"
+_HEADER = struct.Struct("<8sQQ")
+_ALIGN = 8
+
+SCHEMA = {
+    "threads": {"thread_id": "str", "subject": "str", "msg_count": "int", "context": "str",
+                "participant_start": "int", "participant_end": "int",
+                "message_start": "int", "message_end": "int"},
+    "messages": {"thread": "int", "date": "int", "sender": "dict", "role": "dict", "kind": "dict",
+                 "content": "str"},
+    "participants": {"thread": "int", "name": "dict"},
+}
+_INT_TYPECODES = {"date": "q"}  # everything else fits in uint32
+
+
+def parse_date(value):
+    """Epoch seconds of a message timestamp, -1 if missing or unparsable."""
+    parsed = thread_corpus.parse_message_date(value)
+    return int(parsed.timestamp()) if parsed else -1
+
+
+def participants_of(thread):
+    """Participants from the context's "Participants:" line, else the message senders."""
+    for line in (thread.get("llm_context_text") or "").splitlines()[:5]:
+        if line.startswith("Participants:"):
+            return [name.strip() for name in line[len("Participants:"):].split(",") if name.strip()]
+    names = []
+    for message in thread.get("llm_chat_history") or []:
+        if message.get("name") and message["name"] not in names:
+            names.append(message["name"])
+    return names
+
+
+class _ColumnWriter:
+    def __init__(self, kind, typecode="I"):
+        self.kind = kind
+        if kind == "int":
+            self.values = array(typecode)
+        elif kind == "str":
+            self.offsets = array("Q")
+            self.data = tempfile.TemporaryFile()
+            self.size = 0
+        else:
+            self.codes = array("I")
+            self.lookup = {}
+
+    def append(self, value):
+        if self.kind == "int":
+            self.values.append(value)
+        elif self.kind == "str":
+            encoded = (value or "").encode("utf-8")
+            self.data.write(encoded)
+            self.size += len(encoded)
+            self.offsets.append(self.size)
+        else:
+            self.codes.append(self.lookup.setdefault(value or "", len(self.lookup)))
+
+
+def _pad(out):
+    remainder = out.tell() % _ALIGN
+    if remainder:
+        out.write(b"\0" * (_ALIGN - remainder))
+
+
+def _write_array(out, values):
+    _pad(out)
+    offset = out.tell()
+    values.tofile(out)
+    return {"offset": offset, "typecode": values.typecode, "count": len(values)}
+
+
+def build_archive(threads, path):
+    """Write threads (an iterable of dump-shaped dicts) to an archive; returns row counts.
+
+    String columns are spooled to temporary files while reading, so only the
+    integer columns and dictionary values are held in memory.
+    """
+    columns = {
+        table: {name: _ColumnWriter(kind, _INT_TYPECODES.get(name, "I")) for name, kind in fields.items()}
+        for table, fields in SCHEMA.items()
+    }
+    t, m, p = columns["threads"], columns["messages"], columns["participants"]
+    rows = {table: 0 for table in SCHEMA}
+    for thread in threads:
+        index = rows["threads"]
+        history = [message for message in thread.get("llm_chat_history") or [] if isinstance(message, dict)]
+        names = participants_of(thread)
+        t["thread_id"].append(thread.get("thread_id"))
+        t["subject"].append(thread.get("subject"))
+        t["msg_count"].append(thread.get("msg_count") or len(history))
+        t["context"].append(thread.get("llm_context_text"))
+        t["participant_start"].append(rows["participants"])
+        t["participant_end"].append(rows["participants"] + len(names))
+        t["message_start"].append(rows["messages"])
+        t["message_end"].append(rows["messages"] + len(history))
+        for name in names:
+            p["thread"].append(index)
+            p["name"].append(name)
+        for message in history:
+            m["thread"].append(index)
+            m["date"].append(parse_date(message.get("timestamp")))
+            m["sender"].append(message.get("name"))
+            m["role"].append(message.get("role"))
+            m["kind"].append((message.get("metadata") or {}).get("type"))
+            m["content"].append(message.get("content"))
+        rows["threads"] += 1
+        rows["participants"] += len(names)
+        rows["messages"] += len(history)
+
+    directory = {"byteorder": sys.byteorder, "tables": {}}
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as out:
+        out.write(_HEADER.pack(MAGIC, 0, 0))
+        # The shared string buffer: every str column's bytes back to back
+        _pad(out)
+        string_base = out.tell()
+        string_starts = {}
+        for table, table_columns in columns.items():
+            for name, column in table_columns.items():
+                if column.kind == "str":
+                    string_starts[table, name] = out.tell() - string_base
+                    column.data.seek(0)
+                    shutil.copyfileobj(column.data, out)
+                    column.data.close()
+        string_size = out.tell() - string_base
+        for table, table_columns in columns.items():
+            described = {}
+            for name, column in table_columns.items():
+                if column.kind == "int":
+                    described[name] = dict(_write_array(out, column.values), kind="int")
+                elif column.kind == "str":
+                    described[name] = dict(_write_array(out, column.offsets), kind="str",
+                                           start=string_starts[table, name])
+                else:
+                    values = sorted(column.lookup, key=column.lookup.get)
+                    described[name] = dict(_write_array(out, column.codes), kind="dict", values=values)
+            directory["tables"][table] = {"rows": rows[table], "columns": described}
+        directory["strings"] = {"offset": string_base, "size": string_size}
+        _pad(out)
+        directory_offset = out.tell()
+        encoded = json.dumps(directory, ensure_ascii=False).encode("utf-8")
+        out.write(encoded)
+        out.seek(0)
+        out.write(_HEADER.pack(MAGIC, directory_offset, len(encoded)))
+    os.replace(tmp_path, path)
+    return rows
+
+
+class StrColumn:
+    """Read-only sequence of strings decoded lazily from the mapped buffer."""
+
+    def __init__(self, strings, ends, start):
+        self._strings = strings
+        self._ends = ends
+        self._start = start
+
+    def __len__(self):
+        return len(self._ends)
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self._ends)
+        begin = self._start + (self._ends[i - 1] if i else 0)
+        return str(self._strings[begin:self._start + self._ends[i]], "utf-8")
+
+    def __iter__(self):
+        for i in range(len(self._ends)):
+            yield self[i]
+
+
+class DictColumn:
+    """Read-only sequence backed by uint32 codes into a value list."""
+
+    def __init__(self, codes, values):
+        self.codes = codes
+        self.values = values
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, i):
+        return self.values[self.codes[i]]
+
+    def __iter__(self):
+        values = self.values
+        return (values[code] for code in self.codes)
+
+
+class ThreadArchive:
+    """Memory-mapped reader; columns are only touched when asked for."""
+
+    def __init__(self, path):
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, directory_offset, directory_length = _HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a thread archive")
+        self.directory = json.loads(self._map[directory_offset:directory_offset + directory_length])
+        self._view = memoryview(self._map)
+        strings = self.directory["strings"]
+        self._strings = self._view[strings["offset"]:strings["offset"] + strings["size"]]
+        self._columns = {}
+
+    def close(self):
+        """Unmap the archive; columns the caller still holds keep it mapped (and readable) until dropped."""
+        if self._map is None:
+            return
+        self._columns.clear()
+        self._strings = self._view = None
+        try:
+            self._map.close()
+        except BufferError:
+            pass  # exported columns are alive; the mapping is released with the last of them
+        self._map = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def rows(self, table):
+        return self.directory["tables"][table]["rows"]
+
+    def _array(self, spec):
+        size = array(spec["typecode"]).itemsize
+        view = self._view[spec["offset"]:spec["offset"] + spec["count"] * size]
+        if self.directory["byteorder"] != sys.byteorder:
+            swapped = array(spec["typecode"], view)
+            swapped.byteswap()
+            return swapped
+        return view.cast(spec["typecode"])
+
+    def column(self, table, name):
+        """One column as a sequence: memoryview for ints, StrColumn or DictColumn otherwise."""
+        key = (table, name)
+        if key not in self._columns:
+            spec = self.directory["tables"][table]["columns"][name]
+            values = self._array(spec)
+            if spec["kind"] == "str":
+                values = StrColumn(self._strings, values, spec["start"])
+            elif spec["kind"] == "dict":
+                values = DictColumn(values, spec["values"])
+            self._columns[key] = values
+        return self._columns[key]
+
+    def iter_rows(self, table, columns):
+        """Rows of `table` as dicts holding only the projected columns."""
+        projected = [(name, self.column(table, name)) for name in columns]
+        for i in range(self.rows(table)):
+            yield {name: values[i] for name, values in projected}
+
+    def thread_messages(self, thread, columns=("date", "sender", "kind", "content")):
+        """Message rows of one thread (by row number), projected to `columns`."""
+        start = self.column("threads", "message_start")[thread]
+        end = self.column("threads", "message_end")[thread]
+        projected = [(name, self.column("messages", name)) for name in columns]
+        return [{name: values[i] for name, values in projected} for i in range(start, end)]
+
+    def thread_participants(self, thread):
+        names = self.column("participants", "name")
+        start = self.column("threads", "participant_start")[thread]
+        return [names[i] for i in range(start, self.column("threads", "participant_end")[thread])]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or inspect a columnar thread archive.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="Convert thread dumps into one archive")
+    build.add_argument("inputs", nargs="+")
+    build.add_argument("--output", "-o", required=True)
+    info = commands.add_parser("info", help="Print row counts and column sizes")
+    info.add_argument("archive")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        print(json.dumps(build_archive(thread_corpus.iter_threads(args.inputs), args.output)))
+    else:
+        with ThreadArchive(args.archive) as archive:
+            summary = {
+                table: {"rows": spec["rows"],
+                        "columns": {name: column["kind"] for name, column in spec["columns"].items()}}
+                for table, spec in archive.directory["tables"].items()
+            }
+            summary["string_bytes"] = archive.directory["strings"]["size"]
+            print(json.dumps(summary, indent=2))
@@ -0,0 +1,151 @@
+"""
+Streaming access to monthly thread dumps such as 2025-November.json.
+
+A dump is one JSON array of thread objects ({thread_id, subject,
+msg_count, llm_context_text, llm_chat_history}). iter_json_array() decodes
+it one element at a time from a fixed-size read buffer, so memory stays
+bounded by the largest single thread rather than by the file size.
+
+Message timestamps come from many mail clients ("Tue, 18 Nov 2025 12:19:23
+-0000", "12.11.2025 14:12", "20 Kas 2025 Per, 14:45", "11/13/2025 2:05 PM");
+parse_message_date() understands the shapes found in the dumps.
+"""
+
+import json
+import re
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+
+READ_SIZE = 1 << 16
+_WHITESPACE = " \t\n\r"
+_DELIMITERS = _WHITESPACE + ",]"
+_decoder = json.JSONDecoder()
+
+
+def iter_json_array(f, read_size=READ_SIZE):
+    """Yield the elements of a top-level JSON array read from a text file object."""
+    buffer = f.read(read_size)
+    pos = 0
+    eof = not buffer
+
+    def fill():
+        # Read at least as much as is still pending, so an element larger than
+        # read_size is re-decoded O(log size) times rather than O(size) times
+        nonlocal buffer, pos, eof
+        chunk = f.read(max(read_size, len(buffer) - pos))
+        if not chunk:
+            eof = True
+            return False
+        buffer = buffer[pos:] + chunk
+        pos = 0
+        return True
+
+    def skip(chars):
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos] in chars:
+                pos += 1
+            if pos < len(buffer) or not fill():
+                return
+
+    skip(_WHITESPACE)
+    if pos >= len(buffer) or buffer[pos] != "[":
+        raise ValueError("expected a JSON array")
+    pos += 1
+    skip(_WHITESPACE)
+    if pos < len(buffer) and buffer[pos] == "]":
+        return
+    while True:
+        while True:
+            try:
+                value, end = _decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof or not fill():
+                    raise
+                continue
+            # Objects, arrays and strings end at their closing character; a number
+            # cut off by the buffer edge ("2." of "2.5") is only complete once a
+            # delimiter follows it
+            if (not isinstance(value, (dict, list, str)) and not eof
+                    and (end == len(buffer) or buffer[end] not in _DELIMITERS) and fill()):
+                continue
+            break
+        pos = end
+        yield value
+        if pos > read_size:
+            buffer, pos = buffer[pos:], 0
+        skip(_WHITESPACE)
+        if pos >= len(buffer):
+            raise ValueError("unterminated JSON array")
+        if buffer[pos] == "]":
+            return
+        if buffer[pos] != ",":
+            raise ValueError(f"expected ',' or ']' in JSON array, got {buffer[pos]!r}")
+        pos += 1
+        skip(_WHITESPACE)
+
+
+# Dates without an offset are quoted by Turkish clients in local time
+LOCAL_TZ = timezone(timedelta(hours=3))
+
+_MONTHS_TR = {
+    "ocak": "Jan", "oca": "Jan", "şubat": "Feb", "şub": "Feb", "mart": "Mar", "nisan": "Apr", "nis": "Apr",
+    "mayıs": "May", "haziran": "Jun", "haz": "Jun", "temmuz": "Jul", "tem": "Jul", "ağustos": "Aug",
+    "ağu": "Aug", "eylül": "Sep", "eyl": "Sep", "ekim": "Oct", "eki": "Oct", "kasım": "Nov", "kas": "Nov",
+    "aralık": "Dec", "ara": "Dec",
+}
+_WEEKDAYS = re.compile(
+    r"\b(?:mon|tue|wed|thu|fri|sat|sun)[a-z]*\b|\b(?:pazartesi|salı|çarşamba|perşembe|cumartesi|cuma|pazar"
+    r"|pzt|sal|çar|per|cum|cmt|paz)\b",
+    re.IGNORECASE
+)
+_TR_MONTH_RE = re.compile(r"\b(" + "|".join(sorted(_MONTHS_TR, key=len, reverse=True)) + r")\b", re.IGNORECASE)
+_NOISE_RE = re.compile(r"\(gmt[^)]*\)|\bat\b|,", re.IGNORECASE)
+# Day-first for 24 hour clocks (Turkish clients), month-first when AM/PM is present (US clients)
+_DATE_FORMATS = (
+    "%d.%m.%Y %H:%M", "%d.%m.%Y %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d %H:%M:%S",
+    "%d/%m/%Y %H:%M", "%d/%m/%y %H:%M", "%m/%d/%Y %I:%M %p", "%m/%d/%y %I:%M %p",
+    "%d %b %Y %H:%M", "%d %B %Y %H:%M", "%b %d %Y %I:%M %p", "%b %d %Y %I:%M:%S %p", "%b %d %Y %H:%M",
+    "%d %b %Y %I:%M %p", "%m/%d/%Y %H:%M", "%m/%d/%y %H:%M",
+)
+
+
+def parse_message_date(value):
+    """Aware datetime from a message timestamp in any of the dump's formats, or None."""
+    if not value or value == "None":
+        return None
+    try:
+        parsed = parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        parsed = None
+    if parsed is None:
+        text = value.replace("\u202f", " ").replace("\xa0", " ")
+        text = _NOISE_RE.sub(" ", text)
+        text = _TR_MONTH_RE.sub(lambda m: _MONTHS_TR[m.group(1).lower().replace("I", "ı")], text)
+        text = " ".join(_WEEKDAYS.sub(" ", text).split())
+        for fmt in _DATE_FORMATS:
+            try:
+                parsed = datetime.strptime(text, fmt)
+                break
+            except ValueError:
+                continue
+        else:
+            return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=LOCAL_TZ)
+
+
+def iter_threads(paths):
+    """Threads from one or more dump files, in file order."""
+    if isinstance(paths, str):
+        paths = [paths]
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            yield from iter_json_array(f)
+
+
+def first_question(thread):
+    """Content of the first user message in llm_chat_history ("" if none)."""
+    for message in thread.get("llm_chat_history") or []:
+        if isinstance(message, dict) and message.get("role", "user") == "user":
+            return message.get("content") or ""
+    return ""
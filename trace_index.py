@@ -0,0 +1,132 @@
+"""
+Parsing of Bedrock Flow traces returned by the Lambda.
+
+A raw trace is a list of events shaped like
+    {"trace": {"nodeInputTrace": {"nodeName": "Prompt_1", "fields": [...], "timestamp": ...}}}
+and can be hundreds of KB once FAQ/RSS/mail retrieval results are inlined.
+build_trace_index walks it once and keeps only what the UI needs, keyed by
+node name and trace type:
+
+    {"Prompt_1": {"nodeInputTrace": {"fields": {"faq_answer": "..."},
+                                     "timestamp": "...", "count": 1}}}
+
+The index is plain JSON, so it is stored next to each email and lookups
+never re-read the raw trace. extract_redirection_summary flattens the
+redirection object that comes back alongside the trace.
+"""
+
+
+def _trace_items(trace_data):
+    if isinstance(trace_data, dict):
+        return [trace_data]
+    if isinstance(trace_data, list):
+        return trace_data
+    return []
+
+
+def _map_fields(fields):
+    mapped = {}
+    for field in fields:
+        if not isinstance(field, dict):
+            continue
+        key = field.get("nodeInputName") or field.get("nodeOutputName")
+        content = field.get("content")
+        if not key or not isinstance(content, dict) or "document" not in content:
+            continue
+        mapped[key] = content["document"]
+    return mapped
+
+
+def extract_prompt_fields(trace_data, node_name="Prompt_1"):
+    """Extract fields from first Prompt_1 trace match (scans the raw trace)."""
+    if not trace_data:
+        return {}
+    for item in _trace_items(trace_data):
+        if not isinstance(item, dict):
+            continue
+        trace = item.get("trace")
+        if not isinstance(trace, dict):
+            continue
+        for trace_type, trace_body in trace.items():
+            if not isinstance(trace_body, dict):
+                continue
+            if trace_body.get("nodeName") != node_name:
+                continue
+            if trace_type == "nodeInputTrace" and isinstance(trace_body.get("fields"), list):
+                return _map_fields(trace_body["fields"])
+    return {}
+
+
+def _usage(trace_body):
+    """Token usage attached to a trace event, if the node reports any."""
+    for container in (trace_body, trace_body.get("metadata")):
+        if not isinstance(container, dict):
+            continue
+        usage = container.get("usage") or container.get("tokenUsage")
+        if isinstance(usage, dict):
+            return usage.get("inputTokens") or 0, usage.get("outputTokens") or 0
+    return None
+
+
+def build_trace_index(trace_data):
+    """Single pass over a raw trace -> {nodeName: {traceType: entry}}.
+
+    The first event per (nodeName, traceType) wins, matching
+    extract_prompt_fields; later duplicates only bump `count` and
+    `last_timestamp` so node timings stay available. Token usage reported
+    by any event is summed into `input_tokens`/`output_tokens`.
+    """
+    index = {}
+    for item in _trace_items(trace_data):
+        if not isinstance(item, dict):
+            continue
+        trace = item.get("trace")
+        if not isinstance(trace, dict):
+            continue
+        for trace_type, trace_body in trace.items():
+            if not isinstance(trace_body, dict):
+                continue
+            node_name = trace_body.get("nodeName")
+            if not node_name:
+                continue
+            timestamp = trace_body.get("timestamp") or item.get("eventTime")
+            node = index.setdefault(node_name, {})
+            entry = node.get(trace_type)
+            if entry is not None:
+                entry["count"] += 1
+                if timestamp is not None:
+                    entry["last_timestamp"] = str(timestamp)
+            else:
+                fields = trace_body.get("fields")
+                entry = node[trace_type] = {
+                    "fields": _map_fields(fields) if isinstance(fields, list) else {},
+                    "timestamp": str(timestamp) if timestamp is not None else None,
+                    "count": 1,
+                }
+            usage = _usage(trace_body)
+            if usage:
+                entry["input_tokens"] = entry.get("input_tokens", 0) + usage[0]
+                entry["output_tokens"] = entry.get("output_tokens", 0) + usage[1]
+    return index
+
+
+def node_fields(index, node_name="Prompt_1", trace_type="nodeInputTrace"):
+    """O(1) lookup of a node's mapped fields in a trace index."""
+    if not index:
+        return {}
+    entry = index.get(node_name, {}).get(trace_type)
+    return entry["fields"] if entry else {}
+
+
+def extract_redirection_summary(redirection):
+    """Extract score, name, and email(s) from redirection payload."""
+    if not isinstance(redirection, dict):
+        return {}
+    metadata = redirection.get("metadata")
+    if not isinstance(metadata, dict):
+        metadata = {}
+    return {
+        "score": redirection.get("score"),
+        "name": metadata.get("name"),
+        "email": metadata.get("emails") or metadata.get("email")
+    }